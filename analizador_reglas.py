@@ -0,0 +1,277 @@
+"""
+analizador_reglas.py — Chequeo de seguridad de regex de reglas personalizadas
+============================================================================
+Las reglas las sugiere un asistente de IA y se guardaban sin ningún control.
+Un regex patológico puede hacer backtracking catastrófico y colgar un worker
+de gunicorn más allá del timeout de 120s.
+
+Antes de guardar una regla (/api/reglas/crear y /api/reglas/modificar):
+  1. Análisis estático: cuantificadores anidados tipo (A+)+ o (A*)*
+  2. Fuzzing: se mide el peor tiempo del regex contra entradas adversariales
+     (rachas largas de los caracteres que el patrón acepta) y contra el
+     histórico de mensajes. Corre en un proceso aparte para poder cortarlo
+     (forkserver o spawn, nunca fork: los endpoints corren en hilos).
+
+Veredictos:
+  OK          → se guarda normalmente
+  CUARENTENA  → se guarda inactiva, marcada 'cuarentena' para revisarla
+                (peor caso lento o cuantificadores anidados, aunque el
+                fuzzing no los haya hecho explotar)
+  RECHAZADA   → no se guarda (regex inválido o demasiado lento)
+
+USO desde terminal:
+    python analizador_reglas.py "(?:DE|DESDE)\\s+(.+?)\\s+HACIA"
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import multiprocessing
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+ARCHIVOS_HISTORICOS = [
+    os.path.join(BASE_PATH, 'data', 'mensajes_estado.json'),
+    os.path.join(BASE_PATH, 'lote_revision_historico.json'),
+]
+
+FLAGS_REGLAS = re.IGNORECASE | re.UNICODE
+LARGO_ADVERSARIAL = 500         # Largo de las entradas sintéticas (≈ mensaje más largo)
+MAX_HISTORICOS = 500            # Mensajes históricos usados para medir
+LIMITE_CUARENTENA_MS = 50       # Peor caso por entrada a partir del cual se aísla
+LIMITE_RECHAZO_MS = 1000        # Peor caso por entrada a partir del cual se rechaza
+TIMEOUT_ANALISIS = 5            # Segundos máximos de fuzzing (el pedido HTTP espera)
+
+VEREDICTO_OK = 'OK'
+VEREDICTO_CUARENTENA = 'CUARENTENA'
+VEREDICTO_RECHAZADA = 'RECHAZADA'
+
+_REPETICIONES = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_REPRESENTANTES_CATEGORIA = {
+    sre_parse.CATEGORY_SPACE: ' \t',
+    sre_parse.CATEGORY_DIGIT: '1',
+    sre_parse.CATEGORY_WORD: 'A_1',
+    sre_parse.CATEGORY_NOT_SPACE: 'A',
+    sre_parse.CATEGORY_NOT_DIGIT: 'A ',
+    sre_parse.CATEGORY_NOT_WORD: ' -',
+}
+
+
+# =================================================================
+#  ANÁLISIS ESTÁTICO
+# =================================================================
+
+def _es_ilimitada(maximo):
+    return maximo == sre_parse.MAXREPEAT or maximo > 16
+
+def _recorrer(items, repeticion_externa, hallazgos, alfabeto, palabras):
+    literal_actual = []
+
+    def cerrar_literal():
+        if len(literal_actual) > 1:
+            palabras.add(''.join(literal_actual))
+        literal_actual.clear()
+
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            caracter = chr(av)
+            alfabeto.add(caracter)
+            literal_actual.append(caracter)
+            continue
+        cerrar_literal()
+
+        if op in _REPETICIONES:
+            minimo, maximo, sub = av
+            if repeticion_externa and _es_ilimitada(maximo):
+                hallazgos.append("Cuantificadores anidados (ej: (A+)+): riesgo de backtracking catastrófico")
+            _recorrer(sub, repeticion_externa or _es_ilimitada(maximo), hallazgos, alfabeto, palabras)
+        elif op == sre_parse.SUBPATTERN:
+            _recorrer(av[-1], repeticion_externa, hallazgos, alfabeto, palabras)
+        elif op == sre_parse.BRANCH:
+            for rama in av[1]:
+                _recorrer(rama, repeticion_externa, hallazgos, alfabeto, palabras)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _recorrer(av[1], repeticion_externa, hallazgos, alfabeto, palabras)
+        elif op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+            _recorrer(av, False, hallazgos, alfabeto, palabras)
+        elif op == getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+            _recorrer(av[2], False, hallazgos, alfabeto, palabras)
+        elif op == sre_parse.GROUPREF_EXISTS:
+            _recorrer(av[1], repeticion_externa, hallazgos, alfabeto, palabras)
+            if av[2]:
+                _recorrer(av[2], repeticion_externa, hallazgos, alfabeto, palabras)
+        elif op == sre_parse.IN:
+            for sub_op, sub_av in av:
+                if sub_op == sre_parse.LITERAL:
+                    alfabeto.add(chr(sub_av))
+                elif sub_op == sre_parse.RANGE:
+                    alfabeto.update((chr(sub_av[0]), chr(sub_av[1])))
+                elif sub_op == sre_parse.CATEGORY:
+                    alfabeto.update(_REPRESENTANTES_CATEGORIA.get(sub_av, ''))
+        elif op == sre_parse.CATEGORY:
+            alfabeto.update(_REPRESENTANTES_CATEGORIA.get(av, ''))
+        elif op == sre_parse.ANY:
+            alfabeto.update('A ')
+    cerrar_literal()
+
+def analizar_estructura(regex):
+    """
+    Recorre el árbol del regex.
+    Returns: (advertencias, alfabeto, palabras) — los dos últimos alimentan el fuzzing
+    """
+    hallazgos = []
+    alfabeto = set()
+    palabras = set()
+    _recorrer(sre_parse.parse(regex, FLAGS_REGLAS), False, hallazgos, alfabeto, palabras)
+    return sorted(set(hallazgos)), alfabeto, palabras
+
+
+# =================================================================
+#  FUZZING
+# =================================================================
+
+_HISTORICOS = None
+
+def cargar_textos_historicos():
+    """Contenidos de los mensajes históricos (cacheados)"""
+    global _HISTORICOS
+    if _HISTORICOS is None:
+        textos = []
+        for ruta in ARCHIVOS_HISTORICOS:
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    textos.extend(m.get('contenido') or '' for m in json.load(f))
+            except Exception as e:
+                print(f"⚠️ No se pudo leer histórico {ruta}: {e}")
+        _HISTORICOS = list(dict.fromkeys(t for t in textos if t))[:MAX_HISTORICOS]
+    return _HISTORICOS
+
+def generar_entradas_adversariales(alfabeto, palabras):
+    """
+    Rachas largas de cada carácter que el patrón acepta, solas o después de
+    cada literal del patrón, terminadas en un carácter que nada espera.
+    Es el caso que dispara el backtracking en grupos que se solapan.
+    """
+    caracteres = sorted(alfabeto)[:24] or ['A', ' ']
+    prefijos = [''] + sorted(palabras, key=len, reverse=True)[:8]
+    entradas = []
+    for prefijo in prefijos:
+        for caracter in caracteres:
+            for separador in ('', ' '):
+                cuerpo = (prefijo + separador + caracter * LARGO_ADVERSARIAL)[:LARGO_ADVERSARIAL]
+                entradas.append(cuerpo + '\x00')
+        if prefijo:
+            entradas.append(((prefijo + ' ') * LARGO_ADVERSARIAL)[:LARGO_ADVERSARIAL] + '\x00')
+    return entradas
+
+def _medir_en_proceso(regex, entradas, cola):
+    """Corre en el proceso hijo: reporta el peor tiempo (ms) y su entrada"""
+    patron = re.compile(regex, FLAGS_REGLAS)
+    peor_ms, peor_entrada = 0.0, ''
+    for entrada in entradas:
+        inicio = time.perf_counter()
+        patron.search(entrada)
+        ms = (time.perf_counter() - inicio) * 1000
+        if ms > peor_ms:
+            peor_ms, peor_entrada = ms, entrada
+            if ms >= LIMITE_RECHAZO_MS:
+                break
+    cola.put((peor_ms, peor_entrada[:80]))
+
+def medir_peor_caso(regex, entradas, timeout=TIMEOUT_ANALISIS):
+    """
+    Peor tiempo de búsqueda del regex sobre las entradas, en un proceso aparte
+    (el motor de `re` no se puede interrumpir). Returns: (peor_ms, entrada) o
+    None si no terminó dentro del timeout.
+
+    El proceso no se crea con fork: esto corre en un hilo de gunicorn y fork
+    copiaría locks tomados por otros hilos (el hijo quedaría colgado).
+    """
+    contexto = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    )
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_en_proceso, args=(regex, entradas, cola), daemon=True)
+    proceso.start()
+    proceso.join(timeout)
+    if proceso.is_alive():
+        proceso.terminate()
+        proceso.join()
+        return None
+    try:
+        return cola.get(timeout=1)
+    except Exception:
+        return None
+
+
+# =================================================================
+#  API
+# =================================================================
+
+def analizar_regla(regex, textos_extra=()):
+    """
+    Analiza un regex de regla personalizada.
+
+    Returns:
+        dict con veredicto (OK/CUARENTENA/RECHAZADA), motivos, advertencias y
+        peor_caso_ms
+    """
+    resultado = {
+        'veredicto': VEREDICTO_OK,
+        'motivos': [],
+        'advertencias': [],
+        'peor_caso_ms': None,
+        'analizado_en': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if not regex:
+        return resultado
+
+    try:
+        re.compile(regex, FLAGS_REGLAS)
+        advertencias, alfabeto, palabras = analizar_estructura(regex)
+    except re.error as e:
+        resultado['veredicto'] = VEREDICTO_RECHAZADA
+        resultado['motivos'].append(f"Regex inválido: {e}")
+        return resultado
+    resultado['advertencias'] = advertencias
+
+    entradas = generar_entradas_adversariales(alfabeto, palabras)
+    entradas += cargar_textos_historicos()
+    entradas += [t for t in textos_extra if t]
+
+    medicion = medir_peor_caso(regex, entradas)
+    if medicion is None:
+        resultado['veredicto'] = VEREDICTO_RECHAZADA
+        resultado['motivos'].append(
+            f"El fuzzing no terminó en {TIMEOUT_ANALISIS}s: backtracking catastrófico"
+        )
+        return resultado
+
+    peor_ms, peor_entrada = medicion
+    resultado['peor_caso_ms'] = round(peor_ms, 3)
+    if peor_ms >= LIMITE_RECHAZO_MS:
+        resultado['veredicto'] = VEREDICTO_RECHAZADA
+        resultado['motivos'].append(f"Peor caso {peor_ms:.0f} ms (límite {LIMITE_RECHAZO_MS} ms) con entrada {peor_entrada!r}")
+        return resultado
+    if peor_ms >= LIMITE_CUARENTENA_MS:
+        resultado['veredicto'] = VEREDICTO_CUARENTENA
+        resultado['motivos'].append(f"Peor caso {peor_ms:.0f} ms (límite {LIMITE_CUARENTENA_MS} ms) con entrada {peor_entrada!r}")
+    if advertencias:
+        # Que el fuzzing no haya encontrado la entrada que lo hace explotar
+        # no prueba que no exista
+        resultado['veredicto'] = VEREDICTO_CUARENTENA
+        resultado['motivos'].extend(advertencias)
+    return resultado
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python analizador_reglas.py <regex>")
+        sys.exit(1)
+    print(json.dumps(analizar_regla(sys.argv[1]), indent=2, ensure_ascii=False))
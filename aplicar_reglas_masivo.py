@@ -1,9 +1,10 @@
 
 import json
 import os
-import re
 from pathlib import Path
 
+from validador_mensajes import MotorReglas, alcance_linea
+
 # Configuración
 ARCHIVO_MENSAJES = 'data/mensajes_estado.json'
 DIR_REGLAS = 'configs/reglas'
@@ -29,6 +30,9 @@ def cargar_todas_las_reglas():
                 data = json.load(f)
                 nombre_linea = ruta.parent.name
                 for r in data.get('reglas', []):
+                    # Inactivas y en cuarentena (regex riesgoso según analizador_reglas) no se aplican
+                    if not r.get('activa', True) or r.get('cuarentena'):
+                        continue
                     r['origen_archivo'] = nombre_linea # Para saber si es global o de línea
                     reglas.append(r)
         except Exception as e:
@@ -46,6 +50,10 @@ def aplicar_cambios():
     
     contador_afectados = 0
     
+    # Reglas compiladas y fusionadas: un escaneo por mensaje encuentra la primera
+    # que coincide; las siguientes solo se evalúan si esa no cambió nada
+    motor = MotorReglas(reglas, campo_origen='origen_archivo')
+    
     for mensaje in mensajes:
         # Solo procesamos mensajes que NO estén ya completados/rechazados manualmente
         # Opcional: Re-procesar TODO si quieres corregir incluso lo validado manualmente,
@@ -54,53 +62,38 @@ def aplicar_cambios():
         # if mensaje.get('nivel_general') == 'COMPLETO': continue 
         
         texto = mensaje.get('contenido', '')
-        linea_msg = mensaje.get('linea', '').lower().replace(' ', '_')
+        linea_msg = alcance_linea(mensaje.get('linea', ''))
         
         cambio_realizado = False
         
-        for regla in reglas:
-            # 1. Verificar alcance (Global o misma línea)
-            if regla['origen_archivo'] != 'global' and regla['origen_archivo'] != linea_msg:
-                continue
-                
-            # 2. Verificar regex
-            regex = regla.get('regex_sugerido', '')
-            if not regex: continue
+        # Solo reglas de alcance global o de la misma línea, en orden de prioridad
+        for _prioridad, regla, accion in motor.iterar_coincidencias(texto, linea_msg):
+            # ¡Coincidencia! Aplicar acción
             
-            try:
-                match = re.search(regex, texto, re.IGNORECASE | re.UNICODE)
-                if match:
-                    # ¡Coincidencia! Aplicar acción
-                    accion = regla.get('accion_sugerida') or regla.get('accion')
-                    
-                    # Guardar estado anterior para log
-                    estado_anterior = mensaje.get('nivel_general', 'N/A')
-                    
-                    if accion == 'aprobar_sin_obs':
-                        mensaje['nivel_general'] = 'COMPLETO'
-                        # Si estaba reportado, lo limpiamos
-                        if mensaje.get('estado') == 'DERIVADO_A_ARIEL':
-                            mensaje['estado'] = 'PENDIENTE'
-                        
-                        # Limpiar errores del sistema (Importante)
-                        if 'clasificacion' in mensaje:
-                            mensaje['clasificacion']['IMPORTANTE'] = [] # Limpiar errores
-                            mensaje['clasificacion']['OBSERVACIONES'] = [] # Limpiar obs
-                            
-                    elif accion == 'aprobar_con_obs':
-                        mensaje['nivel_general'] = 'OBSERVACIONES'
-                        if mensaje.get('estado') == 'DERIVADO_A_ARIEL':
-                            mensaje['estado'] = 'PENDIENTE'
+            # Guardar estado anterior para log
+            estado_anterior = mensaje.get('nivel_general', 'N/A')
+            
+            if accion == 'aprobar_sin_obs':
+                mensaje['nivel_general'] = 'COMPLETO'
+                # Si estaba reportado, lo limpiamos
+                if mensaje.get('estado') == 'DERIVADO_A_ARIEL':
+                    mensaje['estado'] = 'PENDIENTE'
+                
+                # Limpiar errores del sistema (Importante)
+                if 'clasificacion' in mensaje:
+                    mensaje['clasificacion']['IMPORTANTE'] = [] # Limpiar errores
+                    mensaje['clasificacion']['OBSERVACIONES'] = [] # Limpiar obs
                     
-                    if mensaje.get('nivel_general') != estado_anterior:
-                         print(f"✅ Mensaje {mensaje['id']} ({linea_msg}) corregido por regla '{regla['patron_detectado']}'")
-                         cambio_realizado = True
-                         contador_afectados += 1
-                         break # Una regla es suficiente, pasamos al siguiente mensaje
-                         
-            except Exception as e:
-                # print(f"Error regex en mensaje {mensaje['id']}: {e}")
-                pass
+            elif accion == 'aprobar_con_obs':
+                mensaje['nivel_general'] = 'OBSERVACIONES'
+                if mensaje.get('estado') == 'DERIVADO_A_ARIEL':
+                    mensaje['estado'] = 'PENDIENTE'
+            
+            if mensaje.get('nivel_general') != estado_anterior:
+                 print(f"✅ Mensaje {mensaje['id']} ({linea_msg}) corregido por regla '{regla['patron_detectado']}'")
+                 cambio_realizado = True
+                 contador_afectados += 1
+                 break # Una regla es suficiente, pasamos al siguiente mensaje
                 
     if contador_afectados > 0:
         print(f"\n✨ Se actualizaron {contador_afectados} mensajes por las reglas personalizadas.")
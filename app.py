@@ -1,7 +1,9 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, request, jsonify, session, send_from_directory, Response
 from flask_cors import CORS
-from gestor_tandas import GestorTandas
+import gestor_tandas
 import validador_mensajes
+import analizador_reglas
+import motores_validador
 import os
 import json
 import threading
@@ -29,7 +31,45 @@ CORS(app, supports_credentials=True, origins=[
     "https://portalvpn.sofse.gob.ar",
 ])
 
-gestor = GestorTandas()
+gestor = gestor_tandas.crear_gestor()
+
+# Cada worker de gunicorn tiene su propio cache de reglas: si otro worker
+# crea o edita una, se nota en los archivos y se recarga acá también. Se
+# revisa solo en /api/ (no en estáticos ni /health) y como mucho cada
+# REGLAS_INTERVALO_CHEQUEO segundos, como las configs de línea
+REGLAS_INTERVALO_CHEQUEO = validador_mensajes.CONFIG_INTERVALO_CHEQUEO
+
+def firma_reglas():
+    """(ruta, mtime, tamaño) de cada personalizadas.json"""
+    firma = []
+    for ruta in sorted(Path('configs/reglas').glob('*/personalizadas.json')):
+        try:
+            datos = ruta.stat()
+        except FileNotFoundError:
+            continue
+        firma.append((str(ruta), datos.st_mtime_ns, datos.st_size))
+    return tuple(firma)
+
+_FIRMA_REGLAS = firma_reglas()
+_FIRMA_REGLAS_CHEQUEADA = time.monotonic()
+_FIRMA_REGLAS_LOCK = threading.Lock()
+
+@app.before_request
+def reglas_al_dia():
+    global _FIRMA_REGLAS, _FIRMA_REGLAS_CHEQUEADA
+    if not request.path.startswith('/api/'):
+        return
+    ahora = time.monotonic()
+    with _FIRMA_REGLAS_LOCK:
+        if ahora - _FIRMA_REGLAS_CHEQUEADA < REGLAS_INTERVALO_CHEQUEO:
+            return
+        _FIRMA_REGLAS_CHEQUEADA = ahora
+    firma = firma_reglas()
+    with _FIRMA_REGLAS_LOCK:
+        if firma == _FIRMA_REGLAS:
+            return
+        _FIRMA_REGLAS = firma
+    motores_validador.recargar_reglas()
 
 # ============================================
 # KEEP-ALIVE PING (evita que Render duerma)
@@ -59,8 +99,8 @@ USUARIOS = {
     'diego': {'password': 'diego123', 'nombre': 'Diego'}
 }
 
-def cargar_todas_las_reglas():
-    """Carga todas las reglas activas de todos los archivos"""
+def cargar_todas_las_reglas(incluir_inactivas=False):
+    """Carga todas las reglas activas de todos los archivos (o todas, para modificarlas)"""
     todas = []
     rutas = [
         'configs/reglas/globales/personalizadas.json',
@@ -76,7 +116,7 @@ def cargar_todas_las_reglas():
         if os.path.exists(ruta):
             with open(ruta, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                reglas = [r for r in data.get('reglas', []) if r.get('activa', True)]
+                reglas = [r for r in data.get('reglas', []) if incluir_inactivas or r.get('activa', True)]
                 for r in reglas:
                     r['_archivo'] = ruta
                 todas.extend(reglas)
@@ -180,32 +220,33 @@ def validar_mensaje():
     comentario = data.get('comentario', '')
     print(f"🔍 DEBUG VALIDAR - mensaje_id={mensaje_id}, accion={accion}, comentario={comentario[:50] if comentario else 'N/A'}")
     
-    # Buscar mensaje
-    mensaje = next((m for m in gestor.mensajes if m['id'] == mensaje_id), None)
+    usuario = session['nombre']
+
+    def registrar_validacion(mensaje):
+        if accion == 'ENVIAR':
+            # Sistema acertó - enviar email según clasificación
+            mensaje['estado'] = 'COMPLETADO'
+            mensaje['procesado_por'] = usuario
+            mensaje['procesado_en'] = datetime.now().isoformat()
+            mensaje['validado_como'] = 'CORRECTO'
+            
+            # TODO: Aquí llamar función que envía email al operador
+            # enviar_email_operador(mensaje)
+            
+        elif accion in ['REPORTAR_ERROR', 'REPORTAR']:
+            # Sistema se equivocó - derivar a Ariel
+            mensaje['estado'] = 'DERIVADO_A_ARIEL'
+            mensaje['derivado_por'] = usuario
+            mensaje['derivado_en'] = datetime.now().isoformat()
+            mensaje['comentario_validador'] = comentario
+            print(f"✅ Mensaje {mensaje_id} derivado a Ariel por {usuario}")
+            # NO se envía email al operador
+    
+    # Buscar y modificar en una sola transacción (otro worker puede estar tocando el mismo mensaje)
+    mensaje = gestor.modificar_mensaje(mensaje_id, registrar_validacion, gestor_tandas.operacion_de_accion(accion))
     if not mensaje:
         return jsonify({'ok': False}), 404
     
-    if accion == 'ENVIAR':
-        # Sistema acertó - enviar email según clasificación
-        mensaje['estado'] = 'COMPLETADO'
-        mensaje['procesado_por'] = session['nombre']
-        mensaje['procesado_en'] = datetime.now().isoformat()
-        mensaje['validado_como'] = 'CORRECTO'
-        
-        # TODO: Aquí llamar función que envía email al operador
-        # enviar_email_operador(mensaje)
-        
-    elif accion in ['REPORTAR_ERROR', 'REPORTAR']:
-        # Sistema se equivocó - derivar a Ariel
-        mensaje['estado'] = 'DERIVADO_A_ARIEL'
-        mensaje['derivado_por'] = session['nombre']
-        mensaje['derivado_en'] = datetime.now().isoformat()
-        mensaje['comentario_validador'] = comentario
-        print(f"✅ Mensaje {mensaje_id} derivado a Ariel por {session['nombre']}")
-        # NO se envía email al operador
-    
-    gestor._guardar_mensajes()
-    
     # Contar mensajes restantes
     restantes = gestor.contar_asignados(session['nombre'])
     
@@ -224,7 +265,7 @@ def validar_mensaje():
 def obtener_errores():
     if session.get('nombre') != 'Ariel':
         return jsonify({'ok': False}), 403
-    errores = [m for m in gestor.mensajes if m['estado'] == 'DERIVADO_A_ARIEL']
+    errores = gestor.mensajes_por_estado('DERIVADO_A_ARIEL')
     return jsonify({'ok': True, 'errores': errores})
 
 @app.route('/api/errores/desbloquear', methods=['POST'])
@@ -232,11 +273,11 @@ def desbloquear_mensaje():
     if session.get('nombre') != 'Ariel':
         return jsonify({'ok': False}), 403
     data = request.get_json()
-    mensaje = next((m for m in gestor.mensajes if m['id'] == data.get('mensaje_id')), None)
+    mensaje = gestor.modificar_mensaje(
+        data.get('mensaje_id'), lambda m: m.update({'estado': 'PENDIENTE'}), 'desbloquear'
+    )
     if not mensaje:
         return jsonify({'ok': False}), 404
-    mensaje['estado'] = 'PENDIENTE'
-    gestor._guardar_mensajes()
     return jsonify({'ok': True})
 
 @app.route('/api/errores/devolver', methods=['POST'])
@@ -249,22 +290,21 @@ def devolver_mensaje():
     mensaje_id = data.get('mensaje_id')
     explicacion = data.get('explicacion', '')
     
-    mensaje = next((m for m in gestor.mensajes if m['id'] == mensaje_id), None)
+    def devolver(mensaje):
+        # Devolver a quien lo derivó originalmente
+        validador_original = mensaje.get('derivado_por', 'Patricia')
+        
+        mensaje['estado'] = f'ASIGNADO_{validador_original.upper()}'
+        mensaje['bloqueado'] = True
+        mensaje['explicacion_ariel'] = explicacion
+        mensaje['bloqueado_en'] = datetime.now().isoformat()
+    
+    mensaje = gestor.modificar_mensaje(mensaje_id, devolver, 'devolver')
     
     if not mensaje:
         return jsonify({'ok': False}), 404
     
-    # Devolver a quien lo derivó originalmente
-    validador_original = mensaje.get('derivado_por', 'Patricia')
-    
-    mensaje['estado'] = f'ASIGNADO_{validador_original.upper()}'
-    mensaje['bloqueado'] = True
-    mensaje['explicacion_ariel'] = explicacion
-    mensaje['bloqueado_en'] = datetime.now().isoformat()
-    
-    gestor._guardar_mensajes()
-    
-    print(f"✅ Mensaje {mensaje_id} devuelto BLOQUEADO a {validador_original}")
+    print(f"✅ Mensaje {mensaje_id} devuelto BLOQUEADO a {mensaje.get('derivado_por', 'Patricia')}")
     
     return jsonify({'ok': True})
 
@@ -406,11 +446,20 @@ def crear_regla():
     data = request.get_json()
     regla = data.get('regla')
     
+    # Chequeo de seguridad del regex antes de guardarlo
+    analisis = analizador_reglas.analizar_regla(regla.get('regex_sugerido', ''))
+    if analisis['veredicto'] == analizador_reglas.VEREDICTO_RECHAZADA:
+        print(f"❌ Regla rechazada: {analisis['motivos']}")
+        return jsonify({'ok': False, 'error': 'Regex rechazado', 'analisis_seguridad': analisis}), 400
+    en_cuarentena = analisis['veredicto'] == analizador_reglas.VEREDICTO_CUARENTENA
+    
     # Generar ID único
     import uuid
     regla['id'] = str(uuid.uuid4())[:8]
     regla['fecha_creacion'] = datetime.now().isoformat()
-    regla['activa'] = True
+    regla['activa'] = not en_cuarentena
+    regla['cuarentena'] = en_cuarentena
+    regla['analisis_seguridad'] = analisis
     
     # Guardar en archivo correspondiente
     # Normalizar nombre de carpeta
@@ -454,15 +503,28 @@ def crear_regla():
     with open(ruta_reglas, 'w', encoding='utf-8') as f:
         json.dump(data_reglas, f, indent=2, ensure_ascii=False)
     
+    if en_cuarentena:
+        print(f"⚠️ Regla '{regla['patron_detectado']}' guardada en cuarentena: {analisis['motivos']}")
+        return jsonify({
+            'ok': True,
+            'regla_id': regla['id'],
+            'cuarentena': True,
+            'analisis_seguridad': analisis,
+            'mensajes_afectados': 0,
+            'mensajes_resueltos': 0,
+            'mensajes_reclasificados': 0
+        })
+    
     # Re-validar mensajes afectados
     # 1. Limpiar cache para cargar la regla nueva
-    validador_mensajes.recargar_reglas()
+    motores_validador.recargar_reglas()
     
     mensajes_resueltos = 0
     mensajes_reclasificados = 0
     
     import re as re_module
 
+    candidatos = []
     for mensaje in gestor.mensajes:
         # Solo verificar mensajes relevantes (no completados ni bloqueados por otro motivo)
         # Nota: 'bloqueado' es un flag, no un estado.
@@ -471,40 +533,49 @@ def crear_regla():
                 # Usar regex de la regla para filtrar candidatos (optimización)
                 regex = regla.get('regex_sugerido', '')
                 if regex and re_module.search(regex, mensaje['contenido'], re_module.IGNORECASE | re_module.UNICODE):
-                    
-                    # 2. Re-valida completamente usando el motor real
-                    nuevo_reporte = validador_mensajes.procesar_mensaje(mensaje)
-                    
-                    old_nivel = mensaje.get('nivel_general', '')
-                    new_nivel = nuevo_reporte.get('nivel_general', '')
-                    
-                    # 3. Actualizar campos del mensaje en memoria
-                    mensaje.update({
-                        'clasificacion': nuevo_reporte['clasificacion'],
-                        'nivel_general': new_nivel,
-                        'scores': nuevo_reporte['scores'],
-                        'componentes': nuevo_reporte['componentes'],
-                        'timing': nuevo_reporte['timing'],
-                        # Agregar info de regla aplicada si existe
-                        'regla_personalizada_aplicada': nuevo_reporte.get('regla_personalizada_aplicada')
-                    })
-                    
-                    # 4. Lógica de resolución de estados
-                    if mensaje['estado'] == 'DERIVADO_A_ARIEL':
-                        # Si estaba reportado y ahora pasa (o tiene observaciones aceptables)
-                        if new_nivel in ['COMPLETO', 'OBSERVACIONES']:
-                            mensaje['estado'] = 'PENDIENTE'
-                            mensajes_resueltos += 1
-                            print(f"✅ Mensaje {mensaje.get('id')} resuelto/desbloqueado por regla nueva")
-                    else:
-                        if old_nivel != new_nivel:
-                            mensajes_reclasificados += 1
-                            
+                    candidatos.append(mensaje)
             except Exception as e:
                 print(f"⚠️ Error re-validando mensaje {mensaje.get('id')}: {e}")
                 continue
+
+    # 2. Re-valida completamente usando el motor real (en lote)
+    reportes = motores_validador.motor_principal().procesar_lote(candidatos)
+    reportes_por_id = {
+        mensaje.get('id'): reporte for mensaje, reporte in zip(candidatos, reportes) if reporte is not None
+    }
+
+    def aplicar_reporte(mensaje):
+        nonlocal mensajes_resueltos, mensajes_reclasificados
+        nuevo_reporte = reportes_por_id[mensaje.get('id')]
+        
+        old_nivel = mensaje.get('nivel_general', '')
+        new_nivel = nuevo_reporte.get('nivel_general', '')
+        
+        # 3. Actualizar campos del mensaje en memoria
+        mensaje.update({
+            'clasificacion': nuevo_reporte['clasificacion'],
+            'nivel_general': new_nivel,
+            'scores': nuevo_reporte['scores'],
+            'componentes': nuevo_reporte['componentes'],
+            'timing': nuevo_reporte['timing'],
+            # Agregar info de regla aplicada si existe
+            'regla_personalizada_aplicada': nuevo_reporte.get('regla_personalizada_aplicada')
+        })
+        
+        # 4. Lógica de resolución de estados
+        if mensaje['estado'] == 'DERIVADO_A_ARIEL':
+            # Si estaba reportado y ahora pasa (o tiene observaciones aceptables)
+            if new_nivel in ['COMPLETO', 'OBSERVACIONES']:
+                mensaje['estado'] = 'PENDIENTE'
+                mensajes_resueltos += 1
+                print(f"✅ Mensaje {mensaje.get('id')} resuelto/desbloqueado por regla nueva")
+        else:
+            if old_nivel != new_nivel:
+                mensajes_reclasificados += 1
     
-    gestor._guardar_mensajes()
+    # Sobre el estado actual: otro worker pudo asignar o derivar alguno mientras se validaba
+    gestor.modificar_mensajes(list(reportes_por_id), aplicar_reporte, 'revalidar')
+    gestor.sincronizar()
     
     print(f"✅ Regla '{regla['patron_detectado']}' creada. Afectados: {mensajes_resueltos + mensajes_reclasificados}")
     
@@ -544,11 +615,24 @@ def modificar_regla(regla_id):
     data = request.get_json()
     actualizaciones = data.get('actualizaciones', {})
 
-    todas_reglas = cargar_todas_las_reglas()
+    todas_reglas = cargar_todas_las_reglas(incluir_inactivas=True)
     regla_encontrada = False
 
     for regla in todas_reglas:
         if regla.get('id') == regla_id:
+            # Un regex nuevo pasa por el mismo chequeo de seguridad que al crear
+            if 'regex_sugerido' in actualizaciones:
+                analisis = analizador_reglas.analizar_regla(actualizaciones['regex_sugerido'])
+                if analisis['veredicto'] == analizador_reglas.VEREDICTO_RECHAZADA:
+                    print(f"❌ Modificación de regla '{regla_id}' rechazada: {analisis['motivos']}")
+                    return jsonify({'ok': False, 'error': 'Regex rechazado', 'analisis_seguridad': analisis}), 400
+                en_cuarentena = analisis['veredicto'] == analizador_reglas.VEREDICTO_CUARENTENA
+                if en_cuarentena or regla.get('cuarentena'):
+                    # Sale de cuarentena solo si el regex nuevo pasa el chequeo
+                    regla['activa'] = not en_cuarentena
+                regla['cuarentena'] = en_cuarentena
+                regla['analisis_seguridad'] = analisis
+
             # Actualizar campos permitidos
             campos_permitidos = ['regex_sugerido', 'accion_sugerida', 'tipo', 'patron_detectado']
             for campo in campos_permitidos:
@@ -574,7 +658,7 @@ def modificar_regla(regla_id):
                     json.dump(contenido, f, indent=2, ensure_ascii=False)
 
                 # Re-validar mensajes
-                validador_mensajes.recargar_reglas()
+                motores_validador.recargar_reglas()
 
                 print(f"✅ Regla '{regla_id}' modificada exitosamente")
                 return jsonify({
@@ -591,39 +675,44 @@ def aplicar_reglas_todas():
     if session.get('nombre') != 'Ariel':
         return jsonify({'ok': False}), 403
 
-    validador_mensajes.recargar_reglas()
+    motores_validador.recargar_reglas()
 
     mensajes_resueltos = 0
     mensajes_reclasificados = 0
 
-    for mensaje in gestor.mensajes:
-        if mensaje['estado'] in ['PENDIENTE', 'ASIGNADO_PATRICIA', 'ASIGNADO_DIEGO', 'ASIGNADO_ARIEL', 'DERIVADO_A_ARIEL']:
-            try:
-                nuevo_reporte = validador_mensajes.procesar_mensaje(mensaje)
+    candidatos = [
+        m for m in gestor.mensajes
+        if m['estado'] in ['PENDIENTE', 'ASIGNADO_PATRICIA', 'ASIGNADO_DIEGO', 'ASIGNADO_ARIEL', 'DERIVADO_A_ARIEL']
+    ]
+    reportes = motores_validador.motor_principal().procesar_lote(candidatos)
+    reportes_por_id = {
+        mensaje.get('id'): reporte for mensaje, reporte in zip(candidatos, reportes) if reporte is not None
+    }
 
-                old_nivel = mensaje.get('nivel_general', '')
-                new_nivel = nuevo_reporte.get('nivel_general', '')
+    def aplicar_reporte(mensaje):
+        nonlocal mensajes_resueltos, mensajes_reclasificados
+        nuevo_reporte = reportes_por_id[mensaje.get('id')]
 
-                mensaje.update({
-                    'clasificacion': nuevo_reporte['clasificacion'],
-                    'nivel_general': new_nivel,
-                    'scores': nuevo_reporte['scores'],
-                    'componentes': nuevo_reporte['componentes']
-                })
+        old_nivel = mensaje.get('nivel_general', '')
+        new_nivel = nuevo_reporte.get('nivel_general', '')
 
-                if mensaje['estado'] == 'DERIVADO_A_ARIEL':
-                    if new_nivel in ['COMPLETO', 'OBSERVACIONES']:
-                        mensaje['estado'] = 'PENDIENTE'
-                        mensajes_resueltos += 1
-                else:
-                    if old_nivel != new_nivel:
-                        mensajes_reclasificados += 1
+        mensaje.update({
+            'clasificacion': nuevo_reporte['clasificacion'],
+            'nivel_general': new_nivel,
+            'scores': nuevo_reporte['scores'],
+            'componentes': nuevo_reporte['componentes']
+        })
 
-            except Exception as e:
-                print(f"⚠️ Error re-validando {mensaje.get('id')}: {e}")
-                continue
+        if mensaje['estado'] == 'DERIVADO_A_ARIEL':
+            if new_nivel in ['COMPLETO', 'OBSERVACIONES']:
+                mensaje['estado'] = 'PENDIENTE'
+                mensajes_resueltos += 1
+        else:
+            if old_nivel != new_nivel:
+                mensajes_reclasificados += 1
 
-    gestor._guardar_mensajes()
+    gestor.modificar_mensajes(list(reportes_por_id), aplicar_reporte, 'revalidar')
+    gestor.sincronizar()
 
     return jsonify({
         'ok': True,
@@ -637,6 +726,52 @@ def aplicar_reglas_todas():
 # PANEL DE SCRAPING VPN
 # ============================================
 
+def validar_e_importar(mensajes_recibidos, ids_existentes, linea_fija=None):
+    """
+    Deduplica, valida en lote y convierte los mensajes recibidos.
+    Si no se pasa linea_fija se usa la del mensaje (o San Martín por defecto).
+
+    Returns: (mensajes_nuevos, duplicados, errores)
+    """
+    duplicados = 0
+    errores = 0
+    candidatos = []
+
+    for msg in mensajes_recibidos:
+        id_raw = str(msg.get('id_mensaje', '') or msg.get('numero_mensaje', '')).lstrip('0') or '0'
+
+        if not id_raw or id_raw == '0':
+            errores += 1
+            continue
+
+        if id_raw in ids_existentes:
+            duplicados += 1
+            continue
+
+        candidatos.append((id_raw, msg))
+
+    # Motor configurado; si hay motor sombra compara en segundo plano
+    reportes = motores_validador.validar_lote([msg for _, msg in candidatos])
+
+    mensajes_nuevos = []
+    for (id_raw, msg), reporte in zip(candidatos, reportes):
+        if id_raw in ids_existentes:
+            duplicados += 1  # Repetido dentro del mismo batch
+            continue
+        if reporte is None:
+            errores += 1
+            continue
+
+        linea_nombre = linea_fija or msg.get('linea', '') or 'Línea San Martín'
+        try:
+            mensajes_nuevos.append(transformar_mensaje_scrapeado(msg, reporte, linea_nombre))
+            ids_existentes.add(id_raw)  # Evitar duplicados dentro del mismo batch
+        except Exception as e:
+            print(f"⚠️  Error procesando mensaje {id_raw}: {e}")
+            errores += 1
+
+    return mensajes_nuevos, duplicados, errores
+
 def transformar_mensaje_scrapeado(msg_scraper: dict, reporte: dict, linea_nombre: str) -> dict:
     """Convierte el dict del scraper al formato del sistema (mensajes_estado.json)"""
     # ID formateado con ceros a la izquierda (8 dígitos)
@@ -703,40 +838,19 @@ def scraping_san_martin():
 
     # Deduplicación: comparar id_mensaje (scraper) vs id (sistema, zero-padded)
     ids_existentes = set()
-    for m in gestor.mensajes:
-        raw = m.get('id', '').lstrip('0') or '0'
+    for id_mensaje in gestor.ids_mensajes():
+        raw = (id_mensaje or '').lstrip('0') or '0'
         ids_existentes.add(raw)
 
     LINEA_SAN_MARTIN = 'Línea San Martín'
-    nuevos    = 0
-    duplicados = 0
-    errores    = 0
-    mensajes_nuevos = []
-
-    for msg in mensajes_scrapeados:
-        id_raw = str(msg.get('id_mensaje', '') or msg.get('numero_mensaje', '')).lstrip('0') or '0'
-
-        if not id_raw or id_raw == '0':
-            errores += 1
-            continue
-
-        if id_raw in ids_existentes:
-            duplicados += 1
-            continue
-
-        try:
-            reporte = validador_mensajes.procesar_mensaje(msg)
-            msg_sistema = transformar_mensaje_scrapeado(msg, reporte, LINEA_SAN_MARTIN)
-            mensajes_nuevos.append(msg_sistema)
-            ids_existentes.add(id_raw)  # Evitar duplicados dentro del mismo batch
-            nuevos += 1
-        except Exception as e:
-            print(f"⚠️  Error procesando mensaje {id_raw}: {e}")
-            errores += 1
+    mensajes_nuevos, duplicados, errores = validar_e_importar(
+        mensajes_scrapeados, ids_existentes, linea_fija=LINEA_SAN_MARTIN
+    )
+    nuevos = len(mensajes_nuevos)
 
     if mensajes_nuevos:
-        gestor.mensajes.extend(mensajes_nuevos)
-        gestor._guardar_mensajes()
+        gestor.agregar_mensajes(mensajes_nuevos)
+        gestor.sincronizar()
 
     print(f"🚂 Scraping San Martín por {session['nombre']}: "
           f"{nuevos} nuevos, {duplicados} duplicados, {errores} errores")
@@ -777,42 +891,16 @@ def importar_mensajes_bookmarklet():
 
     # Deduplicación: comparar ids
     ids_existentes = set()
-    for m in gestor.mensajes:
-        raw = m.get('id', '').lstrip('0') or '0'
+    for id_mensaje in gestor.ids_mensajes():
+        raw = (id_mensaje or '').lstrip('0') or '0'
         ids_existentes.add(raw)
 
-    nuevos = 0
-    duplicados = 0
-    errores = 0
-    mensajes_nuevos = []
-
-    for msg in mensajes_recibidos:
-        id_raw = str(msg.get('id_mensaje', '') or msg.get('numero_mensaje', '')).lstrip('0') or '0'
-
-        if not id_raw or id_raw == '0':
-            errores += 1
-            continue
-
-        if id_raw in ids_existentes:
-            duplicados += 1
-            continue
-
-        # Inferir nombre de línea desde el mensaje o usar default
-        linea_nombre = msg.get('linea', '') or 'Línea San Martín'
-
-        try:
-            reporte = validador_mensajes.procesar_mensaje(msg)
-            msg_sistema = transformar_mensaje_scrapeado(msg, reporte, linea_nombre)
-            mensajes_nuevos.append(msg_sistema)
-            ids_existentes.add(id_raw)
-            nuevos += 1
-        except Exception as e:
-            print(f"⚠️  Error procesando mensaje {id_raw}: {e}")
-            errores += 1
+    mensajes_nuevos, duplicados, errores = validar_e_importar(mensajes_recibidos, ids_existentes)
+    nuevos = len(mensajes_nuevos)
 
     if mensajes_nuevos:
-        gestor.mensajes.extend(mensajes_nuevos)
-        gestor._guardar_mensajes()
+        gestor.agregar_mensajes(mensajes_nuevos)
+        gestor.sincronizar()
 
     print(f"📋 Bookmarklet import: {nuevos} nuevos, {duplicados} duplicados, {errores} errores")
 
@@ -888,41 +976,16 @@ def scraping_extraer():
 
     # Deduplicación (misma lógica que los otros endpoints)
     ids_existentes = set()
-    for m in gestor.mensajes:
-        raw = m.get('id', '').lstrip('0') or '0'
+    for id_mensaje in gestor.ids_mensajes():
+        raw = (id_mensaje or '').lstrip('0') or '0'
         ids_existentes.add(raw)
 
-    nuevos = 0
-    duplicados = 0
-    errores = 0
-    mensajes_nuevos = []
-
-    for msg in resultado['mensajes']:
-        id_raw = str(msg.get('id_mensaje', '') or msg.get('numero_mensaje', '')).lstrip('0') or '0'
-
-        if not id_raw or id_raw == '0':
-            errores += 1
-            continue
-
-        if id_raw in ids_existentes:
-            duplicados += 1
-            continue
-
-        linea_nombre = msg.get('linea', '') or 'Línea San Martín'
-
-        try:
-            reporte = validador_mensajes.procesar_mensaje(msg)
-            msg_sistema = transformar_mensaje_scrapeado(msg, reporte, linea_nombre)
-            mensajes_nuevos.append(msg_sistema)
-            ids_existentes.add(id_raw)
-            nuevos += 1
-        except Exception as e:
-            print(f"⚠️  Error procesando mensaje {id_raw}: {e}")
-            errores += 1
+    mensajes_nuevos, duplicados, errores = validar_e_importar(resultado['mensajes'], ids_existentes)
+    nuevos = len(mensajes_nuevos)
 
     if mensajes_nuevos:
-        gestor.mensajes.extend(mensajes_nuevos)
-        gestor._guardar_mensajes()
+        gestor.agregar_mensajes(mensajes_nuevos)
+        gestor.sincronizar()
 
     print(f"🚂 Extracción CDP por {session['nombre']}: "
           f"{nuevos} nuevos, {duplicados} duplicados, {errores} errores | {resultado.get('url', '')}")
@@ -959,7 +1022,61 @@ def health():
         'status': 'ok',
         'timestamp': datetime.now().isoformat(),
         'environment': 'render' if os.environ.get('RENDER') else 'local',
-        'deploy_version': 'v2-dynamic-html'
+        'deploy_version': 'v2-dynamic-html',
+        'config_cache': validador_mensajes.estadisticas_config(),
+        'reglas_suspendidas': validador_mensajes.obtener_motor_reglas().suspendidas,
+        'cache_reportes': validador_mensajes.cache_reportes.obtener_cache().estadisticas()
+    })
+
+@app.route('/api/admin/perfil', methods=['GET', 'POST'])
+def perfil_validador():
+    """
+    Tiempos por etapa de validar_mensaje_ROCA y por regla personalizada.
+    GET: resumen (?formato=flamegraph para collapsed stacks).
+    POST {"accion": "activar" | "desactivar" | "limpiar"}
+    """
+    if session.get('nombre') != 'Ariel':
+        return jsonify({'ok': False}), 403
+
+    perfil = validador_mensajes.perfilador.obtener_perfilador()
+    if request.method == 'POST':
+        accion = (request.get_json(silent=True) or {}).get('accion')
+        if accion == 'activar':
+            perfil.activo = True
+        elif accion == 'desactivar':
+            perfil.activo = False
+        elif accion == 'limpiar':
+            perfil.limpiar()
+        else:
+            return jsonify({'ok': False, 'error': 'accion debe ser activar, desactivar o limpiar'}), 400
+        print(f"⏱️ Perfil del validador: {accion} por {session['nombre']}")
+    elif request.args.get('formato') == 'flamegraph':
+        return Response('\n'.join(perfil.lineas_flamegraph()) + '\n', mimetype='text/plain')
+
+    # Perfil del proceso que atiende el pedido (cada worker de gunicorn tiene el suyo)
+    return jsonify({'ok': True, 'pid': os.getpid(), **perfil.resumen()})
+
+@app.route('/api/admin/motor-sombra', methods=['GET', 'POST'])
+def motor_sombra():
+    """
+    Comparación del motor sombra contra el principal en las importaciones:
+    tasa de diferencias, latencias y últimos mensajes distintos.
+    POST {"accion": "limpiar"} reinicia los contadores.
+    """
+    if session.get('nombre') != 'Ariel':
+        return jsonify({'ok': False}), 403
+
+    sombra = motores_validador.obtener_sombra()
+    if request.method == 'POST' and sombra is not None:
+        if (request.get_json(silent=True) or {}).get('accion') != 'limpiar':
+            return jsonify({'ok': False, 'error': 'accion debe ser limpiar'}), 400
+        sombra.limpiar()
+
+    return jsonify({
+        'ok': True,
+        'pid': os.getpid(),
+        'motor_principal': motores_validador.nombre_principal(),
+        'sombra': sombra.resumen() if sombra is not None else None,
     })
 
 @app.route('/debug-assets', methods=['GET'])
@@ -0,0 +1,31 @@
+"""
+benchmarks — Velocidad del validador sobre el histórico
+=======================================================
+Pasa los corpus históricos (lote_revision_historico.json,
+lote_aprobados_historico.json, data/mensajes_estado.json) y copias
+escaladas de ellos por procesar_mensaje, y mide:
+
+  - mensajes por segundo (mejor de N repeticiones)
+  - latencia por mensaje p50/p99
+  - latencia p50/p99 de cada etapa de validar_mensaje_ROCA
+  - pico de memoria (tracemalloc) y RSS máximo del proceso
+
+El cache de reportes se apaga: se mide la validación, no el cache.
+Corre offline. Modo 'respaldo' fuerza la ortografía por regex + SymSpell;
+modo 'languagetool' usa el pool real (se saltea si no puede arrancar, por
+ejemplo sin Java o sin LanguageTool descargado).
+
+USO:
+    python -m benchmarks                       # mide y compara con el baseline
+    python -m benchmarks --guardar             # mide y guarda el baseline
+    python -m benchmarks --corrector ambos --escalas 1,10 --umbral 0.15
+
+Sale con código 1 si algún caso cae más de --umbral (15% por defecto)
+respecto del baseline en mensajes por segundo.
+
+Para verificar que una optimización no cambia los reportes, ver
+benchmarks/equivalencia.py (snapshots dorados en benchmarks/golden/).
+Para el corrector en proceso (palabras comunes que no se marcan, typos que
+sí), benchmarks/ortografia.py. Para el almacenamiento de mensajes (paridad
+JSON/SQLite, índices, bitácora y compactación), benchmarks/almacenamiento.py.
+"""
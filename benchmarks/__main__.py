@@ -0,0 +1,129 @@
+"""python -m benchmarks — ver benchmarks/__init__.py"""
+
+import os
+import sys
+import json
+import argparse
+
+# Se mide la validación, no el cache de reportes (antes de importar el validador)
+os.environ['VALIDADOR_CACHE_REPORTES'] = '0'
+os.environ.pop('VALIDADOR_CACHE_DISCO', None)
+os.environ.pop('VALIDADOR_PERFIL', None)
+
+from benchmarks import corpus
+from benchmarks.corpus import BASE_PATH
+from benchmarks import medicion
+import validador_mensajes
+
+DIR_BASELINES = os.path.join(BASE_PATH, 'benchmarks', 'baselines')
+UMBRAL_REGRESION = 0.15     # Caída tolerada en mensajes/segundo respecto del baseline
+VERSION_RESULTADOS = 1
+
+
+def ruta_baseline(modo):
+    return os.path.join(DIR_BASELINES, f'{modo}.json')
+
+
+def medir_modo(modo, nombres_corpus, escalas, repeticiones):
+    ok, motivo = medicion.preparar_corrector(modo)
+    if not ok:
+        print(f"⏭️ Modo {modo} salteado: {motivo}")
+        return None
+
+    resultados = {
+        'version': VERSION_RESULTADOS,
+        'corrector': modo,
+        'version_validador': validador_mensajes.VERSION_VALIDADOR,
+        'maquina': medicion.datos_maquina(),
+        'casos': {},
+    }
+    for nombre in nombres_corpus:
+        base = corpus.cargar_corpus(nombre)
+        if not base:
+            continue
+        medicion.calentar(base)
+        for escala in escalas:
+            caso = f'{nombre}x{escala}'
+            resultado = medicion.medir_caso(corpus.escalar(base, escala), repeticiones)
+            resultados['casos'][caso] = resultado
+            print(f"  {modo:<12} {caso:<28} {resultado['mensajes']:>6} msgs "
+                  f"{resultado['mensajes_por_segundo']:>9.1f} msg/s  "
+                  f"p50 {resultado['p50_ms']:.3f} ms  p99 {resultado['p99_ms']:.3f} ms  "
+                  f"pico {resultado['pico_memoria_kb']:.0f} KB")
+    resultados['rss_maximo_kb'] = medicion.rss_maximo_kb()
+    return resultados
+
+
+def comparar(resultados, baseline, umbral):
+    """Returns: lista de regresiones (caso, baseline, actual, caída)"""
+    regresiones = []
+    for caso, actual in resultados['casos'].items():
+        anterior = baseline['casos'].get(caso)
+        if not anterior or not anterior.get('mensajes_por_segundo'):
+            continue
+        caida = 1 - actual['mensajes_por_segundo'] / anterior['mensajes_por_segundo']
+        marca = '❌' if caida > umbral else '✅'
+        print(f"  {marca} {caso:<28} {anterior['mensajes_por_segundo']:>9.1f} → "
+              f"{actual['mensajes_por_segundo']:>9.1f} msg/s ({-caida:+.1%})")
+        if caida > umbral:
+            regresiones.append((caso, anterior['mensajes_por_segundo'], actual['mensajes_por_segundo'], caida))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del validador sobre el histórico')
+    parser.add_argument('--corrector', choices=medicion.MODOS + ('ambos',), default=medicion.MODO_RESPALDO,
+                        help='Ortografía medida (default: respaldo)')
+    parser.add_argument('--corpus', default=','.join(corpus.corpus_disponibles()),
+                        help='Corpus separados por coma (default: todos)')
+    parser.add_argument('--escalas', default='1,10', help='Copias de cada corpus (default: 1,10)')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--umbral', type=float, default=UMBRAL_REGRESION,
+                        help='Caída máxima tolerada en msg/s (default: 0.15)')
+    parser.add_argument('--guardar', action='store_true', help='Guardar como nuevo baseline')
+    parser.add_argument('--salida', help='Además, escribir los resultados en este JSON')
+    args = parser.parse_args()
+
+    # El validador resuelve Contingencias.xlsx y configs/ desde el directorio actual
+    os.chdir(BASE_PATH)
+
+    modos = medicion.MODOS if args.corrector == 'ambos' else (args.corrector,)
+    nombres_corpus = [n for n in args.corpus.split(',') if n]
+    escalas = [int(e) for e in args.escalas.split(',') if e]
+
+    regresiones = []
+    todos = {}
+    for modo in modos:
+        resultados = medir_modo(modo, nombres_corpus, escalas, args.repeticiones)
+        if resultados is None:
+            continue
+        todos[modo] = resultados
+
+        ruta = ruta_baseline(modo)
+        if args.guardar:
+            os.makedirs(DIR_BASELINES, exist_ok=True)
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+            print(f"💾 Baseline guardado: {ruta}")
+        elif os.path.exists(ruta):
+            with open(ruta, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('maquina') != resultados['maquina']:
+                print("⚠️ El baseline se midió en otra máquina: la comparación es orientativa")
+            print(f"📊 Comparación con {ruta} (umbral {args.umbral:.0%}):")
+            regresiones += comparar(resultados, baseline, args.umbral)
+        else:
+            print(f"ℹ️ Sin baseline para {modo} (correr con --guardar)")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(todos, f, indent=2, ensure_ascii=False)
+
+    if regresiones:
+        print(f"❌ {len(regresiones)} caso/s con regresión de throughput")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Chequeo del almacenamiento de mensajes (GestorTandas y GestorTandasSQLite)
+==========================================================================
+Los dos almacenes tienen que comportarse igual para app.py, y el de JSON
+tiene que poder reconstruirse desde snapshot + bitácora. Sobre una copia de
+data/mensajes_estado.json (repartida en varias líneas) se corre una
+secuencia fija de operaciones al azar (asignar, procesar, liberar,
+bloquear, devolver, guardar copias, importar, compactar) y se verifica:
+
+- Paridad: después de cada operación, todas las consultas dan lo mismo en
+  JSON y en SQLite.
+- Índices: los de GestorTandas son los mismos que se armarían desde cero
+  sobre su lista (en particular después de modificar_mensajes).
+- Copias: modificar lo que devuelven las consultas no cambia el gestor.
+- Bitácora: un gestor nuevo sobre los mismos archivos reproduce el estado,
+  también con una compactación cortada (quedó la rotada) y con una última
+  línea a medio escribir; al arrancar compacta y la bitácora queda vacía.
+
+Todo corre en un directorio temporal: no toca data/.
+
+USO:
+    python -m benchmarks.almacenamiento
+
+Sale con código 1 si algo no da lo esperado.
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+from datetime import datetime
+
+import gestor_tandas
+from gestor_tandas import GestorTandas
+from gestor_tandas_sqlite import GestorTandasSQLite
+from indices_mensajes import IndicesMensajes
+
+from benchmarks.corpus import CORPUS
+
+LINEAS = ('Línea San Martín (Manual)', 'Línea Roca', 'Línea Mitre')
+USUARIOS = ('Ariel', 'Patricia', 'Diego')
+ESTADOS = ('PENDIENTE', 'COMPLETADO', 'DERIVADO_A_ARIEL') + tuple(f'ASIGNADO_{u.upper()}' for u in USUARIOS)
+OPERACIONES = 300
+SEMILLA = 13
+
+
+class RelojFijo(datetime):
+    """asignado_en/procesado_en iguales en los dos almacenes"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 3, 1, 10, 0, 0)
+
+
+def mensajes_base():
+    """El estado de data/ repartido en varias líneas, con algunos bloqueados"""
+    with open(CORPUS['mensajes_estado'], 'r', encoding='utf-8') as f:
+        mensajes = json.load(f)
+    base = []
+    for i, mensaje in enumerate(mensajes):
+        mensaje = dict(mensaje)
+        mensaje['linea'] = LINEAS[i % len(LINEAS)]
+        mensaje['bloqueado'] = i % 7 == 0
+        base.append(mensaje)
+    return base
+
+
+def generar_operaciones(ids, semilla=SEMILLA, cantidad=OPERACIONES):
+    """Secuencia fija de operaciones, igual para los dos almacenes"""
+    rnd = random.Random(semilla)
+    operaciones = []
+    nuevos = 0
+    for _ in range(cantidad):
+        tipo = rnd.choice(('asignar', 'asignar', 'procesar', 'procesar', 'liberar', 'bloquear',
+                           'devolver', 'guardar', 'importar', 'compactar'))
+        if tipo == 'asignar':
+            operaciones.append((tipo, rnd.choice(USUARIOS), rnd.choice(LINEAS)))
+        elif tipo == 'procesar':
+            operaciones.append((tipo, rnd.choice(ids), rnd.choice(('ENVIAR', 'REPORTAR', 'OTRA')), rnd.choice(USUARIOS)))
+        elif tipo == 'liberar':
+            operaciones.append((tipo, rnd.choice(USUARIOS)))
+        elif tipo == 'bloquear':
+            operaciones.append((tipo, rnd.sample(ids, 4) + ['no-existe']))
+        elif tipo in ('devolver', 'guardar'):
+            operaciones.append((tipo, rnd.choice(ids), rnd.choice(ESTADOS)))
+        elif tipo == 'importar':
+            nuevos += 1
+            nuevo = {'id': f'nuevo-{nuevos}', 'contenido': f'MENSAJE NUEVO {nuevos}',
+                     'linea': rnd.choice(LINEAS), 'estado': 'PENDIENTE', 'asignado_a': None}
+            operaciones.append((tipo, [nuevo, {'id': rnd.choice(ids), 'estado': 'PENDIENTE'}]))
+            ids = ids + [nuevo['id']]
+        else:
+            operaciones.append((tipo,))
+    return operaciones
+
+
+def aplicar(gestor, operacion):
+    tipo = operacion[0]
+    if tipo == 'asignar':
+        gestor.asignar_tanda(operacion[1], operacion[2])
+    elif tipo == 'procesar':
+        gestor.procesar_mensaje(operacion[1], operacion[2], operacion[3])
+    elif tipo == 'liberar':
+        gestor.liberar_mensajes(operacion[1])
+    elif tipo == 'bloquear':
+        gestor.modificar_mensajes(operacion[1], lambda m: m.update(bloqueado=True), 'bloquear')
+    elif tipo == 'devolver':
+        def devolver(m, estado=operacion[2]):
+            m['estado'] = estado
+            m['asignado_a'] = estado.split('_', 1)[1].title() if estado.startswith('ASIGNADO_') else None
+            m['bloqueado'] = False
+        gestor.modificar_mensaje(operacion[1], devolver, 'devolver')
+    elif tipo == 'guardar':
+        mensaje = gestor.obtener_mensaje(operacion[1])
+        if mensaje is not None:
+            mensaje['estado'] = operacion[2]
+            mensaje['nivel_general'] = 'OBSERVACIONES'
+            gestor.guardar_mensajes([mensaje], 'revalidar')
+    elif tipo == 'importar':
+        gestor.agregar_mensajes([dict(m) for m in operacion[1]])
+    elif tipo == 'compactar' and isinstance(gestor, GestorTandas):
+        gestor.compactar()
+
+
+def consultas(gestor):
+    """Todo lo que app.py puede preguntarle a un gestor"""
+    resultado = {
+        'mensajes': gestor.mensajes,
+        'ids': gestor.ids_mensajes(),
+        'pendientes_por_linea': list(gestor.contar_pendientes_por_linea().items()),
+    }
+    for estado in ESTADOS:
+        resultado[f'estado {estado}'] = gestor.mensajes_por_estado(estado)
+    for usuario in USUARIOS + (None,):
+        resultado[f'asignados_a {usuario}'] = gestor.mensajes_asignados_a(usuario)
+    for usuario in USUARIOS:
+        resultado[f'contar_asignados {usuario}'] = gestor.contar_asignados(usuario)
+        resultado[f'bloqueados {usuario}'] = gestor.obtener_bloqueados(usuario)
+    return resultado
+
+
+def diferencias_consultas(a, b):
+    return [clave for clave in a if a[clave] != b.get(clave)]
+
+
+def indices_inconsistentes(gestor):
+    """Índices de GestorTandas que no coinciden con los armados desde cero"""
+    esperado = IndicesMensajes(gestor._mensajes)
+    return [
+        nombre for nombre in ('por_id', 'por_estado', 'por_linea_estado', 'por_asignado', '_claves')
+        if getattr(gestor.indices, nombre) != getattr(esperado, nombre)
+    ]
+
+
+def chequear_paridad_e_indices(directorio, fallas):
+    base = mensajes_base()
+    archivo_json = os.path.join(directorio, 'paridad.json')
+    with open(archivo_json, 'w', encoding='utf-8') as f:
+        json.dump(base, f, ensure_ascii=False)
+    gestor = GestorTandas(archivo_json)
+    sqlite = GestorTandasSQLite(os.path.join(directorio, 'paridad.db'), archivo_json)
+
+    inicial = consultas(gestor)
+    distintas = diferencias_consultas(inicial, consultas(sqlite))
+    if distintas:
+        fallas.append(f"Paridad al migrar: difieren {distintas[:5]}")
+
+    for numero, operacion in enumerate(generar_operaciones([m['id'] for m in base]), 1):
+        aplicar(gestor, operacion)
+        aplicar(sqlite, operacion)
+        inconsistentes = indices_inconsistentes(gestor)
+        if inconsistentes:
+            fallas.append(f"Índices después de la operación {numero} {operacion}: {inconsistentes}")
+            break
+        distintas = diferencias_consultas(consultas(gestor), consultas(sqlite))
+        if distintas:
+            fallas.append(f"Paridad después de la operación {numero} {operacion}: difieren {distintas[:5]}")
+            break
+    return gestor
+
+
+def chequear_copias(gestor, fallas):
+    antes = consultas(gestor)
+    for mensaje in gestor.mensajes:
+        mensaje['estado'] = 'TOCADO'
+    gestor.mensajes.clear()
+    primero = antes['ids'][0]
+    gestor.obtener_mensaje(primero)['estado'] = 'TOCADO'
+    for mensaje in gestor.mensajes_por_estado('PENDIENTE') + gestor.asignar_tanda('Ariel', LINEAS[0]):
+        mensaje['linea'] = 'TOCADA'
+    for mensaje in gestor.modificar_mensajes([primero], lambda m: None):
+        mensaje['estado'] = 'TOCADO'
+    despues = consultas(gestor)
+    if any(m.get('estado') == 'TOCADO' or m.get('linea') == 'TOCADA' for m in despues['mensajes']):
+        fallas.append("Modificar una copia devuelta por una consulta cambió el gestor")
+    inconsistentes = indices_inconsistentes(gestor)
+    if inconsistentes:
+        fallas.append(f"Índices después de modificar copias: {inconsistentes}")
+
+
+def chequear_bitacora(directorio, fallas):
+    archivo_json = os.path.join(directorio, 'bitacora.json')
+    with open(archivo_json, 'w', encoding='utf-8') as f:
+        json.dump(mensajes_base(), f, ensure_ascii=False)
+    gestor = GestorTandas(archivo_json)
+    operaciones = [o for o in generar_operaciones(gestor.ids_mensajes(), semilla=SEMILLA + 1) if o[0] != 'compactar']
+
+    def reabrir(caso):
+        esperado = consultas(gestor)
+        nuevo = GestorTandas(archivo_json)
+        distintas = diferencias_consultas(esperado, consultas(nuevo))
+        if distintas:
+            fallas.append(f"Bitácora ({caso}): al reabrir difieren {distintas[:5]}")
+        if nuevo.bitacora.leer() or os.path.exists(nuevo.bitacora.ruta_rotada):
+            fallas.append(f"Bitácora ({caso}): después de arrancar quedaron registros sin compactar")
+        with open(archivo_json, 'r', encoding='utf-8') as f:
+            if json.load(f) != esperado['mensajes']:
+                fallas.append(f"Bitácora ({caso}): el snapshot compactado no es el estado")
+        return nuevo
+
+    # Cambios solo en la bitácora
+    for operacion in operaciones[:100]:
+        aplicar(gestor, operacion)
+    if not gestor.bitacora.leer():
+        fallas.append("Bitácora: las operaciones no quedaron registradas")
+    gestor = reabrir('reproducir')
+
+    # Compactación cortada: la foto se rotó pero el snapshot no se escribió
+    for operacion in operaciones[100:150]:
+        aplicar(gestor, operacion)
+    gestor.bitacora.rotar()
+    for operacion in operaciones[150:200]:
+        aplicar(gestor, operacion)
+    gestor = reabrir('compactación cortada')
+
+    # Última línea a medio escribir: se descarta, lo anterior se reproduce
+    for operacion in operaciones[200:]:
+        aplicar(gestor, operacion)
+    with open(gestor.bitacora.ruta, 'a', encoding='utf-8') as f:
+        f.write('{"op":"asignar","en":"2026-01-01T00:00:00","m":{"id":')
+    gestor = reabrir('línea cortada')
+
+    # Compactación en segundo plano al cruzar COMPACTAR_CADA
+    compactar_cada = gestor_tandas.COMPACTAR_CADA
+    gestor_tandas.COMPACTAR_CADA = 10
+    try:
+        for operacion in operaciones[:40]:
+            aplicar(gestor, operacion)
+        if not gestor.escritor.sincronizar(30):
+            fallas.append("Bitácora: la compactación en segundo plano no terminó")
+        elif gestor.bitacora.registros >= 10:
+            fallas.append(f"Bitácora: quedaron {gestor.bitacora.registros} registros después de compactar")
+    finally:
+        gestor_tandas.COMPACTAR_CADA = compactar_cada
+    reabrir('compactación en segundo plano')
+
+
+def main():
+    directorio = tempfile.mkdtemp(prefix='almacenamiento_')
+    fallas = []
+    reloj = gestor_tandas.datetime
+    gestor_tandas.datetime = RelojFijo
+    try:
+        gestor = chequear_paridad_e_indices(directorio, fallas)
+        chequear_copias(gestor, fallas)
+        chequear_bitacora(directorio, fallas)
+    finally:
+        gestor_tandas.datetime = reloj
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if fallas:
+        print(f"❌ {len(fallas)} diferencias en el almacenamiento de mensajes:")
+        for falla in fallas:
+            print(f"   {falla}")
+        return 1
+
+    print(f"✅ Almacenamiento: {OPERACIONES} operaciones con JSON y SQLite iguales e índices consistentes; "
+          f"bitácora reproducida (también con compactación y línea cortadas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
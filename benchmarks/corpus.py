@@ -0,0 +1,46 @@
+"""Corpus de mensajes para el benchmark: históricos reales y copias escaladas"""
+
+import os
+import json
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = {
+    'revision_historico': os.path.join(BASE_PATH, 'lote_revision_historico.json'),
+    'aprobados_historico': os.path.join(BASE_PATH, 'lote_aprobados_historico.json'),
+    'mensajes_estado': os.path.join(BASE_PATH, 'data', 'mensajes_estado.json'),
+}
+
+# Solo los campos de entrada: el resto (análisis, scores...) es resultado
+CAMPOS_ENTRADA = ('contenido', 'fecha_hora', 'linea', 'numero_mensaje', 'operador', 'id')
+
+
+def cargar_corpus(nombre):
+    """Mensajes de un corpus, reducidos a los campos que lee el validador"""
+    with open(CORPUS[nombre], 'r', encoding='utf-8') as f:
+        mensajes = json.load(f)
+    return [
+        {campo: m[campo] for campo in CAMPOS_ENTRADA if campo in m}
+        for m in mensajes
+        if isinstance(m.get('contenido'), str)
+    ]
+
+
+def escalar(mensajes, factor):
+    """
+    `factor` copias del corpus con identificadores distintos. El contenido
+    se mantiene, así la distribución de tipos de mensaje es la real.
+    """
+    escalados = []
+    for copia in range(factor):
+        for m in mensajes:
+            nuevo = dict(m)
+            if copia:
+                nuevo['numero_mensaje'] = f"{m.get('numero_mensaje', '')}-{copia}"
+                if 'id' in nuevo:
+                    nuevo['id'] = f"{m['id']}-{copia}"
+            escalados.append(nuevo)
+    return escalados
+
+
+def corpus_disponibles():
+    return [nombre for nombre, ruta in CORPUS.items() if os.path.exists(ruta)]
@@ -0,0 +1,160 @@
+"""
+Equivalencia de salida del validador contra snapshots dorados
+============================================================
+Cualquier optimización de validar_componentes, clasificar_mensaje o
+calcular_scores puede cambiar los reportes con los que trabajan los
+validadores. Este arnés guarda el reporte completo (generar_reporte) de
+cada mensaje de los corpus históricos y después compara un motor candidato
+contra esos snapshots, campo por campo.
+
+USO:
+    # Antes de optimizar (en el código de referencia): capturar
+    python -m benchmarks.equivalencia --capturar
+
+    # Después: comparar el árbol actual...
+    python -m benchmarks.equivalencia
+    # ...o una copia del validador en otro archivo
+    python -m benchmarks.equivalencia --candidato /tmp/validador_nuevo.py
+
+Sale con código 1 si algún reporte difiere. La ortografía se fija en modo
+respaldo (regex + SymSpell): LanguageTool depende de Java y de la versión
+del servidor, y haría que los snapshots no sean reproducibles.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+os.environ['VALIDADOR_CACHE_REPORTES'] = '0'
+os.environ.pop('VALIDADOR_CACHE_DISCO', None)
+
+from benchmarks import corpus
+from benchmarks.corpus import BASE_PATH
+import motores_validador
+from motores_validador import diferencias, valor_corto, normalizar_reporte
+
+DIR_GOLDEN = os.path.join(BASE_PATH, 'benchmarks', 'golden')
+VERSION_SNAPSHOT = 1
+SECCIONES = ('componentes', 'clasificacion', 'scores', 'timing')
+MAX_DIFERENCIAS_MOSTRADAS = 40
+
+
+# =================================================================
+#  MOTOR
+# =================================================================
+
+def cargar_motor(ruta=None):
+    """validador_mensajes del árbol o, con `ruta`, una copia en otro archivo"""
+    if ruta is None:
+        motor = motores_validador.obtener_motor(motores_validador.MOTOR_ACTUAL)
+    else:
+        motor = motores_validador.cargar_modulo_validador(ruta)
+    motor.CORRECTOR_DISPONIBLE = False
+    return motor
+
+
+def generar_reportes(motor, mensajes):
+    reportes = []
+    for mensaje in mensajes:
+        try:
+            reporte = motor.procesar_mensaje(mensaje)
+        except Exception as e:
+            reporte = {'error': f"{type(e).__name__}: {e}"}
+        # Normalizado por JSON: tuplas → listas, igual que en el snapshot
+        reportes.append(normalizar_reporte(reporte))
+    return reportes
+
+
+def ruta_snapshot(nombre_corpus):
+    return os.path.join(DIR_GOLDEN, f'{nombre_corpus}.json')
+
+
+def capturar(motor, nombres_corpus):
+    os.makedirs(DIR_GOLDEN, exist_ok=True)
+    for nombre in nombres_corpus:
+        mensajes = corpus.cargar_corpus(nombre)
+        snapshot = {
+            'version': VERSION_SNAPSHOT,
+            'version_validador': getattr(motor, 'VERSION_VALIDADOR', None),
+            'corpus': nombre,
+            'mensajes': mensajes,
+            'reportes': generar_reportes(motor, mensajes),
+        }
+        with open(ruta_snapshot(nombre), 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"📸 {nombre}: {len(mensajes)} reportes → {ruta_snapshot(nombre)}")
+
+
+# =================================================================
+#  DIFERENCIAS
+# =================================================================
+
+def seccion_de(ruta):
+    cabeza = ruta.split('.', 1)[0].split('[', 1)[0]
+    return cabeza if cabeza in SECCIONES else 'otros'
+
+
+def comparar(motor, nombres_corpus):
+    """Returns: cantidad de reportes distintos"""
+    total = distintos = mostradas = 0
+    por_seccion = {}
+    for nombre in nombres_corpus:
+        ruta = ruta_snapshot(nombre)
+        if not os.path.exists(ruta):
+            print(f"⚠️ Sin snapshot para {nombre} (correr con --capturar en el código de referencia)")
+            continue
+        with open(ruta, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        obtenidos = generar_reportes(motor, snapshot['mensajes'])
+        for i, (esperado, obtenido) in enumerate(zip(snapshot['reportes'], obtenidos)):
+            total += 1
+            deltas = diferencias(esperado, obtenido)
+            if not deltas:
+                continue
+            distintos += 1
+            for ruta_campo, _ in deltas:
+                seccion = seccion_de(ruta_campo)
+                por_seccion[seccion] = por_seccion.get(seccion, 0) + 1
+            if mostradas < MAX_DIFERENCIAS_MOSTRADAS:
+                mostradas += 1
+                mensaje = snapshot['mensajes'][i]
+                print(f"\n❌ {nombre}[{i}] #{mensaje.get('numero_mensaje')} "
+                      f"{valor_corto(mensaje.get('contenido', ''), 70)}")
+                for ruta_campo, descripcion in deltas:
+                    print(f"   {ruta_campo}: {descripcion}")
+
+    print(f"\n{'='*60}")
+    if distintos > mostradas:
+        print(f"(se muestran {mostradas} de {distintos} reportes distintos)")
+    if distintos:
+        detalle = ', '.join(f"{s}: {n}" for s, n in sorted(por_seccion.items()))
+        print(f"❌ {distintos} de {total} reportes difieren ({detalle})")
+    else:
+        print(f"✅ {total} reportes idénticos a los snapshots")
+    return distintos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Equivalencia del validador contra snapshots dorados')
+    parser.add_argument('--capturar', action='store_true', help='Regenerar los snapshots con el motor')
+    parser.add_argument('--candidato', help='Archivo .py del validador a comparar (default: el del árbol)')
+    parser.add_argument('--corpus', default=','.join(corpus.corpus_disponibles()),
+                        help='Corpus separados por coma (default: todos)')
+    args = parser.parse_args()
+    candidato = os.path.abspath(args.candidato) if args.candidato else None
+
+    # El validador resuelve Contingencias.xlsx y configs/ desde el directorio actual
+    os.chdir(BASE_PATH)
+    motor = cargar_motor(candidato)
+    nombres_corpus = [n for n in args.corpus.split(',') if n]
+
+    if args.capturar:
+        capturar(motor, nombres_corpus)
+        return 0
+    return 1 if comparar(motor, nombres_corpus) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
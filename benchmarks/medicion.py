@@ -0,0 +1,147 @@
+"""Mediciones del benchmark: throughput, latencias, etapas y memoria"""
+
+import sys
+import time
+import platform
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import perfilador
+import corrector_ortografico
+import validador_mensajes
+
+MODO_RESPALDO = 'respaldo'
+MODO_LANGUAGETOOL = 'languagetool'
+MODOS = (MODO_RESPALDO, MODO_LANGUAGETOOL)
+
+
+class PerfiladorMuestras(perfilador.Perfilador):
+    """Perfilador que guarda cada duración, para percentiles exactos por etapa"""
+
+    def __init__(self):
+        super().__init__(activo=True)
+        self.muestras = {}
+
+    def registrar(self, etapa, segundos):
+        self.muestras.setdefault(etapa, []).append(segundos)
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def preparar_corrector(modo):
+    """
+    Deja el validador en el modo de ortografía pedido.
+    Returns: (ok, motivo) — ok False si el modo no se puede medir acá
+    """
+    if modo == MODO_RESPALDO:
+        validador_mensajes.CORRECTOR_DISPONIBLE = False
+        return True, None
+    if not corrector_ortografico.LANGUAGETOOL_INSTALADO:
+        return False, 'language_tool_python no instalado'
+    pool = corrector_ortografico.obtener_pool()
+    if not pool.disponible():
+        return False, pool.estadisticas()['error'] or 'LanguageTool no pudo arrancar'
+    validador_mensajes.CORRECTOR_DISPONIBLE = True
+    return True, None
+
+
+def calentar(mensajes):
+    """Carga contingencias, reglas, configs y el corrector antes de medir"""
+    validador_mensajes._calentar_validador({m.get('linea', 'ROCA') for m in mensajes})
+    for mensaje in mensajes[:20]:
+        validador_mensajes.procesar_mensaje(mensaje)
+
+
+def _pasada(mensajes):
+    latencias = []
+    errores = 0
+    reloj = time.perf_counter
+    inicio = reloj()
+    for mensaje in mensajes:
+        t0 = reloj()
+        try:
+            validador_mensajes.procesar_mensaje(mensaje)
+        except Exception:
+            errores += 1
+        latencias.append(reloj() - t0)
+    return reloj() - inicio, latencias, errores
+
+
+def _pasada_etapas(mensajes):
+    muestras = PerfiladorMuestras()
+    anterior = perfilador.reemplazar_perfilador(muestras)
+    try:
+        _pasada(mensajes)
+    finally:
+        perfilador.reemplazar_perfilador(anterior)
+    return {
+        etapa: {
+            'p50_us': round(percentil(valores, 50) * 1e6, 1),
+            'p99_us': round(percentil(valores, 99) * 1e6, 1),
+            'total_ms': round(sum(valores) * 1000, 3),
+        }
+        for etapa, valores in muestras.muestras.items()
+    }
+
+
+def _pasada_memoria(mensajes):
+    tracemalloc.start()
+    try:
+        _pasada(mensajes)
+        _actual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+
+def medir_caso(mensajes, repeticiones=5):
+    """
+    Mide un corpus. El throughput es el de la mejor repetición (la menos
+    afectada por ruido); las latencias juntan todas las repeticiones.
+    Etapas y memoria se miden en pasadas aparte para no contaminar el tiempo.
+    """
+    mejor = None
+    latencias = []
+    errores = 0
+    for _ in range(repeticiones):
+        duracion, latencias_pasada, errores = _pasada(mensajes)
+        latencias.extend(latencias_pasada)
+        if mejor is None or duracion < mejor:
+            mejor = duracion
+
+    return {
+        'mensajes': len(mensajes),
+        'errores': errores,
+        'mensajes_por_segundo': round(len(mensajes) / mejor, 1) if mejor else None,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 4),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 4),
+        'etapas': _pasada_etapas(mensajes),
+        'pico_memoria_kb': round(_pasada_memoria(mensajes) / 1024, 1),
+    }
+
+
+def rss_maximo_kb():
+    """RSS máximo del proceso hasta ahora (None fuera de Unix)"""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo // 1024 if sys.platform == 'darwin' else maximo
+
+
+def datos_maquina():
+    return {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+    }
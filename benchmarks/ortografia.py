@@ -0,0 +1,94 @@
+"""
+Regresión del corrector en proceso (CorrectorSymSpell)
+=====================================================
+El corrector en proceso es el que corre en Render (sin Java). Si marca
+palabras comunes como errores, la estructura de mensajes correctos baja de
+CORRECTO a MEJORABLE. Este chequeo fija:
+
+- PALABRAS_CORRECTAS: español común de los mensajes, que no se marca
+  (con y sin tildes, como las escriben los operadores).
+- MENSAJES_CORRECTOS: mensajes reales que no tienen errores de ortografía.
+- ERRORES_CONOCIDOS: typos que sí se tienen que marcar, con su sugerencia.
+
+USO:
+    python -m benchmarks.ortografia
+
+Sale con código 1 si algo no da lo esperado.
+"""
+
+import sys
+
+import corrector_ortografico
+
+PALABRAS_CORRECTAS = """
+    PERSONA PERSONAS PARO PAROS HUELGA MATERIAL PORQUE CUANDO ATENCION ATENCIÓN
+    GREMIAL GREMIALES MEDIDA FUERZA RODANTE VIAS VÍAS DEMORADO DEMORADA DEMORAS
+    CANCELADO CANCELADA CANCELADOS INTERRUMPIDO INTERRUMPIDA REANUDADO NORMALIZADO
+    SERVICIO SERVICIOS LIMITADO LIMITADA PASAJEROS USUARIOS ESTACION ESTACIÓN ESTACIONES
+    ANDEN ANDÉN ANDENES FORMACION FORMACIÓN FORMACIONES MAQUINISTA CONDUCTOR GUARDA
+    BARRERA BARRERAS PASO NIVEL CRUCE ARROLLAMIENTO ARROLLADO ACCIDENTE INCIDENTE
+    FALLA FALLAS TECNICA TÉCNICA TECNICO ENERGIA ENERGÍA ELECTRICA CORTE SUMINISTRO
+    SEÑAL SEÑALES SEÑALAMIENTO DESVIO DESVÍO CAMBIO TRABAJOS OBRAS MANTENIMIENTO
+    HORARIO HORARIOS FRECUENCIA DIAGRAMA PROGRAMADO PROGRAMADA SALIDA LLEGADA DESTINO
+    ORIGEN HACIA DESDE HASTA ENTRE SOBRE DURANTE MIENTRAS LUEGO AHORA MAÑANA TARDE
+    NOCHE HORAS MINUTOS APROXIMADAMENTE DEMORA ESPERA INFORMAMOS INFORMA DISCULPAS
+    DISCULPEN MOLESTIAS OCASIONADAS SEPA DISCULPAR MOTIVO CAUSA DEBIDO PRESENCIA
+    POLICIA POLICÍA BOMBEROS AMBULANCIA EMERGENCIA MEDICA HERIDO LESIONADO OBJETO
+    ROBO CABLES VANDALISMO MANIFESTACION MANIFESTACIÓN PIQUETE CORTADA CORTADO
+    TEMPORAL LLUVIA INUNDACION INUNDACIÓN ARBOL ÁRBOL CAIDO CAÍDO VIENTO TORMENTA
+    RECORRIDO TRAMO RAMAL LINEA LÍNEA TERMINAL CABECERA COMBINACION TRANSBORDO
+    BOLETERIA BOLETERÍA MOLINETE TARJETA VIAJE VIAJES PRÓXIMO PROXIMO SIGUIENTE
+    ULTIMO ÚLTIMO PRIMER PRIMERO SEGUNDO NORMAL NORMALMENTE PARCIAL TOTAL TODAS TODOS
+    ALGUNOS ALGUNAS CIRCULAN CIRCULA FUNCIONA FUNCIONANDO DETENIDO DETENIDA
+    RETOMA RESTABLECIDO RESTABLECE PRESTA PRESTANDO REALIZA REALIZAN AUTORIDADES
+""".split()
+
+MENSAJES_CORRECTOS = [
+    "TREN 3215 CANCELADO POR PARO GREMIAL",
+    "DEMORAS EN EL SERVICIO POR PERSONA EN VIAS A LA ALTURA DE ESTACION CASTELAR",
+    "SERVICIO LIMITADO POR FALLA EN MATERIAL RODANTE. SEPA DISCULPAR LAS MOLESTIAS",
+    "POR MEDIDA DE FUERZA GREMIAL NO SE PRESTA SERVICIO HASTA NUEVO AVISO",
+    "CUANDO SE NORMALICE EL SERVICIO INFORMAREMOS. ATENCION: HUELGA DE PERSONAL",
+]
+
+ERRORES_CONOCIDOS = {
+    'SERVCIO': 'SERVICIO',
+    'ESTACON': 'ESTACION',
+    'FORMACON': 'FORMACION',
+    'DEMORRADO': 'DEMORADO',
+}
+
+
+def main():
+    corrector = corrector_ortografico.obtener_corrector_symspell()
+    fallas = []
+
+    for palabra in PALABRAS_CORRECTAS:
+        sugerencia = corrector.sugerir(palabra)
+        if sugerencia:
+            fallas.append(f"{palabra} marcada como error (→ {sugerencia})")
+
+    for mensaje in MENSAJES_CORRECTOS:
+        errores = corrector.revisar(mensaje)
+        if errores:
+            fallas.append(f"'{mensaje}': {errores}")
+
+    for palabra, esperada in ERRORES_CONOCIDOS.items():
+        sugerencia = corrector.sugerir(palabra)
+        if sugerencia != esperada:
+            fallas.append(f"{palabra}: se esperaba → {esperada}, dio {sugerencia}")
+
+    if fallas:
+        print(f"❌ {len(fallas)} diferencias en el corrector en proceso:")
+        for falla in fallas:
+            print(f"   {falla}")
+        return 1
+
+    print(f"✅ Corrector en proceso: {len(PALABRAS_CORRECTAS)} palabras y "
+          f"{len(MENSAJES_CORRECTOS)} mensajes correctos sin marcar, "
+          f"{len(ERRORES_CONOCIDOS)} errores conocidos detectados")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+bitacora_mensajes.py — Bitácora de cambios de estado de los mensajes
+====================================================================
+En lugar de reescribir data/mensajes_estado.json entero en cada clic, cada
+transición (asignar, completar, derivar, desbloquear, devolver, liberar,
+importar, re-validar) agrega una línea JSON compacta por mensaje tocado a
+data/mensajes_estado.bitacora y hace fsync. El costo por acción depende
+de los mensajes tocados, no del tamaño del corpus.
+
+Cada registro lleva el mensaje completo después del cambio:
+
+    {"op": "derivar", "en": "2026-03-01T10:22:05", "m": {...mensaje...}}
+
+Reproducirlo es "reemplazar el mensaje con ese id, o agregarlo si no
+está", así que aplicar un registro dos veces da lo mismo (importa si se
+corta entre escribir el snapshot y vaciar la bitácora).
+
+Compactar = escribir el snapshot (temporal + fsync + rename) y vaciar la
+bitácora. Para no frenar a los que siguen registrando mientras se escribe
+un snapshot grande, la bitácora se rota: lo registrado hasta la foto pasa
+a `.bitacora.compactando`, lo nuevo va a una `.bitacora` vacía, y la rotada
+se borra cuando el snapshot quedó en disco. Al arrancar se carga el
+snapshot y se reproducen la rotada (si quedó de un corte) y la actual.
+Una última línea incompleta (corte a mitad de escritura) se descarta.
+
+Con varios procesos (workers de gunicorn) sobre los mismos archivos, la
+bitácora es también el canal de cambios: cada proceso recuerda hasta qué
+byte la leyó (leer_desde) y antes de operar incorpora lo que agregaron los
+demás. bloqueo_archivo() serializa las escrituras entre procesos.
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo proceso)
+    fcntl = None
+
+
+def escribir_atomico(ruta, datos, indent=2):
+    """JSON a un temporal en el mismo directorio, fsync y rename (nunca deja el archivo a medias)"""
+    texto = json.dumps(datos, ensure_ascii=False, indent=indent)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(ruta)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)  # Que el rename también sobreviva a un corte
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def bloqueo_archivo(ruta, exclusivo=True):
+    """
+    flock sobre `ruta`, entre procesos (los workers de gunicorn). Cada
+    llamada abre su propio descriptor, así que también excluye entre hilos.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def firma_archivo(ruta):
+    """(inodo, mtime, tamaño): cambia si el archivo se reemplazó o se escribió"""
+    try:
+        datos = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return datos.st_ino, datos.st_mtime_ns, datos.st_size
+
+
+def aplicar_registros(mensajes, registros):
+    """
+    Reproduce registros sobre la lista de mensajes (en el lugar).
+    Returns: cantidad de registros aplicados
+    """
+    posiciones = {}
+    for i, mensaje in enumerate(mensajes):
+        posiciones.setdefault(mensaje.get('id'), i)
+    aplicados = 0
+    for registro in registros:
+        mensaje = registro['m']
+        i = posiciones.get(mensaje.get('id'))
+        if i is None:
+            posiciones[mensaje.get('id')] = len(mensajes)
+            mensajes.append(mensaje)
+        else:
+            mensajes[i] = mensaje
+        aplicados += 1
+    return aplicados
+
+
+class BitacoraMensajes:
+    def __init__(self, ruta):
+        self.ruta = str(ruta)
+        self.ruta_rotada = self.ruta + '.compactando'
+        self.registros = 0  # Registros escritos desde la última rotación
+        self._archivo = None
+        self._lock = threading.Lock()
+
+    def leer(self):
+        """Registros de la bitácora rotada (si quedó) y de la actual, en orden"""
+        registros = _leer_registros(self.ruta_rotada) + _leer_registros(self.ruta)
+        self.registros = len(registros)
+        return registros
+
+    def registrar(self, operacion, mensajes):
+        """Una línea por mensaje, en una sola escritura + fsync"""
+        if not mensajes:
+            return
+        en = datetime.now().isoformat(timespec='seconds')
+        texto = ''.join(
+            json.dumps({'op': operacion, 'en': en, 'm': m}, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for m in mensajes
+        )
+        with self._lock:
+            if self._archivo is not None and not _sigue_en(self._archivo, self.ruta):
+                # Otro proceso la rotó: lo abierto ahora es la rotada
+                self._archivo.close()
+                self._archivo = None
+            if self._archivo is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+                self._archivo = open(self.ruta, 'a', encoding='utf-8')
+                if not _termina_en_linea(self.ruta):
+                    texto = '\n' + texto  # Una línea cortada por un corte no se pega con la nueva
+            self._archivo.write(texto)
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self.registros += len(mensajes)
+
+    def posicion(self):
+        """(inodo, bytes) de la bitácora actual, o None si no existe"""
+        try:
+            datos = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+        return datos.st_ino, datos.st_size
+
+    def leer_desde(self, posicion, ruta=None):
+        """
+        Registros agregados desde `posicion` (bytes) hasta la última línea
+        completa. Returns: (registros, nueva_posicion)
+        """
+        ruta = ruta or self.ruta
+        try:
+            with open(ruta, 'rb') as f:
+                f.seek(posicion)
+                datos = f.read()
+        except FileNotFoundError:
+            return [], posicion
+        fin = datos.rfind(b'\n') + 1
+        return _parsear_lineas(datos[:fin].decode('utf-8').split('\n'), ruta), posicion + fin
+
+    def rotar(self):
+        """
+        Aparta lo registrado hasta ahora (llamar junto con la foto del
+        snapshot). Si quedó una rotada de una compactación que falló, se le
+        agrega lo actual: ninguna de las dos está en un snapshot todavía.
+        """
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+            if os.path.exists(self.ruta):
+                if os.path.exists(self.ruta_rotada):
+                    with open(self.ruta, 'r', encoding='utf-8') as origen, \
+                            open(self.ruta_rotada, 'a', encoding='utf-8') as destino:
+                        destino.write('\n' + origen.read())  # Por si la rotada terminó cortada
+                        destino.flush()
+                        os.fsync(destino.fileno())
+                    os.remove(self.ruta)
+                else:
+                    os.replace(self.ruta, self.ruta_rotada)
+            self.registros = 0
+
+    def descartar_rotada(self):
+        """El snapshot ya tiene lo rotado: se puede borrar"""
+        with self._lock:
+            if os.path.exists(self.ruta_rotada):
+                os.remove(self.ruta_rotada)
+
+
+def _sigue_en(archivo, ruta):
+    try:
+        return os.fstat(archivo.fileno()).st_ino == os.stat(ruta).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _termina_en_linea(ruta):
+    try:
+        with open(ruta, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+    except FileNotFoundError:
+        return True
+
+
+def _leer_registros(ruta):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return _parsear_lineas(f.read().split('\n'), ruta)
+
+
+def _parsear_lineas(lineas, ruta):
+    """
+    Una línea ilegible (escritura cortada) se saltea: cada registro es el
+    mensaje completo, así que solo se pierde ese cambio.
+    """
+    registros = []
+    for numero, linea in enumerate(lineas, 1):
+        if not linea.strip():
+            continue
+        try:
+            registros.append(json.loads(linea))
+        except json.JSONDecodeError:
+            print(f"⚠️ Bitácora {ruta}: línea {numero} incompleta o ilegible, descartada")
+    return registros
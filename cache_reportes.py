@@ -0,0 +1,209 @@
+"""
+cache_reportes.py — Memoización de reportes de validación
+=========================================================
+Muchos mensajes de mensajes_estado.json repiten el mismo contenido, y
+/api/reglas/aplicar-todas re-valida mensajes cuyas entradas no cambiaron.
+
+La clave de cada reporte combina todo lo que puede cambiar el resultado:
+contenido, línea, fecha_hora, versión del validador, versión de las reglas,
+versión de las contingencias, versión de la config de la línea y huella del
+vocabulario ortográfico (vocabulario ferroviario + léxico general). Las
+versiones salen del contenido (hash), así que crear o modificar una regla
+invalida todo lo anterior sin borrar nada a mano.
+
+Dos niveles:
+  - Memoria: LRU de CAPACIDAD entradas (VALIDADOR_CACHE_REPORTES, 0 = apagado)
+  - Disco (opcional): VALIDADOR_CACHE_DISCO=<directorio> o =1 para
+    data/cache/reportes. Se comparte entre workers de gunicorn. Como las
+    claves viejas nunca se vuelven a pedir, se poda cada PODAR_CADA
+    escrituras: se borran las entradas sin uso hace más de
+    VALIDADOR_CACHE_DISCO_DIAS días (default 30) y, si siguen sobrando, las
+    menos usadas hasta dejar VALIDADOR_CACHE_DISCO_MAX (default 20000).
+"""
+
+import os
+import json
+import pickle
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+DIR_CACHE_DISCO = os.path.join(BASE_PATH, 'data', 'cache', 'reportes')
+CAPACIDAD = int(os.environ.get('VALIDADOR_CACHE_REPORTES', '5000'))
+CAPACIDAD_DISCO = int(os.environ.get('VALIDADOR_CACHE_DISCO_MAX', '20000'))
+DIAS_DISCO = float(os.environ.get('VALIDADOR_CACHE_DISCO_DIAS', '30'))
+PODAR_CADA = 500    # Escrituras a disco entre podas (la primera escritura también poda)
+
+
+def calcular_clave(*partes):
+    """Hash estable de las partes (strings, números, None)"""
+    return hashlib.sha1(
+        json.dumps(partes, ensure_ascii=False, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class CacheReportes:
+    """LRU en memoria con nivel opcional en disco. Guarda copias serializadas."""
+
+    def __init__(self, capacidad=CAPACIDAD, directorio=None,
+                 capacidad_disco=CAPACIDAD_DISCO, dias_disco=DIAS_DISCO):
+        self.capacidad = capacidad
+        self.directorio = directorio
+        self.capacidad_disco = capacidad_disco
+        self.dias_disco = dias_disco
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._escrituras_disco = 0
+        self.hits = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.podadas_disco = 0
+
+    @property
+    def activo(self):
+        return self.capacidad > 0
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave + '.pkl')
+
+    def obtener(self, clave):
+        """Copia del reporte guardado o None"""
+        with self._lock:
+            datos = self._entradas.get(clave)
+            if datos is not None:
+                self._entradas.move_to_end(clave)
+                self.hits += 1
+                return pickle.loads(datos)
+
+        if self.directorio:
+            ruta = self._ruta(clave)
+            try:
+                with open(ruta, 'rb') as f:
+                    datos = f.read()
+                reporte = pickle.loads(datos)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                reporte = None
+            if reporte is not None:
+                try:
+                    os.utime(ruta)  # La poda borra primero lo que no se usa
+                except OSError:
+                    pass
+                self._guardar_memoria(clave, datos)
+                with self._lock:
+                    self.hits_disco += 1
+                return reporte
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def guardar(self, clave, reporte):
+        datos = pickle.dumps(reporte, protocol=pickle.HIGHEST_PROTOCOL)
+        self._guardar_memoria(clave, datos)
+        if self.directorio:
+            self._guardar_disco(clave, datos)
+
+    def _guardar_memoria(self, clave, datos):
+        with self._lock:
+            self._entradas[clave] = datos
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def _guardar_disco(self, clave, datos):
+        ruta = self._ruta(clave)
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar reporte en cache de disco: {e}")
+            return
+        with self._lock:
+            self._escrituras_disco += 1
+            podar = self._escrituras_disco % PODAR_CADA == 1
+        if podar:
+            self.podar_disco()
+
+    def podar_disco(self):
+        """
+        Borra las entradas de disco sin uso hace más de dias_disco y, si
+        siguen siendo más de capacidad_disco, las menos usadas (por mtime).
+        Varios workers pueden podar a la vez: lo que otro ya borró se ignora.
+        Returns: cantidad de entradas borradas
+        """
+        if not self.directorio or not os.path.isdir(self.directorio):
+            return 0
+        limite = time.time() - self.dias_disco * 86400
+        entradas = []
+        viejas = []
+        for sub in os.scandir(self.directorio):
+            if not sub.is_dir():
+                continue
+            for entrada in os.scandir(sub.path):
+                if not entrada.name.endswith(('.pkl', '.tmp')):
+                    continue
+                try:
+                    mtime = entrada.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if mtime < limite:
+                    viejas.append(entrada.path)
+                elif entrada.name.endswith('.pkl'):
+                    entradas.append((mtime, entrada.path))
+        sobrantes = len(entradas) - self.capacidad_disco
+        if sobrantes > 0:
+            entradas.sort()
+            viejas.extend(ruta for _, ruta in entradas[:sobrantes])
+
+        borradas = 0
+        for ruta in viejas:
+            try:
+                os.remove(ruta)
+                borradas += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ No se pudo podar el cache de disco: {e}")
+                break
+        with self._lock:
+            self.podadas_disco += borradas
+        return borradas
+
+    def limpiar(self):
+        """Vacía la memoria (el disco se invalida solo al cambiar las versiones y se poda solo)"""
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'capacidad': self.capacidad,
+                'entradas': len(self._entradas),
+                'hits': self.hits,
+                'hits_disco': self.hits_disco,
+                'misses': self.misses,
+                'disco': self.directorio,
+                'podadas_disco': self.podadas_disco,
+            }
+
+
+def _directorio_desde_entorno():
+    valor = os.environ.get('VALIDADOR_CACHE_DISCO', '')
+    if not valor or valor == '0':
+        return None
+    return DIR_CACHE_DISCO if valor == '1' else valor
+
+_CACHE = None
+
+def obtener_cache():
+    """Cache único del proceso, configurado por variables de entorno"""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = CacheReportes(directorio=_directorio_desde_entorno())
+    return _CACHE
@@ -0,0 +1,526 @@
+"""
+corrector_ortografico.py — Servicio de ortografía compartido por el proceso
+==========================================================================
+LanguageTool levanta un servidor Java por instancia. Antes se creaba (y
+cerraba) una instancia por mensaje; acá se levantan una sola vez y se
+comparten entre los hilos del worker a través de un pool acotado.
+
+- obtener_pool()           → pool único del proceso (se inicia a demanda)
+- pool.verificar(texto)    → errores de un texto
+- pool.verificar_lote([…]) → errores de varios textos en una sola consulta
+- Un watchdog reemplaza las instancias que se caen.
+
+Si Java o language_tool_python no están, el pool queda "no disponible" y
+vuelve a intentar recién después de ESPERA_REINTENTO segundos; el validador
+usa mientras tanto el corrector en proceso (CorrectorSymSpell).
+
+CorrectorSymSpell es un corrector puro Python estilo SymSpell: precalcula
+los "borrados simétricos" del vocabulario ferroviario más las
+palabras_tecnicas de la línea y sugiere correcciones en microsegundos por
+palabra. El índice se guarda en data/cache/ para no recalcularlo al iniciar.
+Solo se marca una palabra que tampoco está en el léxico general del español
+(configs/lexico_es.txt.gz): el vocabulario ferroviario es un agregado, no
+el idioma entero (sin el léxico, PARO se "corregía" a PARA).
+
+Configuración por entorno:
+    LANGUAGETOOL_POOL_SIZE   cantidad de instancias (default 1)
+"""
+
+import os
+import re
+import json
+import gzip
+import time
+import queue
+import atexit
+import pickle
+import hashlib
+import tempfile
+import threading
+from bisect import bisect_right
+
+# Corrector ortográfico avanzado (instalar: pip install language-tool-python)
+try:
+    import language_tool_python
+    LANGUAGETOOL_INSTALADO = True
+except ImportError:
+    LANGUAGETOOL_INSTALADO = False
+
+IDIOMA = 'es'
+INTERVALO_WATCHDOG = 30     # segundos entre chequeos del watchdog
+ESPERA_REINTENTO = 300      # segundos antes de reintentar si no arrancó
+TIMEOUT_PRESTAMO = 30       # segundos máximos esperando una instancia libre
+ESPERA_PRESTAMO = 0.5       # cada cuánto se revisa, mientras se espera, si quedan instancias vivas
+SEPARADOR_LOTE = '\n\n'
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+ARCHIVO_VOCABULARIO = os.path.join(BASE_PATH, 'configs', 'vocabulario_ferroviario.json')
+ARCHIVO_LEXICO = os.path.join(BASE_PATH, 'configs', 'lexico_es.txt.gz')
+DIR_CACHE_SYMSPELL = os.path.join(BASE_PATH, 'data', 'cache')
+VERSION_SYMSPELL = 1
+LARGO_MINIMO_PALABRA = 4    # Palabras más cortas (DE, LAS, HS, LSM...) no se corrigen
+
+
+class CorrectorNoDisponible(Exception):
+    """LanguageTool no está instalado o no pudo arrancar (ej: falta Java)"""
+
+
+class PoolLanguageTool:
+    """Pool acotado de instancias LanguageTool con watchdog"""
+
+    def __init__(self, idioma=IDIOMA, tamanio=None):
+        self.idioma = idioma
+        self.tamanio = tamanio or int(os.environ.get('LANGUAGETOOL_POOL_SIZE', '1'))
+        self._libres = queue.Queue()
+        self._vivas = 0
+        self._lock = threading.Lock()
+        self._iniciado = False
+        self._cerrado = False
+        self._error = None
+        self._ultimo_intento = None
+        self._watchdog = None
+        self.reinicios = 0
+
+    # ---------------------------------------------------------------
+    #  Ciclo de vida
+    # ---------------------------------------------------------------
+
+    def _crear_instancia(self):
+        return language_tool_python.LanguageTool(self.idioma)
+
+    def iniciar(self):
+        """Levanta las instancias. Retorna True si el pool quedó operativo."""
+        with self._lock:
+            if self._iniciado:
+                return True
+            if self._cerrado:
+                return False
+            if not LANGUAGETOOL_INSTALADO:
+                self._error = 'language_tool_python no instalado'
+                return False
+            ahora = time.monotonic()
+            if self._ultimo_intento is not None and ahora - self._ultimo_intento < ESPERA_REINTENTO:
+                return False
+            self._ultimo_intento = ahora
+
+            try:
+                for _ in range(self.tamanio - self._vivas):
+                    self._libres.put(self._crear_instancia())
+                    self._vivas += 1
+            except Exception as e:
+                self._error = str(e)
+                print(f"⚠️ LanguageTool no disponible: {e}")
+                return False
+
+            self._iniciado = True
+            self._error = None
+            print(f"✅ LanguageTool iniciado ({self.tamanio} instancia/s)")
+
+        if self._watchdog is None:
+            self._watchdog = threading.Thread(target=self._vigilar, daemon=True)
+            self._watchdog.start()
+        return True
+
+    def disponible(self):
+        """
+        Operativo con al menos una instancia viva. Si se cayeron todas, no
+        lo está hasta que el watchdog reponga alguna: mientras tanto se usa
+        el respaldo en lugar de esperar TIMEOUT_PRESTAMO por mensaje.
+        """
+        if self._iniciado:
+            return self._vivas > 0
+        return self.iniciar()
+
+    def cerrar(self):
+        """Cierra todas las instancias (al salir del proceso)"""
+        with self._lock:
+            self._cerrado = True
+            self._iniciado = False
+            while True:
+                try:
+                    tool = self._libres.get_nowait()
+                except queue.Empty:
+                    break
+                self._cerrar_instancia(tool)
+            self._vivas = 0
+
+    def _cerrar_instancia(self, tool):
+        try:
+            tool.close()
+        except Exception:
+            pass
+
+    def _descartar(self, tool):
+        """Saca del pool una instancia rota; el watchdog la reemplaza"""
+        self._cerrar_instancia(tool)
+        with self._lock:
+            self._vivas -= 1
+
+    def _vigilar(self):
+        while not self._cerrado:
+            time.sleep(INTERVALO_WATCHDOG)
+            faltantes = self.tamanio - self._vivas
+            for _ in range(faltantes):
+                try:
+                    tool = self._crear_instancia()
+                except Exception as e:
+                    print(f"⚠️ Watchdog LanguageTool: no se pudo reiniciar instancia: {e}")
+                    break
+                with self._lock:
+                    if self._cerrado:
+                        self._cerrar_instancia(tool)
+                        return
+                    self._vivas += 1
+                    self.reinicios += 1
+                self._libres.put(tool)
+
+    # ---------------------------------------------------------------
+    #  Consultas
+    # ---------------------------------------------------------------
+
+    def verificar_lote(self, textos):
+        """
+        Verifica varios textos con una sola consulta a LanguageTool.
+
+        Returns:
+            lista (una por texto) de tuplas (palabra_error, regla_id, reemplazos)
+        Raises:
+            CorrectorNoDisponible si el pool no pudo arrancar
+        """
+        if not self.disponible():
+            raise CorrectorNoDisponible(self._error or 'Sin instancias vivas de LanguageTool')
+
+        textos = list(textos)
+        inicios = []
+        posicion = 0
+        for texto in textos:
+            inicios.append(posicion)
+            posicion += len(texto) + len(SEPARADOR_LOTE)
+        unido = SEPARADOR_LOTE.join(textos)
+
+        tool = self._prestar()
+        try:
+            matches = tool.check(unido)
+        except Exception:
+            self._descartar(tool)
+            raise
+        self._libres.put(tool)
+
+        resultados = [[] for _ in textos]
+        for match in matches:
+            i = bisect_right(inicios, match.offset) - 1
+            fin_texto = inicios[i] + len(textos[i])
+            if match.offset + match.errorLength > fin_texto:
+                continue  # El error cruza el separador entre mensajes
+            palabra_error = unido[match.offset:match.offset + match.errorLength]
+            resultados[i].append((palabra_error, match.ruleId, list(match.replacements)))
+        return resultados
+
+    def verificar(self, texto):
+        return self.verificar_lote([texto])[0]
+
+    def _prestar(self):
+        """Una instancia libre; falla apenas no queda ninguna viva (no espera el timeout entero)"""
+        limite = time.monotonic() + TIMEOUT_PRESTAMO
+        while True:
+            if self._vivas <= 0:
+                raise CorrectorNoDisponible('Todas las instancias de LanguageTool se cayeron')
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise CorrectorNoDisponible('Sin instancias libres de LanguageTool')
+            try:
+                return self._libres.get(timeout=min(restante, ESPERA_PRESTAMO))
+            except queue.Empty:
+                continue
+
+    def _tras_fork(self):
+        """
+        En un proceso hijo (fork) los locks y el watchdog heredados no sirven.
+        Se rehacen conservando las instancias libres: son clientes HTTP del
+        servidor LanguageTool del padre, que atiende consultas concurrentes.
+        """
+        libres = list(self._libres.queue)
+        self._libres = queue.Queue()
+        for tool in libres:
+            self._libres.put(tool)
+        self._lock = threading.Lock()
+        self._vivas = len(libres)
+        self._watchdog = None
+        if libres:
+            self.tamanio = len(libres)
+        else:
+            self._iniciado = False  # Todas prestadas al fork: el hijo levanta la suya
+
+    def estadisticas(self):
+        return {
+            'iniciado': self._iniciado,
+            'tamanio': self.tamanio,
+            'instancias_vivas': self._vivas,
+            'instancias_libres': self._libres.qsize(),
+            'reinicios': self.reinicios,
+            'error': self._error,
+        }
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def obtener_pool():
+    """Pool único del proceso (cada worker de gunicorn tiene el suyo)"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = PoolLanguageTool()
+                atexit.register(_POOL.cerrar)
+    return _POOL
+
+def _reiniciar_tras_fork():
+    global _POOL_LOCK, _CORRECTORES_LOCK
+    _POOL_LOCK = threading.Lock()
+    _CORRECTORES_LOCK = threading.Lock()
+    if _POOL is not None:
+        _POOL._tras_fork()
+
+
+# =================================================================
+#  CORRECTOR EN PROCESO (SYMSPELL)
+# =================================================================
+
+def distancia_edicion(a, b, maxima):
+    """
+    Distancia Damerau-Levenshtein (alineamiento óptimo) entre a y b.
+    Retorna maxima + 1 apenas se sabe que la supera.
+    """
+    if abs(len(a) - len(b)) > maxima:
+        return maxima + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        minimo_fila = i
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if (anterior2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual[j] = valor
+            if valor < minimo_fila:
+                minimo_fila = valor
+        if minimo_fila > maxima:
+            return maxima + 1
+        anterior2, anterior = anterior, actual
+    return anterior[len(b)]
+
+
+_SIN_TILDES = str.maketrans('ÁÉÍÓÚÜ', 'AEIOUU')
+
+def sin_tildes(palabra):
+    """Forma de comparación con el léxico: los mensajes se escriben con o sin tildes (la Ñ se conserva)"""
+    return palabra.translate(_SIN_TILDES)
+
+
+def distancia_maxima_para(palabra):
+    """Palabras cortas toleran 1 error; las largas hasta 2"""
+    return 1 if len(palabra) < 6 else 2
+
+
+def _borrados(palabra, distancia):
+    """Todas las variantes de la palabra con hasta `distancia` letras borradas"""
+    resultado = set()
+    frontera = {palabra}
+    for _ in range(distancia):
+        siguiente = set()
+        for w in frontera:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                siguiente.add(w[:i] + w[i + 1:])
+        siguiente -= resultado
+        resultado |= siguiente
+        frontera = siguiente
+    return resultado
+
+
+class CorrectorSymSpell:
+    """
+    Corrector por borrados simétricos: para cada palabra del vocabulario se
+    guardan sus variantes con letras borradas. Una palabra desconocida se
+    compara solo contra las palabras que comparten algún borrado con ella.
+
+    `lexico` son las palabras conocidas que no se usan para sugerir (el
+    español general, sin tildes). Con lexico=None no se marca nada: sin él,
+    cualquier palabra común fuera del vocabulario sería un error.
+    """
+
+    _PATRON_PALABRA = re.compile(r'[A-ZÁÉÍÓÚÑÜ]+')
+
+    def __init__(self, palabras, borrados, lexico=frozenset()):
+        self.palabras = palabras
+        self._borrados = borrados
+        self.lexico = lexico
+        self.huella = None
+        self._conocidas = frozenset(sin_tildes(p) for p in palabras) | (lexico or frozenset())
+
+    @classmethod
+    def construir(cls, palabras, lexico=frozenset()):
+        palabras = frozenset(p.upper() for p in palabras if p)
+        borrados = {}
+        for palabra in sorted(palabras):
+            for variante in _borrados(palabra, distancia_maxima_para(palabra)):
+                borrados.setdefault(variante, []).append(palabra)
+        return cls(palabras, {k: tuple(v) for k, v in borrados.items()}, lexico)
+
+    def sugerir(self, palabra):
+        """Corrección más cercana para una palabra (en mayúsculas) o None"""
+        if len(palabra) < LARGO_MINIMO_PALABRA or sin_tildes(palabra) in self._conocidas:
+            return None
+
+        maxima = distancia_maxima_para(palabra)
+        candidatos = set()
+        for variante in _borrados(palabra, maxima) | {palabra}:
+            if variante in self.palabras:
+                candidatos.add(variante)
+            candidatos.update(self._borrados.get(variante, ()))
+
+        mejor = None
+        for candidato in candidatos:
+            distancia = distancia_edicion(palabra, candidato, maxima)
+            if distancia <= maxima and (mejor is None or (distancia, candidato) < mejor):
+                mejor = (distancia, candidato)
+        return mejor[1] if mejor else None
+
+    def revisar(self, texto_upper):
+        """Lista de (palabra_error, sugerencia) en orden de aparición, sin repetidos"""
+        errores = []
+        if self.lexico is None:
+            return errores
+        vistas = set()
+        for palabra in self._PATRON_PALABRA.findall(texto_upper):
+            if palabra in vistas:
+                continue
+            vistas.add(palabra)
+            sugerencia = self.sugerir(palabra)
+            if sugerencia:
+                errores.append((palabra, sugerencia))
+        return errores
+
+    # ---------------------------------------------------------------
+    #  Persistencia
+    # ---------------------------------------------------------------
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Temporal único: los workers de procesar_lote y de gunicorn guardan el mismo índice a la vez
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    'version': VERSION_SYMSPELL,
+                    'palabras': sorted(self.palabras),
+                    'borrados': self._borrados,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    @classmethod
+    def cargar(cls, ruta, lexico=frozenset()):
+        with open(ruta, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != VERSION_SYMSPELL:
+            raise ValueError(f"Versión de índice incompatible: {data.get('version')}")
+        return cls(frozenset(data['palabras']), data['borrados'], lexico)
+
+
+_VOCABULARIO_BASE = None
+
+def cargar_vocabulario_base():
+    """Vocabulario ferroviario compartido por todas las líneas"""
+    global _VOCABULARIO_BASE
+    if _VOCABULARIO_BASE is None:
+        try:
+            with open(ARCHIVO_VOCABULARIO, 'r', encoding='utf-8') as f:
+                _VOCABULARIO_BASE = frozenset(p.upper() for p in json.load(f).get('palabras', []))
+        except Exception as e:
+            print(f"⚠️ Error cargando vocabulario ortográfico: {e}")
+            _VOCABULARIO_BASE = frozenset()
+    return _VOCABULARIO_BASE
+
+
+_LEXICO = None
+_LEXICO_HUELLA = None
+_LEXICO_CARGADO = False
+
+def cargar_lexico():
+    """
+    Léxico general del español (configs/lexico_es.txt.gz), en mayúsculas y
+    sin tildes. None si no se pudo leer: el corrector en proceso no marca nada.
+    """
+    global _LEXICO, _LEXICO_HUELLA, _LEXICO_CARGADO
+    if not _LEXICO_CARGADO:
+        try:
+            with open(ARCHIVO_LEXICO, 'rb') as f:
+                datos = f.read()
+            _LEXICO = frozenset(
+                sin_tildes(linea.strip().upper())
+                for linea in gzip.decompress(datos).decode('utf-8').splitlines()
+                if linea.strip() and not linea.startswith('#')
+            )
+            _LEXICO_HUELLA = hashlib.sha1(datos).hexdigest()[:16]
+        except Exception as e:
+            print(f"⚠️ Error cargando léxico general ({ARCHIVO_LEXICO}): {e}. Corrector en proceso desactivado")
+            _LEXICO = None
+            _LEXICO_HUELLA = None
+        _LEXICO_CARGADO = True
+    return _LEXICO
+
+
+_CORRECTORES = {}
+_CORRECTORES_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+def obtener_corrector_symspell(palabras_tecnicas=()):
+    """
+    Corrector para el vocabulario base más las palabras técnicas de una línea.
+    Se arma una vez por vocabulario: primero en memoria, después desde el
+    índice persistido en data/cache/ y recién si no existe se calcula.
+    `corrector.huella` identifica vocabulario y léxico (va en la clave del
+    cache de reportes).
+    """
+    clave = frozenset(palabras_tecnicas)
+    corrector = _CORRECTORES.get(clave)
+    if corrector is not None:
+        return corrector
+
+    with _CORRECTORES_LOCK:
+        corrector = _CORRECTORES.get(clave)
+        if corrector is not None:
+            return corrector
+
+        extra = frozenset(
+            palabra
+            for entrada in clave
+            for palabra in CorrectorSymSpell._PATRON_PALABRA.findall(str(entrada).upper())
+        )
+        palabras = cargar_vocabulario_base() | extra
+        huella = hashlib.sha1('\n'.join(sorted(palabras)).encode('utf-8')).hexdigest()[:16]
+        ruta = os.path.join(DIR_CACHE_SYMSPELL, f'symspell_{huella}.pkl')
+
+        lexico = cargar_lexico()
+        try:
+            corrector = CorrectorSymSpell.cargar(ruta, lexico)
+        except Exception:
+            corrector = CorrectorSymSpell.construir(palabras, lexico)
+            try:
+                corrector.guardar(ruta)
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar índice ortográfico: {e}")
+        corrector.huella = f'{huella}:{_LEXICO_HUELLA}'
+
+        _CORRECTORES[clave] = corrector
+        return corrector
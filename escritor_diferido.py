@@ -0,0 +1,103 @@
+"""
+escritor_diferido.py — Escritura en segundo plano, agrupando cambios
+====================================================================
+Una ráfaga de acciones (un validador cerrando una tanda, asignar_tanda
+justo después de /api/validar, crear una regla) marca el almacén como
+sucio varias veces seguidas. En lugar de escribir en cada una, un hilo
+espera VENTANA segundos desde la primera marca y escribe una sola vez con
+todo lo acumulado. El pedido no espera la escritura.
+
+sincronizar() es para los pedidos que tienen que quedar en disco antes de
+responder: adelanta la escritura pendiente y espera a que termine.
+
+    escritor = EscritorDiferido(gestor.compactar, ventana=2.0)
+    escritor.marcar()        # después de cada cambio
+    escritor.sincronizar()   # antes de responder, si hace falta
+
+Si la escritura falla, el almacén sigue sucio y se reintenta en la
+siguiente ventana. Al salir del proceso se escribe lo pendiente.
+"""
+
+import time
+import atexit
+import threading
+
+ESPERA_REINTENTO = 1.0  # segundos entre reintentos si la escritura falla
+
+
+class EscritorDiferido:
+    def __init__(self, escribir, ventana, nombre='escritor-diferido'):
+        self._escribir = escribir
+        self.ventana = ventana
+        self.nombre = nombre
+        self._cond = threading.Condition()
+        self._sucio = False
+        self._urgente = False
+        self._marcas = 0       # Cambios marcados desde que arrancó
+        self._escritas = 0     # Hasta qué marca ya está en disco
+        self._hilo = None
+        self.escrituras = 0
+        self.error = None
+
+    @property
+    def sucio(self):
+        return self._sucio
+
+    def marcar(self):
+        """Hubo un cambio: escribir dentro de la ventana"""
+        with self._cond:
+            self._marcas += 1
+            self._sucio = True
+            self._arrancar()
+            self._cond.notify_all()
+
+    def sincronizar(self, timeout=None):
+        """
+        Escribe ya lo marcado hasta ahora y espera a que esté en disco.
+        Returns: True si quedó escrito, False si venció el timeout
+        """
+        with self._cond:
+            objetivo = self._marcas
+            if self._escritas >= objetivo:
+                return True
+            self._urgente = True
+            self._arrancar()
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._escritas >= objetivo, timeout)
+
+    def _arrancar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._trabajar, daemon=True, name=self.nombre)
+            self._hilo.start()
+            atexit.register(self.sincronizar, 30)
+
+    def _trabajar(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._sucio)
+                # Ventana de agrupamiento: los cambios que lleguen mientras tanto van en la misma escritura
+                limite = time.monotonic() + self.ventana
+                while not self._urgente:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                marca = self._marcas
+                self._sucio = False
+                self._urgente = False
+
+            try:
+                self._escribir()
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ {self.nombre}: falló la escritura, se reintenta ({self.error})")
+                with self._cond:
+                    self._sucio = True
+                time.sleep(ESPERA_REINTENTO)
+                continue
+
+            with self._cond:
+                self.escrituras += 1
+                self.error = None
+                self._escritas = max(self._escritas, marca)
+                self._cond.notify_all()
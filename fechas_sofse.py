@@ -0,0 +1,63 @@
+"""
+fechas_sofse.py — Parseo rápido de las fechas del sistema SOFSE
+===============================================================
+El sistema de novedades usa siempre 'DD/MM/YYYY HH:MM:SS' (y 'DD/MM/YYYY'
+en los títulos de los paneles). datetime.strptime es de lo más lento del
+pipeline en Python puro: acá el formato fijo se corta por posición y se
+convierte con int(), con un LRU chico porque las mismas fechas se repiten
+mucho (un mismo minuto, un mismo día de scraping).
+
+Mismo resultado y mismos errores que strptime: cualquier texto que no
+tenga exactamente el formato fijo con dígitos ASCII (ej: '1/2/2025 9:05:00',
+que strptime acepta) o que dé una fecha inválida pasa por strptime, que
+devuelve lo mismo de siempre o levanta su ValueError/TypeError de siempre.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+FORMATO_FECHA_HORA = "%d/%m/%Y %H:%M:%S"
+FORMATO_FECHA = "%d/%m/%Y"
+TAMANIO_CACHE = 4096
+
+
+@lru_cache(maxsize=TAMANIO_CACHE)
+def _fecha_hora(texto):
+    if (len(texto) == 19 and texto.isascii()
+            and texto[2] == '/' and texto[5] == '/' and texto[10] == ' '
+            and texto[13] == ':' and texto[16] == ':'):
+        anio, mes, dia = texto[6:10], texto[3:5], texto[0:2]
+        hora, minuto, segundo = texto[11:13], texto[14:16], texto[17:19]
+        if (anio.isdigit() and mes.isdigit() and dia.isdigit()
+                and hora.isdigit() and minuto.isdigit() and segundo.isdigit()):
+            try:
+                return datetime(int(anio), int(mes), int(dia), int(hora), int(minuto), int(segundo))
+            except ValueError:
+                pass  # Fecha inválida (31/02, 24:00...): el error lo da strptime
+    return datetime.strptime(texto, FORMATO_FECHA_HORA)
+
+
+@lru_cache(maxsize=TAMANIO_CACHE)
+def _fecha(texto):
+    if len(texto) == 10 and texto.isascii() and texto[2] == '/' and texto[5] == '/':
+        anio, mes, dia = texto[6:10], texto[3:5], texto[0:2]
+        if anio.isdigit() and mes.isdigit() and dia.isdigit():
+            try:
+                return datetime(int(anio), int(mes), int(dia))
+            except ValueError:
+                pass
+    return datetime.strptime(texto, FORMATO_FECHA)
+
+
+def parsear_fecha_hora(texto):
+    """datetime de 'DD/MM/YYYY HH:MM:SS' (equivale a strptime con FORMATO_FECHA_HORA)"""
+    if type(texto) is not str:
+        return datetime.strptime(texto, FORMATO_FECHA_HORA)  # Mismo TypeError de siempre
+    return _fecha_hora(texto)
+
+
+def parsear_fecha(texto):
+    """datetime de 'DD/MM/YYYY' (equivale a strptime con FORMATO_FECHA)"""
+    if type(texto) is not str:
+        return datetime.strptime(texto, FORMATO_FECHA)
+    return _fecha(texto)
@@ -1,123 +1,456 @@
+import os
 import json
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
 
+from bitacora_mensajes import (
+    BitacoraMensajes, aplicar_registros, bloqueo_archivo, escribir_atomico, firma_archivo,
+)
+from indices_mensajes import IndicesMensajes
+from escritor_diferido import EscritorDiferido
+
+ARCHIVO_MENSAJES = 'data/mensajes_estado.json'
+TAMANIO_TANDA = 5
+# Cambios en la bitácora antes de reescribir el snapshot
+COMPACTAR_CADA = int(os.environ.get('GESTOR_COMPACTAR_CADA', '1000') or 1000)
+# Sin bitácora (GESTOR_BITACORA=0) cada cambio solo marca el snapshot como sucio
+BITACORA_ACTIVA = os.environ.get('GESTOR_BITACORA', '1') != '0'
+# Segundos que se agrupan cambios antes de escribir el snapshot en segundo plano
+VENTANA_ESCRITURA = float(os.environ.get('GESTOR_VENTANA_ESCRITURA', '2') or 2)
+
+
+def crear_gestor():
+    """
+    Gestor según GESTOR_ALMACEN: 'json' (default, data/mensajes_estado.json)
+    o 'sqlite' (GESTOR_DB, default data/mensajes.db).
+    """
+    almacen = os.environ.get('GESTOR_ALMACEN', 'json').lower()
+    if almacen == 'sqlite':
+        from gestor_tandas_sqlite import GestorTandasSQLite, ARCHIVO_DB
+        return GestorTandasSQLite(os.environ.get('GESTOR_DB') or ARCHIVO_DB)
+    return GestorTandas()
+
+
+def mensaje_desde_validador(msg):
+    """Mensaje del sistema a partir de uno del JSON del validador"""
+    # CRÍTICO: Los datos están dentro de 'analisis'
+    # Usamos .get({}, {}) para asegurarnos de que si analisis es None, sea {}
+    analisis = msg.get('analisis') or {}
+    return {
+        'id': msg.get('numero_mensaje'),
+        'contenido': msg.get('contenido'),
+        'operador': msg.get('operador'),
+        'linea': msg.get('linea'),
+        'fecha_hora': msg.get('fecha_hora'),
+        'tipo_mensaje': analisis.get('tipo_mensaje'),
+        'estado': 'PENDIENTE',
+        'asignado_a': None,
+        'asignado_en': None,
+        'procesado_por': None,
+        'procesado_en': None,
+        'nivel_general': analisis.get('nivel_general', 'OBSERVACIONES'),
+        'clasificacion': analisis.get('clasificacion', {}),
+        'scores': analisis.get('scores', {}),
+        'componentes': analisis.get('componentes', {}),
+        'timing': analisis.get('timing')
+    }
+
+
+def leer_json_validador(ruta_json_validador):
+    try:
+        with open(ruta_json_validador, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Error: No se encontró el archivo {ruta_json_validador}")
+        return None
+
+
+def marcar_asignado(mensaje, usuario, linea):
+    mensaje['estado'] = f'ASIGNADO_{usuario.upper()}'
+    mensaje['asignado_a'] = usuario
+    mensaje['linea_asignada'] = linea
+    mensaje['asignado_en'] = datetime.now().isoformat()
+
+
+def operacion_de_accion(accion):
+    """Nombre de la transición en la bitácora para una acción del validador"""
+    if accion == 'ENVIAR':
+        return 'completar'
+    if accion in ('REPORTAR', 'REPORTAR_ERROR'):
+        return 'derivar'
+    return 'procesar'
+
+
+def marcar_procesado(mensaje, accion, usuario):
+    if accion == 'ENVIAR':
+        mensaje['estado'] = 'COMPLETADO'
+    elif accion == 'REPORTAR' or accion == 'REPORTAR_ERROR':
+        mensaje['estado'] = 'DERIVADO_A_ARIEL'
+    mensaje['procesado_por'] = usuario
+    mensaje['procesado_en'] = datetime.now().isoformat()
+
+
 class GestorTandas:
-    def __init__(self, archivo_mensajes='data/mensajes_estado.json'):
+    """
+    Mensajes en memoria. El estado persistido es el snapshot
+    (data/mensajes_estado.json) más la bitácora de cambios posteriores
+    (data/mensajes_estado.bitacora, ver bitacora_mensajes.py). El snapshot
+    se reescribe al arrancar y, cada COMPACTAR_CADA cambios, en segundo
+    plano (escritor_diferido.py): el pedido que cruza el umbral no espera.
+
+    Varios procesos (gunicorn --workers N) comparten los mismos archivos.
+    Cada cambio es una transacción: bloqueo exclusivo de
+    data/mensajes_estado.lock, incorporar lo que registraron los otros
+    workers, modificar y registrar. Las consultas incorporan los cambios
+    ajenos antes de responder (un stat si no hubo ninguno). Si otro worker
+    compactó, la vista se recarga entera; los dicts de los mensajes que ya
+    estaban se actualizan en el lugar, así que siguen siendo los de la lista.
+
+    Con GESTOR_BITACORA=0 no hay bitácora: cada cambio marca el snapshot
+    como sucio y se escribe una vez por ventana (VENTANA_ESCRITURA). Los
+    pedidos que tienen que quedar en disco antes de responder llaman a
+    sincronizar(). Sin bitácora no hay forma de ver los cambios de otros
+    procesos: es para un solo worker.
+
+    Las consultas usan los índices de indices_mensajes.py y, como en
+    GestorTandasSQLite, devuelven copias (superficiales: los campos se
+    reemplazan, no se modifican adentro). Modificar una copia no cambia el
+    gestor: todo cambio pasa por un método que persiste y re-indexa
+    (modificar_mensajes, guardar_mensajes, agregar_mensajes...).
+    """
+    def __init__(self, archivo_mensajes=ARCHIVO_MENSAJES, bitacora=BITACORA_ACTIVA,
+                 ventana_escritura=VENTANA_ESCRITURA):
         self.archivo = Path(archivo_mensajes)
-        self.mensajes = self._cargar_mensajes()
-    
-    def _cargar_mensajes(self):
-        if self.archivo.exists():
-            with open(self.archivo, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    
-    def _guardar_mensajes(self):
+        # Las bitácoras que hayan quedado se reproducen igual, aunque ahora esté apagada
+        bitacora_archivo = BitacoraMensajes(self.archivo.with_suffix('.bitacora'))
+        self.bitacora = bitacora_archivo if bitacora else None
+        self._bloqueo = self.archivo.with_suffix('.lock')
+        self._bloqueo_compactar = self.archivo.with_name(self.archivo.stem + '.compactar.lock')
+        self._lock = threading.RLock()
+        self._lock_snapshot = threading.Lock()  # Un snapshot a la vez, en el orden de las fotos
+        self._profundidad = 0                   # Transacciones anidadas del hilo que tiene el lock
+        self._vista = (None, None, 0)           # (firma del snapshot, inodo de la bitácora, bytes leídos)
+        self.escritor = EscritorDiferido(self.compactar, ventana_escritura, 'escritor-mensajes')
+        self._mensajes = []
+        self.indices = IndicesMensajes()
+        with self._lock, bloqueo_archivo(self._bloqueo, exclusivo=False):
+            registros = self._recargar(bitacora_archivo)
+        if registros:
+            print(f"📒 {registros} cambios reproducidos desde {bitacora_archivo.ruta}")
+            self.compactar(bitacora_archivo)
+
+    @property
+    def mensajes(self):
+        """Copia de todos los mensajes, en orden y al día con los otros procesos"""
+        self._al_dia()
+        return [dict(m) for m in self._mensajes]
+
+    def _copias(self, posiciones):
+        return [dict(self._mensajes[p]) for p in posiciones]
+
+    def _recargar(self, bitacora):
+        """
+        Snapshot + bitácoras desde cero (al arrancar, o si otro proceso
+        compactó). Los mensajes que ya estaban conservan su dict.
+        Returns: cantidad de registros reproducidos
+        """
+        while True:
+            firma = firma_archivo(self.archivo)
+            mensajes = []
+            if firma is not None:
+                with open(self.archivo, 'r', encoding='utf-8') as f:
+                    mensajes = json.load(f)
+            posicion = bitacora.posicion() or (None, 0)
+            registros = bitacora.leer()
+            # Si otro proceso terminó de compactar mientras se leía, la rotada pudo no estar
+            if firma_archivo(self.archivo) == firma:
+                break
+        aplicar_registros(mensajes, registros)
+
+        anteriores = {}
+        for mensaje in self._mensajes:
+            anteriores.setdefault(mensaje.get('id'), mensaje)
+        for i, mensaje in enumerate(mensajes):
+            anterior = anteriores.pop(mensaje.get('id'), None)
+            if anterior is not None:
+                anterior.clear()
+                anterior.update(mensaje)
+                mensajes[i] = anterior
+        self._mensajes = mensajes
+        self.indices.reconstruir(self._mensajes)
+        self._vista = (firma,) + posicion
+        return len(registros)
+
+    def _cambio_en_disco(self):
+        firma, inodo, leido = self._vista
+        return (firma_archivo(self.archivo) != firma
+                or (self.bitacora.posicion() or (None, 0)) != (inodo, leido))
+
+    def _ponerse_al_dia(self):
+        """Incorpora lo que registraron otros procesos (con el bloqueo tomado)"""
+        firma, inodo, leido = self._vista
+        if firma_archivo(self.archivo) != firma:
+            self._recargar(self.bitacora)
+            return
+        registros = []
+        actual = self.bitacora.posicion() or (None, 0)
+        if actual[0] != inodo:
+            if inodo is not None:
+                # Otro proceso rotó la bitácora para compactar: terminar la rotada
+                if (firma_archivo(self.bitacora.ruta_rotada) or (None,))[0] != inodo:
+                    self._recargar(self.bitacora)
+                    return
+                registros, _ = self.bitacora.leer_desde(leido, self.bitacora.ruta_rotada)
+            self.bitacora.registros = 0
+            inodo, leido = actual[0], 0
+        if inodo is not None:
+            nuevos, leido = self.bitacora.leer_desde(leido)
+            self.bitacora.registros += len(nuevos)
+            registros += nuevos
+        self._vista = (firma, inodo, leido)
+
+        for registro in registros:
+            nuevo = registro['m']
+            posicion = self.indices.por_id.get(nuevo.get('id'))
+            if posicion is None:
+                self._mensajes.append(nuevo)
+                self.indices.agregar(nuevo)
+            else:
+                mensaje = self._mensajes[posicion]
+                mensaje.clear()
+                mensaje.update(nuevo)
+                self.indices.actualizar(mensaje)
+
+    def _al_dia(self):
+        """Antes de una consulta: incorpora los cambios de otros procesos, si hubo"""
+        if self.bitacora is None or not self._cambio_en_disco():
+            return
+        with self._lock:
+            if self._profundidad:
+                return  # Dentro de una transacción de este hilo: ya está al día
+            with bloqueo_archivo(self._bloqueo, exclusivo=False):
+                self._ponerse_al_dia()
+
+    @contextmanager
+    def _transaccion(self):
+        """Lock del proceso + bloqueo exclusivo entre procesos, con la vista al día"""
+        with self._lock:
+            externa = self._profundidad == 0 and self.bitacora is not None
+            with bloqueo_archivo(self._bloqueo) if externa else nullcontext():
+                if externa and self._cambio_en_disco():
+                    self._ponerse_al_dia()
+                self._profundidad += 1
+                try:
+                    yield
+                finally:
+                    self._profundidad -= 1
+
+    def _guardar_mensajes(self, mensajes=None):
+        """Snapshot completo (temporal + fsync + rename)"""
         self.archivo.parent.mkdir(exist_ok=True)
-        with open(self.archivo, 'w', encoding='utf-8') as f:
-            json.dump(self.mensajes, f, ensure_ascii=False, indent=2)
+        escribir_atomico(self.archivo, self._mensajes if mensajes is None else mensajes)
+
+    def compactar(self, bitacora=None):
+        """
+        Escribe el snapshot y descarta la bitácora que cubre. La foto se toma
+        en una transacción (copia superficial: app.py reemplaza los campos,
+        no los modifica adentro); serializar y escribir es fuera de ella.
+        Entre procesos, una compactación a la vez (data/mensajes_estado.compactar.lock).
+        """
+        bitacora = bitacora or self.bitacora
+        with self._lock_snapshot, bloqueo_archivo(self._bloqueo_compactar):
+            with self._transaccion():
+                if (bitacora is not None and self.bitacora is not None and not bitacora.registros
+                        and not os.path.exists(bitacora.ruta_rotada)):
+                    return  # Otro worker ya compactó lo que había
+                foto = [dict(m) for m in self._mensajes]
+                if bitacora is not None:
+                    bitacora.rotar()
+                    self._vista = (self._vista[0], None, 0)
+            self._guardar_mensajes(foto)
+            with self._lock:
+                self._vista = (firma_archivo(self.archivo),) + self._vista[1:]
+            if bitacora is not None:
+                bitacora.descartar_rotada()
+
+    def _reemplazar_todo(self, mensajes=None):
+        """La lista entera cambió: snapshot sincrónico, dentro de la transacción"""
+        with self._lock_snapshot, bloqueo_archivo(self._bloqueo_compactar), self._transaccion():
+            if mensajes is not None:
+                self._mensajes = mensajes
+            self.indices.reconstruir(self._mensajes)
+            if self.bitacora is not None:
+                self.bitacora.rotar()
+            self._guardar_mensajes()
+            if self.bitacora is not None:
+                self.bitacora.descartar_rotada()
+            self._vista = (firma_archivo(self.archivo), None, 0)
+
+    def sincronizar(self, timeout=None):
+        """
+        Deja en disco todo lo hecho hasta ahora antes de responder. Con
+        bitácora ya lo está (cada registro tiene fsync); sin bitácora
+        adelanta la escritura diferida y la espera.
+        """
+        if self.bitacora is not None:
+            return True
+        return self.escritor.sincronizar(timeout)
+
+    def _registrar(self, operacion, mensajes):
+        """Re-indexa y persiste los mensajes tocados por una transición (dentro de una transacción)"""
+        for mensaje in mensajes:
+            self.indices.actualizar(mensaje)
+        if self.bitacora is None:
+            if mensajes:
+                self.escritor.marcar()
+            return
+        self.bitacora.registrar(operacion, mensajes)
+        # Lo recién escrito ya está en memoria: no releerlo
+        self._vista = (self._vista[0],) + (self.bitacora.posicion() or (None, 0))
+        if self.bitacora.registros >= COMPACTAR_CADA:
+            self.escritor.marcar()
     
     def asignar_tanda(self, usuario, linea):
         """
         Asigna 5 mensajes PENDIENTES (NO bloqueados)
         Los bloqueados se muestran aparte en el acordeón
         """
-        # Buscar SOLO mensajes PENDIENTES de esa línea
-        pendientes = [
-            m for m in self.mensajes 
-            if m['estado'] == 'PENDIENTE' and m['linea'] == linea
-        ]
-        
-        # Tomar los primeros 5
-        tanda = pendientes[:5]
-        
-        # Marcarlos como asignados
-        for mensaje in tanda:
-            mensaje['estado'] = f'ASIGNADO_{usuario.upper()}'
-            mensaje['asignado_a'] = usuario
-            mensaje['linea_asignada'] = linea
-            mensaje['asignado_en'] = datetime.now().isoformat()
-        
-        self._guardar_mensajes()
-        return tanda
+        with self._transaccion():
+            # Los primeros 5 PENDIENTES de esa línea (posiciones ordenadas)
+            posiciones = self.indices.por_linea_estado.get((linea, 'PENDIENTE'), [])
+            tanda = [self._mensajes[p] for p in posiciones[:TAMANIO_TANDA]]
+            
+            # Marcarlos como asignados
+            for mensaje in tanda:
+                marcar_asignado(mensaje, usuario, linea)
+            
+            self._registrar('asignar', tanda)
+            return [dict(m) for m in tanda]
 
     def obtener_bloqueados(self, usuario):
         """Obtiene mensajes bloqueados para este usuario"""
         return [
-            m for m in self.mensajes 
-            if m['estado'] == f'ASIGNADO_{usuario.upper()}' 
-            and m.get('bloqueado', False) == True
+            m for m in self.obtener_mensajes_asignados(usuario)
+            if m.get('bloqueado', False) == True
         ]
     
     def procesar_mensaje(self, mensaje_id, accion, usuario):
-        mensaje = next((m for m in self.mensajes if m['id'] == mensaje_id), None)
-        if not mensaje:
-            return False
-        if accion == 'ENVIAR':
-            mensaje['estado'] = 'COMPLETADO'
-        elif accion == 'REPORTAR' or accion == 'REPORTAR_ERROR':
-            mensaje['estado'] = 'DERIVADO_A_ARIEL'
-        mensaje['procesado_por'] = usuario
-        mensaje['procesado_en'] = datetime.now().isoformat()
-        self._guardar_mensajes()
-        return True
+        mensaje = self.modificar_mensaje(
+            mensaje_id, lambda m: marcar_procesado(m, accion, usuario), operacion_de_accion(accion)
+        )
+        return mensaje is not None
     
     def contar_asignados(self, usuario):
-        return len([m for m in self.mensajes if m['estado'] == f'ASIGNADO_{usuario.upper()}'])
+        self._al_dia()
+        return len(self.indices.por_estado.get(f'ASIGNADO_{usuario.upper()}', []))
     
     def liberar_mensajes(self, usuario):
-        for mensaje in self.mensajes:
-            if mensaje['estado'] == f'ASIGNADO_{usuario.upper()}':
+        with self._transaccion():
+            posiciones = self.indices.por_estado.get(f'ASIGNADO_{usuario.upper()}', [])
+            liberados = [self._mensajes[p] for p in posiciones]
+            for mensaje in liberados:
                 mensaje['estado'] = 'PENDIENTE'
                 mensaje['asignado_a'] = None
-        self._guardar_mensajes()
+            self._registrar('liberar', liberados)
     
     def obtener_mensajes_asignados(self, usuario):
-        return [m for m in self.mensajes if m['estado'] == f'ASIGNADO_{usuario.upper()}']
+        return self.mensajes_por_estado(f'ASIGNADO_{usuario.upper()}')
     
     def contar_pendientes_por_linea(self):
-        conteo = {}
-        for mensaje in self.mensajes:
-            if mensaje['estado'] == 'PENDIENTE':
-                linea = mensaje['linea']
-                conteo[linea] = conteo.get(linea, 0) + 1
-        return conteo
+        self._al_dia()
+        return self.indices.lineas_con_estado('PENDIENTE')
     
+    def obtener_mensaje(self, mensaje_id):
+        """Primer mensaje con ese id, o None. Es una copia: guardar con guardar_mensajes"""
+        self._al_dia()
+        posicion = self.indices.por_id.get(mensaje_id)
+        return dict(self._mensajes[posicion]) if posicion is not None else None
+
+    def mensajes_por_estado(self, estado):
+        self._al_dia()
+        return self._copias(self.indices.por_estado.get(estado, []))
+
+    def mensajes_asignados_a(self, usuario):
+        """Mensajes con asignado_a == usuario (en cualquier estado)"""
+        self._al_dia()
+        return self._copias(self.indices.por_asignado.get(usuario, []))
+
+    def ids_mensajes(self):
+        self._al_dia()
+        return [m.get('id') for m in self._mensajes]
+
+    def modificar_mensaje(self, mensaje_id, modificar, operacion='actualizar'):
+        """
+        Leer, modificar y registrar un mensaje en una sola transacción: con
+        varios workers, obtener_mensaje + guardar_mensajes puede pisar un
+        cambio que otro hizo en el medio.
+        Returns: el mensaje modificado, o None si no existe
+        """
+        modificados = self.modificar_mensajes([mensaje_id], modificar, operacion)
+        return modificados[0] if modificados else None
+
+    def modificar_mensajes(self, ids, modificar, operacion='actualizar'):
+        """
+        modificar(mensaje) sobre el estado actual de cada id, en una sola
+        transacción. Los ids que no existen se saltean.
+        Returns: los mensajes modificados
+        """
+        with self._transaccion():
+            modificados = []
+            for mensaje_id in ids:
+                posicion = self.indices.por_id.get(mensaje_id)
+                if posicion is None:
+                    continue
+                mensaje = self._mensajes[posicion]
+                modificar(mensaje)
+                modificados.append(mensaje)
+            self._registrar(operacion, modificados)
+            return [dict(m) for m in modificados]
+
+    def guardar_mensajes(self, mensajes=None, operacion='actualizar'):
+        """
+        Persiste cambios hechos a copias obtenidas del gestor: cada una
+        reemplaza al mensaje con su id (los ids que no existen se saltean).
+        Sin `mensajes` se escribe el snapshot completo. Si otro worker los
+        cambió mientras tanto, queda lo de quien guarda (para leer y
+        modificar sin pisar a nadie: modificar_mensajes).
+        """
+        if mensajes is None:
+            self._reemplazar_todo()
+            return
+        with self._transaccion():
+            guardados = []
+            for mensaje in mensajes:
+                posicion = self.indices.por_id.get(mensaje.get('id'))
+                if posicion is None:
+                    continue
+                actual = self._mensajes[posicion]
+                if actual is not mensaje:
+                    actual.clear()
+                    actual.update(mensaje)
+                guardados.append(actual)
+            self._registrar(operacion, guardados)
+
+    def agregar_mensajes(self, mensajes_nuevos):
+        """Agrega al final; un id que ya existe se ignora (otro worker pudo importarlo antes)"""
+        with self._transaccion():
+            agregados = []
+            for mensaje in mensajes_nuevos:
+                if mensaje.get('id') is not None and mensaje.get('id') in self.indices.por_id:
+                    continue
+                mensaje = dict(mensaje)  # El llamador se queda con el suyo
+                self._mensajes.append(mensaje)
+                self.indices.agregar(mensaje)
+                agregados.append(mensaje)
+            self._registrar('importar', agregados)
+
     def importar_desde_validador(self, ruta_json_validador):
         """Importa mensajes desde el JSON del validador"""
-        try:
-            with open(ruta_json_validador, 'r', encoding='utf-8') as f:
-                mensajes_validador = json.load(f)
-        except FileNotFoundError:
-            print(f"Error: No se encontró el archivo {ruta_json_validador}")
+        mensajes_validador = leer_json_validador(ruta_json_validador)
+        if mensajes_validador is None:
             return
 
-        self.mensajes = []
-        
-        for msg in mensajes_validador:
-            # CRÍTICO: Los datos están dentro de 'analisis'
-            # Usamos .get({}, {}) para asegurarnos de que si analisis es None, sea {}
-            analisis = msg.get('analisis') or {}
-            
-            self.mensajes.append({
-                'id': msg.get('numero_mensaje'),
-                'contenido': msg.get('contenido'),
-                'operador': msg.get('operador'),
-                'linea': msg.get('linea'),
-                'fecha_hora': msg.get('fecha_hora'),
-                'tipo_mensaje': analisis.get('tipo_mensaje'),
-                'estado': 'PENDIENTE',
-                'asignado_a': None,
-                'asignado_en': None,
-                'procesado_por': None,
-                'procesado_en': None,
-                'nivel_general': analisis.get('nivel_general', 'OBSERVACIONES'),
-                'clasificacion': analisis.get('clasificacion', {}),
-                'scores': analisis.get('scores', {}),
-                'componentes': analisis.get('componentes', {}),
-                'timing': analisis.get('timing')
-            })
-        
-        self._guardar_mensajes()
-        print(f"Importados {len(self.mensajes)} mensajes correctamente")
+        self._reemplazar_todo([mensaje_desde_validador(msg) for msg in mensajes_validador])
+        print(f"Importados {len(self._mensajes)} mensajes correctamente")
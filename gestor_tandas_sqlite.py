@@ -0,0 +1,318 @@
+"""
+gestor_tandas_sqlite.py — GestorTandas sobre SQLite (modo WAL)
+==============================================================
+Misma interfaz que GestorTandas, pero cada operación de la cola es una
+consulta con índice (id, estado, linea+estado, asignado_a) en lugar de
+recorrer la lista entera, y cada cambio escribe solo las filas tocadas.
+
+Cada mensaje se guarda completo como JSON en `datos`; las columnas
+estado/linea/asignado_a/bloqueado son copias para filtrar y se actualizan
+en cada escritura. `orden` conserva el orden de la lista original (el de
+las tandas y los conteos); como es el rowid, todo índice ya lo incluye y
+dentro de una misma clave las filas salen en ese orden.
+
+`gestor.mensajes` sigue existiendo para los recorridos masivos (re-validar
+con reglas, deduplicar importaciones) pero es una copia: después de
+modificar mensajes hay que llamar a guardar_mensajes(mensajes), o mejor
+modificar_mensajes(ids, funcion), que lee y escribe en la misma transacción.
+
+Se activa con GESTOR_ALMACEN=sqlite (base en GESTOR_DB, default
+data/mensajes.db). Si la base es nueva y existe data/mensajes_estado.json,
+se migra sola. Migración manual:
+    python gestor_tandas_sqlite.py [data/mensajes_estado.json] [data/mensajes.db] [--reemplazar]
+"""
+
+import sys
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from gestor_tandas import (
+    ARCHIVO_MENSAJES, TAMANIO_TANDA,
+    mensaje_desde_validador, leer_json_validador, marcar_asignado, marcar_procesado, operacion_de_accion,
+)
+
+ARCHIVO_DB = 'data/mensajes.db'
+TIMEOUT_BLOQUEO = 30  # segundos esperando a otro escritor
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS mensajes (
+    orden       INTEGER PRIMARY KEY,
+    id          TEXT UNIQUE,
+    estado      TEXT NOT NULL,
+    linea       TEXT,
+    asignado_a  TEXT,
+    bloqueado   INTEGER NOT NULL DEFAULT 0,
+    datos       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mensajes_estado ON mensajes(estado, linea);
+CREATE INDEX IF NOT EXISTS idx_mensajes_linea_estado ON mensajes(linea, estado);
+CREATE INDEX IF NOT EXISTS idx_mensajes_asignado ON mensajes(asignado_a);
+"""
+
+
+def _fila(mensaje):
+    """Valores de las columnas indexadas + JSON completo"""
+    return (
+        mensaje.get('id'),
+        mensaje.get('estado'),
+        mensaje.get('linea'),
+        mensaje.get('asignado_a'),
+        1 if mensaje.get('bloqueado', False) == True else 0,
+        json.dumps(mensaje, ensure_ascii=False, separators=(',', ':')),
+    )
+
+
+class GestorTandasSQLite:
+    def __init__(self, archivo_db=ARCHIVO_DB, archivo_json=ARCHIVO_MENSAJES):
+        self.archivo = Path(archivo_db)
+        self.archivo.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conexion().executescript(ESQUEMA)
+        # Varios workers arrancan a la vez: migra el primero, los demás esperan su transacción
+        with self._transaccion() as con:
+            nueva = (con.execute("PRAGMA user_version").fetchone()[0] == 0
+                     and not con.execute("SELECT 1 FROM mensajes LIMIT 1").fetchone())
+            if nueva and archivo_json and Path(archivo_json).exists():
+                migrados, repetidos = self._migrar(con, archivo_json)
+                print(f"🗄️ Base nueva {self.archivo}: {migrados} mensajes migrados desde {archivo_json}"
+                      + (f" ({repetidos} ids repetidos ignorados)" if repetidos else ""))
+            con.execute("PRAGMA user_version = 1")
+
+    # =================================================================
+    #  CONEXIÓN
+    # =================================================================
+
+    def _conexion(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.archivo, timeout=TIMEOUT_BLOQUEO, isolation_level=None)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            self._local.con = con
+        return con
+
+    def _transaccion(self):
+        return _Transaccion(self._conexion())
+
+    def _consultar(self, sql, parametros=()):
+        """Mensajes (dicts) de una consulta que devuelve la columna datos"""
+        return [json.loads(datos) for (datos,) in self._conexion().execute(sql, parametros)]
+
+    def _actualizar(self, con, mensajes):
+        con.executemany(
+            "UPDATE mensajes SET estado=?, linea=?, asignado_a=?, bloqueado=?, datos=? WHERE id=?",
+            [_fila(m)[1:] + (m.get('id'),) for m in mensajes],
+        )
+
+    def _insertar(self, con, mensajes):
+        """Returns: cantidad de mensajes ignorados por id repetido"""
+        antes = con.total_changes
+        con.executemany(
+            "INSERT OR IGNORE INTO mensajes (id, estado, linea, asignado_a, bloqueado, datos) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [_fila(m) for m in mensajes],
+        )
+        return len(mensajes) - (con.total_changes - antes)
+
+    # =================================================================
+    #  INTERFAZ DE GestorTandas
+    # =================================================================
+
+    @property
+    def mensajes(self):
+        """Copia de todos los mensajes, en orden (para recorridos masivos)"""
+        return self._consultar("SELECT datos FROM mensajes ORDER BY orden")
+
+    def asignar_tanda(self, usuario, linea):
+        """
+        Asigna 5 mensajes PENDIENTES (NO bloqueados)
+        Los bloqueados se muestran aparte en el acordeón
+        """
+        with self._transaccion() as con:
+            tanda = [json.loads(datos) for (datos,) in con.execute(
+                "SELECT datos FROM mensajes WHERE linea IS ? AND estado = 'PENDIENTE' "
+                "ORDER BY orden LIMIT ?", (linea, TAMANIO_TANDA)
+            )]
+            for mensaje in tanda:
+                marcar_asignado(mensaje, usuario, linea)
+            self._actualizar(con, tanda)
+        return tanda
+
+    def obtener_bloqueados(self, usuario):
+        """Obtiene mensajes bloqueados para este usuario"""
+        return self._consultar(
+            "SELECT datos FROM mensajes WHERE estado = ? AND bloqueado = 1 ORDER BY orden",
+            (f'ASIGNADO_{usuario.upper()}',)
+        )
+
+    def procesar_mensaje(self, mensaje_id, accion, usuario):
+        mensaje = self.modificar_mensaje(
+            mensaje_id, lambda m: marcar_procesado(m, accion, usuario), operacion_de_accion(accion)
+        )
+        return mensaje is not None
+
+    def contar_asignados(self, usuario):
+        return self._conexion().execute(
+            "SELECT COUNT(*) FROM mensajes WHERE estado = ?", (f'ASIGNADO_{usuario.upper()}',)
+        ).fetchone()[0]
+
+    def liberar_mensajes(self, usuario):
+        with self._transaccion() as con:
+            asignados = [json.loads(datos) for (datos,) in con.execute(
+                "SELECT datos FROM mensajes WHERE estado = ?", (f'ASIGNADO_{usuario.upper()}',)
+            )]
+            for mensaje in asignados:
+                mensaje['estado'] = 'PENDIENTE'
+                mensaje['asignado_a'] = None
+            self._actualizar(con, asignados)
+
+    def obtener_mensajes_asignados(self, usuario):
+        return self.mensajes_por_estado(f'ASIGNADO_{usuario.upper()}')
+
+    def contar_pendientes_por_linea(self):
+        # Mismo orden que el GestorTandas de JSON: por primera aparición de la línea
+        filas = self._conexion().execute(
+            "SELECT linea, COUNT(*) FROM mensajes WHERE estado = 'PENDIENTE' "
+            "GROUP BY linea ORDER BY MIN(orden)"
+        )
+        return {linea: cantidad for linea, cantidad in filas}
+
+    def obtener_mensaje(self, mensaje_id):
+        """Mensaje con ese id, o None. Es una copia: guardar con guardar_mensajes"""
+        fila = self._conexion().execute("SELECT datos FROM mensajes WHERE id = ?", (mensaje_id,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def mensajes_por_estado(self, estado):
+        return self._consultar("SELECT datos FROM mensajes WHERE estado = ? ORDER BY orden", (estado,))
+
+    def contar_mensajes(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM mensajes").fetchone()[0]
+
+    def mensajes_asignados_a(self, usuario):
+        """Mensajes con asignado_a == usuario (en cualquier estado)"""
+        return self._consultar("SELECT datos FROM mensajes WHERE asignado_a IS ? ORDER BY orden", (usuario,))
+
+    def ids_mensajes(self):
+        return [id_mensaje for (id_mensaje,) in self._conexion().execute("SELECT id FROM mensajes ORDER BY orden")]
+
+    def modificar_mensaje(self, mensaje_id, modificar, operacion='actualizar'):
+        """
+        Leer, modificar y escribir un mensaje en una sola transacción (ningún
+        otro worker escribe en el medio).
+        Returns: el mensaje modificado, o None si no existe
+        """
+        modificados = self.modificar_mensajes([mensaje_id], modificar, operacion)
+        return modificados[0] if modificados else None
+
+    def modificar_mensajes(self, ids, modificar, operacion='actualizar'):
+        """
+        modificar(mensaje) sobre la fila actual de cada id, en una sola
+        transacción. Los ids que no existen se saltean.
+        Returns: los mensajes modificados
+        """
+        with self._transaccion() as con:
+            modificados = []
+            for mensaje_id in ids:
+                fila = con.execute("SELECT datos FROM mensajes WHERE id = ?", (mensaje_id,)).fetchone()
+                if not fila:
+                    continue
+                mensaje = json.loads(fila[0])
+                modificar(mensaje)
+                modificados.append(mensaje)
+            self._actualizar(con, modificados)
+        return modificados
+
+    def guardar_mensajes(self, mensajes=None, operacion='actualizar'):
+        """Persiste los mensajes modificados (solo esas filas)"""
+        if not mensajes:
+            return
+        with self._transaccion() as con:
+            self._actualizar(con, mensajes)
+
+    def agregar_mensajes(self, mensajes_nuevos):
+        with self._transaccion() as con:
+            self._insertar(con, mensajes_nuevos)
+
+    def importar_desde_validador(self, ruta_json_validador):
+        """Importa mensajes desde el JSON del validador (reemplaza todos)"""
+        mensajes_validador = leer_json_validador(ruta_json_validador)
+        if mensajes_validador is None:
+            return
+
+        mensajes = [mensaje_desde_validador(msg) for msg in mensajes_validador]
+        with self._transaccion() as con:
+            con.execute("DELETE FROM mensajes")
+            repetidos = self._insertar(con, mensajes)
+        print(f"Importados {len(mensajes) - repetidos} mensajes correctamente")
+
+    # =================================================================
+    #  MIGRACIÓN
+    # =================================================================
+
+    def migrar_desde_json(self, archivo_json=ARCHIVO_MENSAJES, reemplazar=False):
+        """
+        Carga data/mensajes_estado.json en la base, en el mismo orden.
+        Un id repetido conserva el primero (el que encontraba el next(...) de app.py).
+        Returns: (migrados, repetidos)
+        """
+        with self._transaccion() as con:
+            return self._migrar(con, archivo_json, reemplazar)
+
+    def _migrar(self, con, archivo_json, reemplazar=False):
+        with open(archivo_json, 'r', encoding='utf-8') as f:
+            mensajes = json.load(f)
+        if reemplazar:
+            con.execute("DELETE FROM mensajes")
+        repetidos = self._insertar(con, mensajes)
+        return len(mensajes) - repetidos, repetidos
+
+    def sincronizar(self, timeout=None):
+        """Cada transacción ya quedó en la base al confirmarse"""
+        return True
+
+    def cerrar(self):
+        con = getattr(self._local, 'con', None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+
+class _Transaccion:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK: un solo escritor a la vez entre hilos y procesos"""
+
+    def __init__(self, con):
+        self.con = con
+
+    def __enter__(self):
+        self.con.execute('BEGIN IMMEDIATE')
+        return self.con
+
+    def __exit__(self, tipo, valor, traza):
+        self.con.execute('COMMIT' if tipo is None else 'ROLLBACK')
+        return False
+
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    archivo_json = argumentos[0] if len(argumentos) > 0 else ARCHIVO_MENSAJES
+    archivo_db = argumentos[1] if len(argumentos) > 1 else ARCHIVO_DB
+
+    if not Path(archivo_json).exists():
+        print(f"❌ No existe {archivo_json}")
+        sys.exit(1)
+
+    gestor = GestorTandasSQLite(archivo_db, archivo_json=None)
+    existentes = gestor.contar_mensajes()
+    if existentes and '--reemplazar' not in sys.argv:
+        print(f"⚠️ {archivo_db} ya tiene {existentes} mensajes. Usar --reemplazar para pisarlos.")
+        sys.exit(1)
+
+    migrados, repetidos = gestor.migrar_desde_json(archivo_json, reemplazar=True)
+    print(f"✅ {migrados} mensajes migrados de {archivo_json} a {archivo_db}")
+    if repetidos:
+        print(f"⚠️ {repetidos} mensajes con id repetido ignorados (se conservó el primero)")
+    for linea, cantidad in gestor.contar_pendientes_por_linea().items():
+        print(f"   {linea}: {cantidad} pendientes")
@@ -0,0 +1,90 @@
+"""
+indices_mensajes.py — Índices en memoria sobre la lista de mensajes
+===================================================================
+GestorTandas guarda los mensajes en una lista (el orden importa: las
+tandas toman los primeros pendientes). Estos índices evitan recorrerla:
+
+    id               → posición del primer mensaje con ese id
+    estado           → posiciones, ordenadas
+    (linea, estado)  → posiciones, ordenadas
+    asignado_a       → posiciones, ordenadas
+
+Las posiciones ordenadas son listas con bisect: agregar o quitar es una
+búsqueda binaria más un memmove, y leer "los primeros 5" o "todos los de
+este estado" cuesta lo que la salida.
+
+Los mensajes son los dicts de la lista de GestorTandas, que los modifica
+dentro de sus transacciones; después de tocar uno hay que llamar a
+actualizar() (GestorTandas lo hace en cada camino que persiste; afuera
+solo circulan copias). Para saber qué claves tenía antes, cada posición
+guarda las claves con las que está indexada.
+"""
+
+from bisect import bisect_left, insort
+
+
+def _quitar(indice, clave, posicion):
+    posiciones = indice.get(clave)
+    if posiciones is None:
+        return
+    i = bisect_left(posiciones, posicion)
+    if i < len(posiciones) and posiciones[i] == posicion:
+        del posiciones[i]
+    if not posiciones:
+        del indice[clave]
+
+
+class IndicesMensajes:
+    def __init__(self, mensajes=()):
+        self.reconstruir(mensajes)
+
+    def reconstruir(self, mensajes):
+        self.por_id = {}
+        self.por_estado = {}
+        self.por_linea_estado = {}
+        self.por_asignado = {}
+        self._claves = []        # posición → (estado, linea, asignado_a) indexados
+        self._posiciones = {}    # id() del dict → posición (los dicts de la lista del gestor)
+        for mensaje in mensajes:
+            self.agregar(mensaje)
+
+    def agregar(self, mensaje):
+        """Indexa un mensaje agregado al final de la lista"""
+        posicion = len(self._claves)
+        self._posiciones[id(mensaje)] = posicion
+        self.por_id.setdefault(mensaje.get('id'), posicion)
+        estado, linea, asignado = mensaje.get('estado'), mensaje.get('linea'), mensaje.get('asignado_a')
+        # Al final de la lista: append mantiene el orden
+        self.por_estado.setdefault(estado, []).append(posicion)
+        self.por_linea_estado.setdefault((linea, estado), []).append(posicion)
+        self.por_asignado.setdefault(asignado, []).append(posicion)
+        self._claves.append((estado, linea, asignado))
+
+    def posicion(self, mensaje):
+        return self._posiciones.get(id(mensaje))
+
+    def actualizar(self, mensaje):
+        """Re-indexa un mensaje de la lista después de modificarlo"""
+        posicion = self._posiciones.get(id(mensaje))
+        if posicion is None:
+            return False
+        estado, linea, asignado = mensaje.get('estado'), mensaje.get('linea'), mensaje.get('asignado_a')
+        estado_antes, linea_antes, asignado_antes = self._claves[posicion]
+        if estado != estado_antes or linea != linea_antes:
+            if estado != estado_antes:
+                _quitar(self.por_estado, estado_antes, posicion)
+                insort(self.por_estado.setdefault(estado, []), posicion)
+            _quitar(self.por_linea_estado, (linea_antes, estado_antes), posicion)
+            insort(self.por_linea_estado.setdefault((linea, estado), []), posicion)
+        if asignado != asignado_antes:
+            _quitar(self.por_asignado, asignado_antes, posicion)
+            insort(self.por_asignado.setdefault(asignado, []), posicion)
+        self._claves[posicion] = (estado, linea, asignado)
+        return True
+
+    def lineas_con_estado(self, estado):
+        """{linea: cantidad} con ese estado, por orden de primera aparición en la lista"""
+        grupos = [(posiciones[0], linea, len(posiciones))
+                  for (linea, estado_clave), posiciones in self.por_linea_estado.items()
+                  if estado_clave == estado]
+        return {linea: cantidad for _, linea, cantidad in sorted(grupos, key=lambda g: g[0])}
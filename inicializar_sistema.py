@@ -1,11 +1,11 @@
-from gestor_tandas import GestorTandas
+from gestor_tandas import crear_gestor
 import os
 
 def inicializar():
     print("="*60)
     print("INICIALIZACION DEL SISTEMA")
     print("="*60)
-    gestor = GestorTandas()
+    gestor = crear_gestor()
     archivo = 'lote_revision_historico.json'
     if not os.path.exists(archivo):
         print("\nERROR: No se encontro el archivo")
@@ -0,0 +1,355 @@
+"""
+motores_validador.py — Motor principal, motor sombra y comparación de reportes
+=============================================================================
+Un motor es un módulo con la interfaz de validador_mensajes
+(procesar_mensaje, procesar_lote, recargar_reglas). 'actual' es
+validador_mensajes; cualquier otro valor es un módulo importable o un
+archivo .py (relativo a la raíz del repo), por ejemplo una copia optimizada.
+
+Variables de entorno:
+  VALIDADOR_MOTOR            motor que atiende los pedidos (default: actual)
+  VALIDADOR_MOTOR_SOMBRA     motor que corre en sombra (default: ninguno)
+  VALIDADOR_SOMBRA_MUESTREO  fracción de mensajes que se comparan (default: 1)
+
+El motor sombra corre en un hilo aparte, nunca en el camino del pedido:
+los endpoints de importación encolan los mensajes con el reporte ya
+calculado y siguen. Si la cola está llena, el lote se descarta (y se
+cuenta). Cuando la tasa de diferencias y la latencia convencen, se cambia
+VALIDADOR_MOTOR y se reinicia.
+"""
+
+import os
+import sys
+import json
+import queue
+import pickle
+import random
+import threading
+import time
+import importlib
+import importlib.util
+from collections import deque
+
+import perfilador
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+MOTOR_ACTUAL = 'actual'
+TAMANIO_COLA_SOMBRA = 50            # Lotes pendientes antes de descartar
+MAX_DIFERENCIAS_GUARDADAS = 50      # Últimos mensajes distintos que se muestran
+MAX_DELTAS_POR_MENSAJE = 15
+
+
+# =================================================================
+#  CARGA DE MOTORES
+# =================================================================
+
+def cargar_modulo_validador(ruta, nombre='validador_candidato'):
+    """
+    Carga una copia del validador desde un archivo .py. Resuelve configs/,
+    data/ y el Excel del árbol, no los de la carpeta del archivo. Queda en
+    sys.modules bajo `nombre`: sus funciones se mandan por pickle a los
+    workers de procesar_lote.
+    """
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    modulo.__file__ = os.path.join(BASE_PATH, 'validador_mensajes.py')
+    sys.modules[nombre] = modulo
+    try:
+        spec.loader.exec_module(modulo)
+    except BaseException:
+        del sys.modules[nombre]
+        raise
+    return modulo
+
+def iniciar_worker_motor(nombre, origen, lineas=()):
+    """
+    Initializer de los workers del pool de procesar_lote. Los workers no
+    heredan los módulos del proceso que los pide (forkserver/spawn): un motor
+    cargado desde archivo no es importable por nombre, así que se carga desde
+    `origen` (queda en sys.modules y sus tareas se encuentran).
+    """
+    motor = sys.modules.get(nombre)
+    if motor is None:
+        try:
+            motor = importlib.import_module(nombre)
+        except ImportError:
+            motor = cargar_modulo_validador(origen, nombre)
+    motor._calentar_validador(lineas)
+
+_MOTORES = {}
+_MOTORES_LOCK = threading.Lock()
+
+def obtener_motor(nombre):
+    """Módulo del motor `nombre` (cargado una sola vez por proceso)"""
+    with _MOTORES_LOCK:
+        motor = _MOTORES.get(nombre)
+        if motor is None:
+            if nombre == MOTOR_ACTUAL:
+                import validador_mensajes as motor
+            elif nombre.endswith('.py'):
+                ruta = nombre if os.path.isabs(nombre) else os.path.join(BASE_PATH, nombre)
+                motor = cargar_modulo_validador(ruta, 'validador_' + os.path.basename(nombre)[:-3])
+            else:
+                motor = importlib.import_module(nombre)
+            _MOTORES[nombre] = motor
+        return motor
+
+def motor_sin_cache(nombre):
+    """
+    Copia aparte del motor `nombre` con el cache de reportes apagado, para
+    medirlo sin tocar el módulo que atiende los pedidos. Queda en _MOTORES
+    (recargar_reglas la alcanza).
+    """
+    clave = nombre + '#sin-cache'
+    motor = obtener_motor(nombre)
+    with _MOTORES_LOCK:
+        copia = _MOTORES.get(clave)
+        if copia is None:
+            copia = cargar_modulo_validador(motor.__spec__.origin, motor.__name__ + '_sin_cache')
+            copia.CACHE_REPORTES_ACTIVO = False
+            _MOTORES[clave] = copia
+        return copia
+
+def nombre_principal():
+    return os.environ.get('VALIDADOR_MOTOR', '') or MOTOR_ACTUAL
+
+def nombre_sombra():
+    """Motor sombra configurado, o None (tampoco si es el mismo que el principal)"""
+    nombre = os.environ.get('VALIDADOR_MOTOR_SOMBRA', '')
+    return nombre if nombre and nombre != nombre_principal() else None
+
+def motor_principal():
+    return obtener_motor(nombre_principal())
+
+def recargar_reglas():
+    """Recarga las reglas en todos los motores cargados (cada uno tiene su motor de reglas)"""
+    motor_principal().recargar_reglas()
+    for nombre, motor in list(_MOTORES.items()):
+        if nombre != nombre_principal():
+            motor.recargar_reglas()
+
+
+# =================================================================
+#  COMPARACIÓN DE REPORTES
+# =================================================================
+
+def valor_corto(valor, largo=90):
+    texto = json.dumps(valor, ensure_ascii=False, default=str)
+    return texto if len(texto) <= largo else texto[:largo - 1] + '…'
+
+def normalizar_reporte(reporte):
+    """Reporte como quedaría en JSON (tuplas → listas, fechas → texto)"""
+    return json.loads(json.dumps(reporte, ensure_ascii=False, default=str))
+
+def diferencias(esperado, obtenido, ruta=''):
+    """
+    Diferencias legibles entre dos valores JSON, como lista de
+    (ruta, descripción). Las listas de textos (clasificacion, errores
+    ortográficos...) se comparan como ítems agregados/quitados, y aparte se
+    avisa si solo cambió el orden.
+    """
+    if isinstance(esperado, dict) and isinstance(obtenido, dict):
+        salida = []
+        for clave in sorted(set(esperado) | set(obtenido), key=str):
+            sub = f"{ruta}.{clave}" if ruta else str(clave)
+            if clave not in obtenido:
+                salida.append((sub, f"falta (era {valor_corto(esperado[clave])})"))
+            elif clave not in esperado:
+                salida.append((sub, f"nuevo: {valor_corto(obtenido[clave])}"))
+            else:
+                salida.extend(diferencias(esperado[clave], obtenido[clave], sub))
+        return salida
+
+    if isinstance(esperado, list) and isinstance(obtenido, list):
+        if esperado == obtenido:
+            return []
+        if all(isinstance(x, str) for x in esperado + obtenido):
+            quitados = [x for x in esperado if x not in obtenido]
+            agregados = [x for x in obtenido if x not in esperado]
+            salida = [(ruta, f"- {valor_corto(x)}") for x in quitados]
+            salida += [(ruta, f"+ {valor_corto(x)}") for x in agregados]
+            return salida or [(ruta, "mismos ítems en otro orden o con repeticiones distintas")]
+        if len(esperado) == len(obtenido):
+            salida = []
+            for i, (a, b) in enumerate(zip(esperado, obtenido)):
+                salida.extend(diferencias(a, b, f"{ruta}[{i}]"))
+            return salida
+        return [(ruta, f"{valor_corto(esperado)} → {valor_corto(obtenido)}")]
+
+    if esperado != obtenido or type(esperado) is not type(obtenido):
+        return [(ruta, f"{valor_corto(esperado)} → {valor_corto(obtenido)}")]
+    return []
+
+
+# =================================================================
+#  EJECUCIÓN EN SOMBRA
+# =================================================================
+
+class EjecutorSombra:
+    """Hilo que re-valida con el motor sombra y compara contra el principal"""
+
+    def __init__(self, nombre_motor, muestreo=1.0, tamanio_cola=TAMANIO_COLA_SOMBRA):
+        self.nombre_motor = nombre_motor
+        self.muestreo = muestreo
+        self._cola = queue.Queue(maxsize=tamanio_cola)
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._motor = None
+        self._principal = None
+        self.error = None
+        self.limpiar()
+
+    def limpiar(self):
+        with self._lock:
+            self.comparados = 0
+            self.iguales = 0
+            self.distintos = 0
+            self.errores_sombra = 0
+            self.lotes_descartados = 0
+            self.latencia_principal = perfilador.Histograma()
+            self.latencia_sombra = perfilador.Histograma()
+            self.campos_distintos = {}
+            self.ultimas_diferencias = deque(maxlen=MAX_DIFERENCIAS_GUARDADAS)
+            self.desde = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    def encolar(self, mensajes, reportes):
+        """
+        Desde el pedido: copia mensajes y reportes del principal y vuelve.
+        Las latencias no salen del pedido (el lote pasa por el cache de
+        reportes y el pool de procesos): el hilo sombra vuelve a correr el
+        principal sobre los mismos mensajes muestreados, uno por uno y sin
+        cache, igual que la sombra.
+        """
+        pares = [(m, r) for m, r in zip(mensajes, reportes)
+                 if r is not None and (self.muestreo >= 1 or random.random() < self.muestreo)]
+        if not pares:
+            return
+        self._arrancar()
+        try:
+            self._cola.put_nowait(pickle.dumps(pares))
+        except queue.Full:
+            with self._lock:
+                self.lotes_descartados += 1
+
+    def _arrancar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, daemon=True, name='motor-sombra')
+                self._hilo.start()
+
+    def _cargar_motor(self):
+        motor = obtener_motor(self.nombre_motor)
+        # Sin cache de reportes: si no, la sombra recibiría los reportes del principal
+        motor.CACHE_REPORTES_ACTIVO = False
+        return motor
+
+    def _trabajar(self):
+        try:
+            self._motor = self._cargar_motor()
+        except Exception as e:
+            self.error = f"No se pudo cargar el motor sombra {self.nombre_motor}: {e}"
+            print(f"⚠️ {self.error}")
+            return
+        try:
+            self._principal = motor_sin_cache(nombre_principal())
+        except Exception as e:
+            self.error = f"No se pudo cargar la copia sin cache del motor principal: {e}"
+            print(f"⚠️ {self.error}")
+            return
+        print(f"🌓 Motor sombra activo: {self.nombre_motor}")
+        while True:
+            for mensaje, reporte_principal in pickle.loads(self._cola.get()):
+                self._comparar(mensaje, reporte_principal)
+
+    def _medir_principal(self, mensaje):
+        """Segundos del principal sobre el mensaje, o None si falla (se compara igual)"""
+        inicio = time.perf_counter()
+        try:
+            self._principal.procesar_mensaje(mensaje)
+        except Exception:
+            return None
+        return time.perf_counter() - inicio
+
+    def _comparar(self, mensaje, reporte_principal):
+        segundos_principal = self._medir_principal(mensaje)
+        inicio = time.perf_counter()
+        try:
+            reporte_sombra = self._motor.procesar_mensaje(mensaje)
+        except Exception as e:
+            reporte_sombra = {'error': f"{type(e).__name__}: {e}"}
+            with self._lock:
+                self.errores_sombra += 1
+        segundos_sombra = time.perf_counter() - inicio
+
+        deltas = diferencias(normalizar_reporte(reporte_principal), normalizar_reporte(reporte_sombra))
+        with self._lock:
+            self.comparados += 1
+            if segundos_principal is not None:
+                self.latencia_principal.agregar(segundos_principal * 1e6)
+            self.latencia_sombra.agregar(segundos_sombra * 1e6)
+            if not deltas:
+                self.iguales += 1
+                return
+            self.distintos += 1
+            for ruta, _ in deltas:
+                campo = ruta.split('[', 1)[0]
+                self.campos_distintos[campo] = self.campos_distintos.get(campo, 0) + 1
+            self.ultimas_diferencias.append({
+                'numero_mensaje': mensaje.get('numero_mensaje') or mensaje.get('id_mensaje'),
+                'contenido': (mensaje.get('contenido') or '')[:120],
+                'diferencias': [f"{ruta}: {descripcion}" for ruta, descripcion in deltas[:MAX_DELTAS_POR_MENSAJE]],
+                'total_diferencias': len(deltas),
+                'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+
+    def resumen(self):
+        with self._lock:
+            return {
+                'motor_sombra': self.nombre_motor,
+                'error': self.error,
+                'desde': self.desde,
+                'muestreo': self.muestreo,
+                'pendientes': self._cola.qsize(),
+                'lotes_descartados': self.lotes_descartados,
+                'comparados': self.comparados,
+                'iguales': self.iguales,
+                'distintos': self.distintos,
+                'tasa_diferencias': round(self.distintos / self.comparados, 4) if self.comparados else None,
+                'errores_sombra': self.errores_sombra,
+                'latencia_principal': self.latencia_principal.resumen(),
+                'latencia_sombra': self.latencia_sombra.resumen(),
+                'campos_distintos': dict(sorted(self.campos_distintos.items(), key=lambda kv: -kv[1])),
+                'ultimas_diferencias': list(self.ultimas_diferencias),
+            }
+
+
+_SOMBRA = None
+_SOMBRA_LOCK = threading.Lock()
+
+def obtener_sombra():
+    """Ejecutor del motor sombra configurado, o None si no hay"""
+    global _SOMBRA
+    nombre = nombre_sombra()
+    if nombre is None:
+        return None
+    if _SOMBRA is None:
+        with _SOMBRA_LOCK:
+            if _SOMBRA is None:
+                muestreo = float(os.environ.get('VALIDADOR_SOMBRA_MUESTREO', '1') or 1)
+                _SOMBRA = EjecutorSombra(nombre, muestreo)
+    return _SOMBRA
+
+
+def validar_lote(mensajes):
+    """
+    procesar_lote del motor principal. Si hay motor sombra, le encola los
+    mensajes con sus reportes para compararlos fuera del pedido.
+    """
+    mensajes = list(mensajes)
+    reportes = motor_principal().procesar_lote(mensajes)
+    sombra = obtener_sombra()
+    if sombra is not None and reportes:
+        sombra.encolar(mensajes, reportes)
+    return reportes
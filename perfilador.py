@@ -0,0 +1,224 @@
+"""
+perfilador.py — Tiempos por etapa de validar_mensaje_ROCA
+=========================================================
+Cuando una re-validación es lenta no se sabía si el tiempo se iba en
+extraer componentes, en el timing, en clasificar, en las reglas
+personalizadas o en armar el reporte.
+
+Con el perfil activo, cada etapa suma su duración en un histograma del
+proceso y cada búsqueda de reglas suma su tiempo por regla (o por bloque de
+reglas fusionadas en una sola alternancia, que se buscan juntas). Apagado,
+el costo es un chequeo de un booleano por mensaje.
+
+Se activa con VALIDADOR_PERFIL=1, desde /api/admin/perfil o con
+`python validador_mensajes.py --perfil salida.folded`, que vuelca el
+resultado en formato "collapsed stacks" (flamegraph.pl, speedscope,
+inferno).
+"""
+
+import os
+import time
+import threading
+
+ETAPA_TOTAL = 'validar_mensaje_ROCA'
+ETAPAS = (
+    'cache',
+    'validar_componentes',
+    'validar_tiempo_respuesta',
+    'clasificar_mensaje',
+    'reglas',
+    'generar_reporte',
+)
+
+# Límite superior de cada cubeta del histograma, en microsegundos
+LIMITES_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+
+class Histograma:
+    """Conteo por cubetas logarítmicas + total y máximo (en microsegundos)"""
+
+    __slots__ = ('conteo', 'total_us', 'maximo_us', 'cubetas')
+
+    def __init__(self):
+        self.conteo = 0
+        self.total_us = 0.0
+        self.maximo_us = 0.0
+        self.cubetas = [0] * (len(LIMITES_US) + 1)
+
+    def agregar(self, us):
+        self.conteo += 1
+        self.total_us += us
+        if us > self.maximo_us:
+            self.maximo_us = us
+        for i, limite in enumerate(LIMITES_US):
+            if us <= limite:
+                self.cubetas[i] += 1
+                return
+        self.cubetas[-1] += 1
+
+    def combinar(self, datos):
+        self.conteo += datos['conteo']
+        self.total_us += datos['total_us']
+        self.maximo_us = max(self.maximo_us, datos['maximo_us'])
+        for i, cantidad in enumerate(datos['cubetas']):
+            self.cubetas[i] += cantidad
+
+    def percentil(self, p):
+        """Cota superior de la cubeta donde cae el percentil p (0-100)"""
+        if not self.conteo:
+            return None
+        objetivo = self.conteo * p / 100
+        acumulado = 0
+        for i, cantidad in enumerate(self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return LIMITES_US[i] if i < len(LIMITES_US) else self.maximo_us
+        return self.maximo_us
+
+    def datos(self):
+        return {
+            'conteo': self.conteo,
+            'total_us': self.total_us,
+            'maximo_us': self.maximo_us,
+            'cubetas': list(self.cubetas),
+        }
+
+    def resumen(self):
+        return {
+            'conteo': self.conteo,
+            'total_ms': round(self.total_us / 1000, 3),
+            'promedio_us': round(self.total_us / self.conteo, 1) if self.conteo else None,
+            'p50_us': self.percentil(50),
+            'p99_us': self.percentil(99),
+            'maximo_us': round(self.maximo_us, 1),
+            'cubetas': {
+                (f"<={LIMITES_US[i]}" if i < len(LIMITES_US) else f">{LIMITES_US[-1]}"): cantidad
+                for i, cantidad in enumerate(self.cubetas) if cantidad
+            },
+        }
+
+
+class Medicion:
+    """Cronómetro de un mensaje: cada marcar() cierra la etapa anterior"""
+
+    __slots__ = ('perfilador', 'inicio', 'ultima')
+
+    def __init__(self, perfilador):
+        self.perfilador = perfilador
+        self.inicio = self.ultima = time.perf_counter()
+
+    def marcar(self, etapa):
+        ahora = time.perf_counter()
+        self.perfilador.registrar(etapa, ahora - self.ultima)
+        self.ultima = ahora
+
+    def terminar(self):
+        self.perfilador.registrar(ETAPA_TOTAL, time.perf_counter() - self.inicio)
+
+
+class Perfilador:
+    """Acumulador del proceso. Thread-safe (Flask atiende en varios hilos)."""
+
+    def __init__(self, activo=False):
+        self.activo = activo
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def limpiar(self):
+        with self._lock:
+            self._etapas = {}
+            self._reglas = {}
+            self.desde = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    def iniciar(self):
+        """Medicion para un mensaje, o None si el perfil está apagado"""
+        return Medicion(self) if self.activo else None
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            histograma = self._etapas.get(etapa)
+            if histograma is None:
+                histograma = self._etapas[etapa] = Histograma()
+            histograma.agregar(segundos * 1e6)
+
+    def registrar_regla(self, nombre, segundos):
+        """Una búsqueda de una regla (o de un bloque de reglas fusionadas)"""
+        with self._lock:
+            histograma = self._reglas.get(nombre)
+            if histograma is None:
+                histograma = self._reglas[nombre] = Histograma()
+            histograma.agregar(segundos * 1e6)
+
+    def datos(self):
+        """Estado crudo serializable (para juntar el de los workers del pool)"""
+        with self._lock:
+            return {
+                'etapas': {k: h.datos() for k, h in self._etapas.items()},
+                'reglas': {k: h.datos() for k, h in self._reglas.items()},
+            }
+
+    def combinar(self, datos):
+        with self._lock:
+            for destino, origen in ((self._etapas, datos['etapas']), (self._reglas, datos['reglas'])):
+                for nombre, valores in origen.items():
+                    destino.setdefault(nombre, Histograma()).combinar(valores)
+
+    def resumen(self):
+        with self._lock:
+            orden = [ETAPA_TOTAL] + list(ETAPAS)
+            etapas = {k: self._etapas[k].resumen() for k in orden if k in self._etapas}
+            reglas = sorted(self._reglas.items(), key=lambda kv: kv[1].total_us, reverse=True)
+            return {
+                'activo': self.activo,
+                'desde': self.desde,
+                'etapas': etapas,
+                'reglas': {nombre: h.resumen() for nombre, h in reglas},
+            }
+
+    def lineas_flamegraph(self):
+        """
+        Formato "collapsed stacks": `pila;de;frames <valor>` con el valor en
+        microsegundos. El tiempo de validar_mensaje_ROCA que no cae en
+        ninguna etapa queda como tiempo propio del frame raíz.
+        """
+        with self._lock:
+            etapas = {k: h.total_us for k, h in self._etapas.items()}
+            reglas = {k: h.total_us for k, h in self._reglas.items()}
+
+        lineas = []
+        total = etapas.get(ETAPA_TOTAL, 0.0)
+        medido = 0.0
+        for etapa in ETAPAS:
+            us = etapas.get(etapa, 0.0)
+            medido += us
+            if etapa == 'reglas' and reglas:
+                en_reglas = 0.0
+                for nombre, us_regla in reglas.items():
+                    en_reglas += us_regla
+                    frame = nombre.replace(';', ',').replace(' ', '_')
+                    lineas.append(f"{ETAPA_TOTAL};reglas;{frame} {int(round(us_regla))}")
+                us -= en_reglas
+            if us >= 0.5:
+                lineas.append(f"{ETAPA_TOTAL};{etapa} {int(round(us))}")
+        if total - medido >= 0.5:
+            lineas.append(f"{ETAPA_TOTAL} {int(round(total - medido))}")
+        return lineas
+
+    def exportar_flamegraph(self, ruta):
+        lineas = self.lineas_flamegraph()
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lineas) + ('\n' if lineas else ''))
+        return len(lineas)
+
+
+_PERFILADOR = Perfilador(activo=os.environ.get('VALIDADOR_PERFIL', '') not in ('', '0'))
+
+def obtener_perfilador():
+    """Perfilador único del proceso"""
+    return _PERFILADOR
+
+def reemplazar_perfilador(nuevo):
+    """Instala otro perfilador (ej: uno que guarde muestras). Returns: el anterior."""
+    global _PERFILADOR
+    anterior, _PERFILADOR = _PERFILADOR, nuevo
+    return anterior
@@ -0,0 +1,287 @@
+"""
+scores_lote.py — calcular_scores en lote sobre columnas NumPy
+=============================================================
+calcular_scores son ramas sobre unos pocos booleanos y conteos (componentes
+A–F presentes, cantidad de errores ortográficos, largo del contenido,
+tardanza). Para re-validaciones masivas y análisis, los componentes ya
+extraídos se pasan a columnas una sola vez y los puntos y clasificaciones de
+los tres scores se calculan en una pasada vectorizada.
+
+Las etiquetas y los detalles son exactamente los de calcular_scores (mismos
+umbrales: UMBRALES_COMPONENTES / UMBRALES_ESTRUCTURA del validador). Los
+detalles no dependen de los umbrales, así que LoteScores los arma una sola
+vez: re-clasificar un año de mensajes con otros umbrales es solo NumPy
+sobre los puntos ya calculados.
+
+    lote = LoteScores(componentes_lista, timings, mensajes)
+    lote.distribucion(umbrales_estructura=((90, 'IMPECABLE'), (70, 'CORRECTO')))
+
+Sin NumPy, calcular_scores_lote cae al calcular_scores de siempre.
+
+USO desde terminal (re-calcula los scores guardados y cuenta diferencias):
+    python scores_lote.py [data/mensajes_estado.json]
+"""
+
+import sys
+import json
+from collections import Counter
+
+try:
+    import numpy as np
+    NUMPY_DISPONIBLE = True
+except ImportError:
+    NUMPY_DISPONIBLE = False
+
+import validador_mensajes
+
+# Estado del componente E (origen/destino) para el score
+E_COMPLETO = 0      # 20 puntos
+E_FALTA = 1         # 0 puntos, detalle "Falta origen y/o destino"
+E_SIN_PUNTOS = 2    # 0 puntos y sin detalle (E presente pero no es dict ni servicio general)
+
+# Tipo de timing: qué rama de calcular_scores aplica
+T_NA = 0
+T_ANTES = 1                 # EXCELENTE: 0-5 min antes
+T_ANTES_CANCELACION = 2     # EXCELENTE: más de 5 min antes, cancelación/suspensión
+T_BUENO = 3
+T_DEFICIENTE = 4
+
+
+def _detalles_timing(tipo, tardanza):
+    if tipo == T_NA:
+        return "No se pudo calcular timing"
+    if tipo == T_ANTES:
+        return f"Enviado {abs(tardanza):.0f} min antes del horario"
+    if tipo == T_ANTES_CANCELACION:
+        return f"Enviado {abs(tardanza):.0f} min antes (cancelación/suspensión)"
+    return f"Enviado {tardanza:.0f} min después del horario"
+
+
+def _detalles_estructura(errores, estructura_valida, claro, largo):
+    detalles = []
+    num_errores = len(errores)
+    if num_errores == 1:
+        detalles.append(f"Ortografía: {errores[0]}")
+    elif 2 <= num_errores <= 3:
+        detalles.extend(f"Ortografía: {error}" for error in errores)
+    elif 4 <= num_errores <= 5:
+        detalles.append(f"{num_errores} errores ortográficos: {', '.join(errores[:3])}...")
+    elif num_errores > 5:
+        detalles.append(f"{num_errores} errores ortográficos graves")
+    if not estructura_valida:
+        detalles.append("Formato incorrecto")
+    if not claro:
+        detalles.append("Redacción mejorable" if largo > 30 else "Mensaje muy breve o confuso")
+    return detalles
+
+
+def extraer_columnas(componentes_lista, timings, mensajes):
+    """
+    Una pasada por los mensajes: lo que mira calcular_scores pasa a columnas
+    y, de paso, se arman los textos de detalle (no dependen de los umbrales).
+    Las expresiones son las mismas que en calcular_scores, así que un dato
+    mal formado falla igual.
+    """
+    n = len(componentes_lista)
+    a = np.zeros(n, dtype=bool)
+    b = np.zeros(n, dtype=bool)
+    c = np.zeros(n, dtype=bool)
+    d = np.zeros(n, dtype=bool)
+    f = np.zeros(n, dtype=bool)
+    informativo = np.zeros(n, dtype=bool)
+    servicio_general = np.zeros(n, dtype=bool)
+    con_tipo = np.zeros(n, dtype=bool)
+    estado_e = np.zeros(n, dtype=np.int8)
+    tipo_timing = np.zeros(n, dtype=np.int8)
+    tardanza = np.zeros(n, dtype=float)
+    num_errores = np.zeros(n, dtype=np.int64)
+    largo = np.zeros(n, dtype=np.int64)
+    detalles_componentes = [None] * n
+    detalles_timing = [None] * n
+    detalles_estructura = [None] * n
+
+    for i, (componentes, timing, mensaje) in enumerate(zip(componentes_lista, timings, mensajes)):
+        tipo = componentes.get('tipo_mensaje')
+        es_informativo = tipo == 'INFORMATIVO'
+        es_servicio_general = tipo == 'SERVICIO_GENERAL'
+        a[i] = tiene_a = bool(componentes.get('A'))
+        b[i] = tiene_b = bool(componentes.get('B'))
+        c[i] = tiene_c = bool(componentes.get('C'))
+        d[i] = tiene_d = bool(componentes.get('D'))
+        f[i] = valida = bool(componentes.get('estructura_valida'))
+        informativo[i] = es_informativo
+        servicio_general[i] = es_servicio_general
+        con_tipo[i] = bool(tipo)
+
+        e = componentes.get('E')
+        if e:
+            if isinstance(componentes['E'], dict):
+                estado = E_COMPLETO if (e.get('origen') and e.get('destino')) else E_FALTA
+            else:
+                estado = E_COMPLETO if es_servicio_general else E_SIN_PUNTOS
+        else:
+            estado = E_COMPLETO if es_servicio_general else E_FALTA
+        estado_e[i] = estado
+
+        detalles = []
+        if not tiene_a:
+            detalles.append("Falta número de tren")
+        if not tiene_b:
+            detalles.append("Falta estado/demora")
+        if not (tiene_c or es_informativo):
+            detalles.append("Falta causa específica")
+        if not (tiene_d or es_servicio_general):
+            detalles.append("Falta horario")
+        if estado == E_FALTA:
+            detalles.append("Falta origen y/o destino")
+        if not valida:
+            detalles.append("Falta código formal")
+        detalles_componentes[i] = detalles
+
+        # La rama de timing es una sola por mensaje: se resuelve acá junto con su texto
+        if timing and timing.get('tardanza_minutos') is not None:
+            minutos = timing['tardanza_minutos']
+            tardanza[i] = minutos
+            estado_b = componentes.get('B', {})
+            estado_nombre = estado_b.get('estado', '').upper() if isinstance(estado_b, dict) else ''
+            if -5 <= minutos <= 0:
+                rama = T_ANTES
+            elif minutos < -5:
+                rama = T_ANTES_CANCELACION if estado_nombre in ['CANCELACIÓN', 'SUSPENDIDO'] else T_DEFICIENTE
+            elif minutos <= 11:
+                rama = T_BUENO
+            else:
+                rama = T_DEFICIENTE
+        else:
+            minutos, rama = None, T_NA
+        tipo_timing[i] = rama
+        detalles_timing[i] = [_detalles_timing(rama, minutos)]
+
+        errores = componentes.get('errores_ortografia', [])
+        num_errores[i] = len(errores)
+        largo[i] = largo_contenido = len(mensaje.get('contenido', '').upper())
+        claro = largo_contenido > 50 and bool(tipo)
+        detalles_estructura[i] = _detalles_estructura(errores, valida, claro, largo_contenido)
+
+    return {
+        'A': a, 'B': b, 'C': c, 'D': d, 'F': f,
+        'informativo': informativo, 'servicio_general': servicio_general, 'con_tipo': con_tipo,
+        'estado_e': estado_e, 'tipo_timing': tipo_timing, 'tardanza': tardanza,
+        'num_errores': num_errores, 'largo': largo,
+        'detalles_componentes': detalles_componentes,
+        'detalles_timing': detalles_timing,
+        'detalles_estructura': detalles_estructura,
+    }
+
+
+def calcular_puntos(columnas):
+    """Puntos de componentes y de estructura de todo el lote, vectorizados"""
+    col = columnas
+    puntos_componentes = (
+        20 * col['A'] + 20 * col['B']
+        + 15 * (col['C'] | col['informativo'])
+        + 15 * (col['D'] | col['servicio_general'])
+        + 20 * (col['estado_e'] == E_COMPLETO)
+        + 10 * col['F']
+    )
+
+    n = col['num_errores']
+    puntos_ortografia = np.select([n == 0, n == 1, n <= 3, n <= 5], [40, 25, 15, 10], 0)
+    puntos_formato = np.where(col['F'], 30, 10)
+    claro = (col['largo'] > 50) & col['con_tipo']
+    puntos_claridad = np.select([claro, col['largo'] > 30], [30, 20], 10)
+    return {
+        'componentes': puntos_componentes,
+        'estructura': puntos_ortografia + puntos_formato + puntos_claridad,
+    }
+
+
+def clasificar(puntos, umbrales, defecto):
+    """Versión vectorizada de validador_mensajes.clasificar_puntos"""
+    if not umbrales:
+        return np.full(len(puntos), defecto, dtype=object)
+    return np.select([puntos >= minimo for minimo, _ in umbrales],
+                     [etiqueta for _, etiqueta in umbrales], defecto).astype(object)
+
+
+# Etiqueta por rama de timing (índice = T_*)
+ETIQUETAS_TIMING = ('N/A', 'EXCELENTE', 'EXCELENTE', 'BUENO', 'DEFICIENTE')
+
+
+class LoteScores:
+    """
+    Scores de un lote de mensajes ya validados. La extracción (una pasada en
+    Python) se hace una vez; clasificaciones() con otros umbrales es solo
+    NumPy sobre los puntos ya calculados.
+    """
+
+    def __init__(self, componentes_lista, timings, mensajes):
+        self.columnas = extraer_columnas(list(componentes_lista), list(timings), list(mensajes))
+        self.puntos = calcular_puntos(self.columnas)
+
+    def __len__(self):
+        return len(self.columnas['A'])
+
+    def clasificaciones(self, umbrales_componentes=None, umbrales_estructura=None):
+        """
+        Etiquetas de los tres scores como arrays. Sin umbrales, los del validador
+        (UMBRALES_COMPONENTES / UMBRALES_ESTRUCTURA).
+        """
+        if umbrales_componentes is None:
+            umbrales_componentes = validador_mensajes.UMBRALES_COMPONENTES
+        if umbrales_estructura is None:
+            umbrales_estructura = validador_mensajes.UMBRALES_ESTRUCTURA
+        return {
+            'componentes': clasificar(self.puntos['componentes'], umbrales_componentes,
+                                      validador_mensajes.CLASIFICACION_COMPONENTES_DEFECTO),
+            'timing': np.array(ETIQUETAS_TIMING, dtype=object)[self.columnas['tipo_timing']],
+            'estructura': clasificar(self.puntos['estructura'], umbrales_estructura,
+                                     validador_mensajes.CLASIFICACION_ESTRUCTURA_DEFECTO),
+        }
+
+    def distribucion(self, umbrales_componentes=None, umbrales_estructura=None):
+        """Cantidad de mensajes por clasificación en cada score"""
+        salida = {}
+        for seccion, etiquetas in self.clasificaciones(umbrales_componentes, umbrales_estructura).items():
+            salida[seccion] = dict(Counter(etiquetas.tolist()).most_common())
+        return salida
+
+    def scores(self, umbrales_componentes=None, umbrales_estructura=None):
+        """Lista de dicts con la misma forma (y contenido) que calcular_scores.
+        Las listas de detalles son copias: el lote se puede volver a usar."""
+        etiquetas = self.clasificaciones(umbrales_componentes, umbrales_estructura)
+        col = self.columnas
+        return [
+            {
+                'componentes': {'clasificacion': componentes, 'detalles': list(detalles_componentes)},
+                'timing': {'clasificacion': timing, 'detalles': list(detalles_timing)},
+                'estructura': {'clasificacion': estructura, 'detalles': list(detalles_estructura)},
+            }
+            for componentes, timing, estructura, detalles_componentes, detalles_timing, detalles_estructura
+            in zip(etiquetas['componentes'].tolist(), etiquetas['timing'].tolist(),
+                   etiquetas['estructura'].tolist(), col['detalles_componentes'],
+                   col['detalles_timing'], col['detalles_estructura'])
+        ]
+
+
+def calcular_scores_lote(componentes_lista, timings, mensajes):
+    """
+    calcular_scores para muchos mensajes a la vez.
+    Returns: lista de scores, en el mismo orden, iguales a los del escalar
+    """
+    if not NUMPY_DISPONIBLE:
+        return [validador_mensajes.calcular_scores(c, t, m)
+                for c, t, m in zip(componentes_lista, timings, mensajes)]
+    return LoteScores(componentes_lista, timings, mensajes).scores()
+
+
+if __name__ == "__main__":
+    archivo = sys.argv[1] if len(sys.argv) > 1 else 'data/mensajes_estado.json'
+    with open(archivo, 'r', encoding='utf-8') as f:
+        mensajes = [m for m in json.load(f) if isinstance(m.get('componentes'), dict)]
+
+    lote = LoteScores([m['componentes'] for m in mensajes], [m.get('timing') for m in mensajes], mensajes)
+    distintos = sum(1 for m, s in zip(mensajes, lote.scores()) if m.get('scores') != s)
+    print(f"📊 {len(mensajes)} mensajes re-calculados, {distintos} con scores distintos a los guardados")
+    for seccion, conteo in lote.distribucion().items():
+        print(f"   {seccion}: {conteo}")
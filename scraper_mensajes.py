@@ -17,6 +17,7 @@ from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import json
 from datetime import datetime
+from fechas_sofse import parsear_fecha
 import re
 import time
 
@@ -74,7 +75,7 @@ def extraer_mensajes_de_html(html_content, fecha_inicio=None, fecha_fin=None, li
                     fecha_str = match_fecha_hora.group(1)
                     hora_str = match_fecha_hora.group(2)
                     try:
-                        fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y")
+                        fecha_obj = parsear_fecha(fecha_str)
                         # Actualizar fecha más antigua vista
                         if fecha_mas_antigua is None or fecha_obj < fecha_mas_antigua:
                             fecha_mas_antigua = fecha_obj
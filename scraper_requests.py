@@ -18,6 +18,7 @@ import json
 import time
 import argparse
 from datetime import datetime
+from fechas_sofse import parsear_fecha
 from urllib.parse import urljoin, urlencode
 
 import requests
@@ -97,7 +98,7 @@ def extraer_mensajes_html(html, fecha_inicio=None, fecha_fin=None):
                 hora_str  = match_fh.group(2)
                 fecha_hora = f"{fecha_str} {hora_str}"
                 try:
-                    fecha_obj = datetime.strptime(fecha_str, "%d/%m/%Y")
+                    fecha_obj = parsear_fecha(fecha_str)
                     if fecha_mas_antigua is None or fecha_obj < fecha_mas_antigua:
                         fecha_mas_antigua = fecha_obj
                 except Exception:
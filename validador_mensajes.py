@@ -24,13 +24,16 @@ CLASIFICACIÓN:
 - SUGERENCIAS: Mejoras opcionales
 """
 
-import pandas as pd
 import json
 import re
 import glob
 import os
 import sys
 import io
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
 
 # Forzar UTF-8 en consola Windows para evitar error con emojis
 # Forzar UTF-8 en consola Windows para evitar error con emojis
@@ -47,41 +50,105 @@ import io
 #         pass # Ignore errors here to prevent module crash
 
 from datetime import datetime, timedelta
+import fechas_sofse
 
 # Corrector ortográfico avanzado (instalar: pip install language-tool-python)
-try:
-    import language_tool_python
-    CORRECTOR_DISPONIBLE = True
-except ImportError:
-    CORRECTOR_DISPONIBLE = False
+# El pool de LanguageTool vive en corrector_ortografico y se comparte por proceso
+import corrector_ortografico
+CORRECTOR_DISPONIBLE = corrector_ortografico.LANGUAGETOOL_INSTALADO
+
+# Cache de reportes: se invalida por versión (subir VERSION_VALIDADOR al
+# cambiar cualquier criterio de validación)
+import cache_reportes
+VERSION_VALIDADOR = '3.0.1'
+CACHE_REPORTES_ACTIVO = True    # El motor sombra lo apaga en su copia del módulo
+
+# Tiempos por etapa (apagado salvo VALIDADOR_PERFIL=1 o --perfil)
+import perfilador
+
+# Cache de configs por línea normalizada: nombre -> entrada con path, mtime y config.
+# El mtime se revisa como mucho cada CONFIG_INTERVALO_CHEQUEO segundos, así las
+# ediciones del JSON se toman sin reiniciar y sin un stat() por mensaje.
+CONFIG_INTERVALO_CHEQUEO = 2.0
+_CONFIG_CACHE = {}
+_CONFIG_STATS = {'hits': 0, 'misses': 0, 'reloads': 0}
+
+def _normalizar_linea_config(linea):
+    # Normalizar nombre línea
+    if not linea: linea = "ROCA"
+    nombre_clean = linea.strip().lower().replace(' ', '_')
+    if 'san_martin' in nombre_clean: nombre_clean = 'san_martin'
+    return nombre_clean
+
+def _ruta_config(nombre_clean):
+    """Path del config de la línea, o el de ROCA como fallback (None si no hay ninguno)"""
+    # Buscar path relativo a este script
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(base_path, "configs", f"config_{nombre_clean}.json")
+    if os.path.exists(path):
+        return path
+    # Fallback a ROCA si no existe (para compatibilidad)
+    path_roca = os.path.join(base_path, "configs", "config_roca.json")
+    if os.path.exists(path_roca):
+        return path_roca
+    return None
+
+def _leer_config(path):
+    if path is None:
+        config = {}
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    # Congelado: se comparte entre todos los mensajes de la línea
+    config['palabras_tecnicas'] = frozenset(config.get('palabras_tecnicas', []))
+    return config
 
 def cargar_config(linea="ROCA"):
-    """Carga configuración específica de la línea"""
+    """
+    Carga configuración específica de la línea (memoizada por línea).
+    Las palabras_tecnicas se devuelven como frozenset; el dict es compartido,
+    no modificarlo.
+    """
     try:
-        # Normalizar nombre línea
-        if not linea: linea = "ROCA"
-        nombre_clean = linea.strip().lower().replace(' ', '_')
-        if 'san_martin' in nombre_clean: nombre_clean = 'san_martin'
+        nombre_clean = _normalizar_linea_config(linea)
+        ahora = time.monotonic()
+        entrada = _CONFIG_CACHE.get(nombre_clean)
         
-        # Buscar path relativo a este script
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        path = os.path.join(base_path, "configs", f"config_{nombre_clean}.json")
+        if entrada is not None and ahora - entrada['chequeado'] < CONFIG_INTERVALO_CHEQUEO:
+            _CONFIG_STATS['hits'] += 1
+            return entrada['config']
         
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            # Fallback a ROCA si no existe (para compatibilidad)
-            # print(f"⚠️ Config no encontrada para {linea}, usando ROCA por defecto")
-            path_roca = os.path.join(base_path, "configs", "config_roca.json")
-            if os.path.exists(path_roca):
-                with open(path_roca, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {"palabras_tecnicas": []}
+        path = _ruta_config(nombre_clean)
+        mtime = os.path.getmtime(path) if path else None
+        
+        if entrada is not None and entrada['path'] == path and entrada['mtime'] == mtime:
+            entrada['chequeado'] = ahora
+            _CONFIG_STATS['hits'] += 1
+            return entrada['config']
+        
+        _CONFIG_STATS['reloads' if entrada is not None else 'misses'] += 1
+        config = _leer_config(path)
+        _CONFIG_CACHE[nombre_clean] = {'path': path, 'mtime': mtime, 'chequeado': ahora, 'config': config}
+        return config
             
     except Exception as e:
         print(f"❌ Error cargando config: {e}")
-        return {"palabras_tecnicas": []}
+        return {"palabras_tecnicas": frozenset()}
+
+def version_config(linea="ROCA"):
+    """Identifica el archivo de config vigente de la línea (ruta + mtime)"""
+    cargar_config(linea)
+    entrada = _CONFIG_CACHE.get(_normalizar_linea_config(linea))
+    if entrada is None:
+        return None
+    return f"{entrada['path']}:{entrada['mtime']}"
+
+def estadisticas_config():
+    """Hits/misses/reloads del cache de configs (para confirmar que funciona en producción)"""
+    return {
+        **_CONFIG_STATS,
+        'lineas_cacheadas': sorted(_CONFIG_CACHE),
+    }
 
 # =================================================================
 #                    MAPEOS DE ESTADOS
@@ -179,13 +246,223 @@ SINONIMOS_CONTINGENCIAS = {
 # Estados que no requieren validación de tiempo (o tienen lógica especial)
 ESTADOS_SIN_TARDANZA = ['REDUCIDO', 'INTERRUMPIDO', 'CONDICIONAL', 'REANUDACIÓN']
 
+# Typos comunes para el corrector de respaldo (sin LanguageTool)
+ERRORES_ORTOGRAFICOS_COMUNES = [
+    (r'\bSUSPENDIOD\b', 'SUSPENDIDO'),
+    (r'\bCIRUCLA\b', 'CIRCULA'),
+    (r'\bCIRUCLAN\b', 'CIRCULAN'),
+    (r'\bPARTEINEDO\b', 'PARTIENDO'),
+    (r'\bPARTIDIENDO\b', 'PARTIENDO'),
+    (r'\bMOOTIVO\b', 'MOTIVO'),
+    (r'\bMOTIVIO\b', 'MOTIVO'),
+    (r'\bHACIAA\b', 'HACIA'),
+    (r'\bHAICIA\b', 'HACIA'),
+    (r'\bREGISTRAA\b', 'REGISTRA'),
+    (r'\bREGISTRAAD[OA]\b', 'REGISTRADO/A'),
+]
+
+# =================================================================
+#                    PATRONES COMPILADOS
+# =================================================================
+# Se compilan una sola vez al importar el módulo. El cache interno de `re`
+# es chico y se satura con las reglas personalizadas, así que el validador
+# usa siempre estos objetos en lugar de pasar strings a re.search().
+
+_ESTACION = r'[A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?'
+
+PATRONES = {
+    # Normalización
+    'espacios': re.compile(r'\s+'),
+    'espacios_multiples': re.compile(r'\s{2,}'),
+    # Tipo de mensaje
+    'reanudacion': re.compile(r'SE\s+RESTABLECE|RESTABLECE\s+(?:EL\s+)?SERVICIO'),
+    'servicio_reanudacion': re.compile(r'(?:RAMAL|L[ÍI]NEA)\s+([A-ZÁÉÍÓÚÑ\s\-\.]+?)(?:\s+SE\s+|\s+RESTABLECE)'),
+    'tren_tipo': re.compile(r'(?:EL\s+)?TREN\s+(?:N[°º]?\s*)?(?:@T)?(\d+)'),
+    'servicio_tipo': re.compile(r'(?:EL\s+)?(?:SERVICIO|RAMAL|L[ÍI]NEA)\s+([A-ZÁÉÍÓÚÑ\s\-\.]+?)(?:\s+SE\s+|\s+CIRCULA|\s+HA\s+)'),
+    # Componente F
+    'codigo_estructura': re.compile(r'(?:^|[\s\(\-])(\d{1,2})[\.\-](\d{1,2})[\.\-]([A-Z])(?=[\s\)\-]|$)'),
+    # Componente A
+    'tren_prefijo_at': re.compile(r'TREN\s+(?:N[°º]?\s*)?@T\d+'),
+    # Componente B (menciones informales y minutos)
+    'demora_informal': re.compile(r'\bDEMORAS?\b|\bDEMORANDO\b'),
+    'demorando': re.compile(r'\bDEMORANDO\b'),
+    'cancelado_informal': re.compile(r'\bCANCELAD[OA]S?\b'),
+    'minutos_demora': re.compile(r'(?:DEMORAS?|REGISTRA)\s+(?:DE[_\s]*)?[_\s]*(\d+)[_\s]*(?:MINUTOS?|MIN\.?)'),
+    'minutos_demora_alt': re.compile(r'CON\s+(\d+)\s+MINUTOS\s+DE\s+DEMORAS?'),
+    'demora_partida': re.compile(r'DEMORANDO\s+(?:SU\s+)?PARTIDA|DEMORA(?:S)?\s+EN\s+(?:LA\s+)?PARTIDA|PARTIDA\s+DEMORADA'),
+    # Componente D
+    'hora': re.compile(r'DE\s+LAS\s*(\d{1,2})[:\.\s](\d{2})\s*HS'),
+    'hora_sin_separador': re.compile(r'DE\s+LAS\s*(\d{2})(\d{2})\s*HS'),
+    'hora_desordenada': re.compile(r'DE\s+LAS\s+HS\s+(\d{1,2})\s+(\d{2})'),
+    'hora_flexible': re.compile(r'(?:A\s+LAS|DE\s+LAS|DE|SALIDA|HORA)\s*(\d{1,2})[:\s\.](\d{2})'),
+    'lugar': re.compile(r'\bEN\s+([A-ZÁÉÍÓÚÑ\s\.]+?)(?=\s+(?:DISCULPA|SEPA|\.|$))'),
+    # Componente E
+    'origen': re.compile(r'(?:PARTIENDO\s+(?:DE|DESDE)|DESDE|DE)\s+(' + _ESTACION + r')(?=\s+(?:HACIA|A\s+[A-ZÁÉÍÓÚÑ]|CON\s+DEMORA|CIRCULA|HA\s+SIDO|FUE))'),
+    'destino': re.compile(r'HACIA\s+(' + _ESTACION + r')(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|REGISTRA|SE\s+ENCUENTRA|POR\s+|O\s+TRAS\s+|RESTABLECE|SE\s+|PARTIO|$))'),
+    'recorrido_entre': re.compile(r'ENTRE\s+(' + _ESTACION + r')\s+Y\s+(' + _ESTACION + r')(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|$))'),
+    'recorrido_de_a': re.compile(r'(?:SALIENDO\s+|SALE\s+)?DE\s+(' + _ESTACION + r')\s+A\s+(' + _ESTACION + r')(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|CON\s+SU\s+VUELTA|PARTIENDO|SERAN?|$))'),
+    # Ortografía de respaldo
+    'letras_repetidas': re.compile(r'([A-Z])\1{2,}'),
+}
+
+# Patrones de estado formal por código, en el mismo orden que MAP_ESTADOS_CODIGO
+PATRONES_ESTADOS = [
+    (cod_estado, info_estado['nombre'], [re.compile(p) for p in info_estado['patrones']])
+    for cod_estado, info_estado in MAP_ESTADOS_CODIGO.items()
+]
+
+_PATRONES_FORMAS = {}
+
+def patron_forma(texto):
+    """Compila (una sola vez) el patrón flexible en espacios de una forma de comunicación"""
+    patron = _PATRONES_FORMAS.get(texto)
+    if patron is None:
+        patron = re.compile(re.escape(texto).replace(r'\ ', r'\s+'))
+        _PATRONES_FORMAS[texto] = patron
+    return patron
+
+# Sinónimos de contingencias: (forma_oficial, sinonimo, patron)
+PATRONES_SINONIMOS = [
+    (forma_oficial, sinonimo, patron_forma(sinonimo))
+    for forma_oficial, sinonimos in SINONIMOS_CONTINGENCIAS.items()
+    for sinonimo in sinonimos
+]
+
+PATRONES_ORTOGRAFIA = [
+    (re.compile(patron), correcto) for patron, correcto in ERRORES_ORTOGRAFICOS_COMUNES
+]
+
+# =================================================================
+#                    TOKENIZACIÓN DEL MENSAJE
+# =================================================================
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+def _literales_en(items):
+    candidatos = []
+    tramo = []
+
+    def cerrar_tramo():
+        if len(tramo) >= 2:
+            candidatos.append((''.join(tramo),))
+        tramo.clear()
+
+    for op, av in items:
+        if op == _sre_parse.LITERAL:
+            tramo.append(chr(av))
+            continue
+        cerrar_tramo()
+        requeridos = None
+        if op == _sre_parse.SUBPATTERN:
+            requeridos = _literales_en(av[-1])
+        elif op == _sre_parse.BRANCH:
+            por_rama = [_literales_en(rama) for rama in av[1]]
+            if all(por_rama):
+                requeridos = tuple(literal for rama in por_rama for literal in rama)
+        elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and av[0] >= 1:
+            requeridos = _literales_en(av[2])
+        if requeridos:
+            candidatos.append(requeridos)
+    cerrar_tramo()
+    mejor = max(candidatos, key=lambda alternativas: min(map(len, alternativas)), default=None)
+    return tuple(dict.fromkeys(mejor)) if mejor else None
+
+def literales_requeridos(patron):
+    """
+    Textos literales de los que al menos uno aparece en toda coincidencia del
+    patrón, o None si no se puede asegurar ninguno. Sirve de filtro previo:
+    si el texto no contiene ninguno, el patrón no puede coincidir.
+    """
+    if patron.flags & re.IGNORECASE:
+        return None
+    return _literales_en(_sre_parse.parse(patron.pattern, patron.flags))
+
+_LITERALES_PATRONES = {nombre: literales_requeridos(patron) for nombre, patron in PATRONES.items()}
+_LITERALES_ESTADOS = [
+    [(patron, literales_requeridos(patron)) for patron in patrones]
+    for _cod, _nombre, patrones in PATRONES_ESTADOS
+]
+_LITERALES_ORTOGRAFIA = [
+    (patron, literales_requeridos(patron), correcto) for patron, correcto in PATRONES_ORTOGRAFIA
+]
+
+class TextoMensaje:
+    """
+    El contenido de un mensaje preparado una sola vez y compartido por todos
+    los extractores de componentes (A-F), la clasificación y los scores.
+
+    - normalizado / upper: espacios colapsados (MEJORA #12) y mayúsculas
+    - buscar(nombre): coincidencia de PATRONES[nombre], calculada a lo sumo
+      una vez por mensaje. Si el texto no contiene ninguno de los literales
+      que el patrón exige, ni se recorre con regex.
+
+    No es un lexer de tokens tipados: lo que extraen los componentes sale de
+    capturas perezosas y lookaheads (la estación entre DESDE/HACIA y el verbo
+    que la sigue) que habría que rehacer a mano sobre los tokens. Sobre el
+    histórico, tokenizar en una sola pasada ya cuesta ~35 us/msg, y todas las
+    búsquedas con compuerta juntas ~58 us/msg (el pipeline hace ~9 por mensaje).
+    """
+
+    __slots__ = ('contenido', 'normalizado', 'upper', '_coincidencias')
+
+    def __init__(self, contenido, normalizar=True):
+        self.contenido = contenido
+        self.normalizado = PATRONES['espacios'].sub(' ', contenido).strip() if normalizar else contenido
+        self.upper = self.normalizado.upper()
+        self._coincidencias = {}
+
+    def contiene(self, literales):
+        if literales is None:
+            return True
+        upper = self.upper
+        for literal in literales:
+            if literal in upper:
+                return True
+        return False
+
+    def buscar(self, nombre, mayusculas=True):
+        """Match de PATRONES[nombre] sobre el texto en mayúsculas (o sin convertir)"""
+        clave = (nombre, mayusculas)
+        try:
+            return self._coincidencias[clave]
+        except KeyError:
+            pass
+        if mayusculas:
+            match = PATRONES[nombre].search(self.upper) if self.contiene(_LITERALES_PATRONES[nombre]) else None
+        else:
+            match = PATRONES[nombre].search(self.normalizado)
+        self._coincidencias[clave] = match
+        return match
+
+    def estado_formal(self):
+        """(código, nombre) del primer estado formal presente, o None"""
+        for (cod_estado, nombre_estado, _patrones), patrones in zip(PATRONES_ESTADOS, _LITERALES_ESTADOS):
+            for patron, literales in patrones:
+                if self.contiene(literales) and patron.search(self.upper):
+                    return cod_estado, nombre_estado
+        return None
+
+    def errores_ortografia_comunes(self):
+        """(palabra, corrección) de cada error de ERRORES_ORTOGRAFICOS_COMUNES presente"""
+        errores = []
+        for patron, literales, correcto in _LITERALES_ORTOGRAFIA:
+            if self.contiene(literales):
+                match_error = patron.search(self.upper)
+                if match_error:
+                    errores.append((match_error.group(), correcto))
+        return errores
+
 # =================================================================
 #                    CARGAR CONTINGENCIAS
 # =================================================================
 
-def cargar_contingencias(archivo_excel="Contingencias.xlsx"):
-    """Carga matriz de contingencias desde Excel"""
+def _leer_excel_contingencias(archivo_excel):
+    """Lee la matriz de contingencias del Excel (pandas + openpyxl) y aplica el parche"""
     try:
+        import pandas as pd  # Solo para compilar el snapshot: el validador no lo necesita
         df = pd.read_excel(archivo_excel)
         
         # Normalizar nombres de columnas para evitar problemas de mayúsculas/espacios
@@ -228,6 +505,155 @@ def cargar_contingencias(archivo_excel="Contingencias.xlsx"):
         print(f"❌ Error cargando contingencias: {e}")
         return None
 
+# Snapshot compilado de la matriz: evita pandas/openpyxl al arrancar cada
+# worker. Se identifica por el hash del Excel y se regenera solo si cambia.
+DIR_SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
+VERSION_SNAPSHOT_CONTINGENCIAS = 1
+
+def _hash_archivo(ruta):
+    import hashlib
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _ruta_snapshot_contingencias(hash_excel):
+    return os.path.join(DIR_SNAPSHOTS, f"contingencias_{hash_excel[:16]}.json")
+
+def compilar_snapshot_contingencias(archivo_excel="Contingencias.xlsx"):
+    """
+    Paso de build: Excel + parche → snapshot JSON con los códigos ya normalizados.
+    Returns: dict del snapshot o None si el Excel no se pudo leer
+    """
+    df = _leer_excel_contingencias(archivo_excel)
+    if df is None:
+        return None
+
+    hash_excel = _hash_archivo(archivo_excel)
+    snapshot = {
+        'version': VERSION_SNAPSHOT_CONTINGENCIAS,
+        'excel': os.path.basename(archivo_excel),
+        'excel_sha256': hash_excel,
+        'generado': datetime.now().isoformat(),
+        'columnas': [str(c) for c in df.columns],
+        'filas': [
+            [None if _es_vacio(valor) else valor for valor in fila]
+            for fila in df.itertuples(index=False, name=None)
+        ],
+    }
+
+    ruta = _ruta_snapshot_contingencias(hash_excel)
+    try:
+        os.makedirs(DIR_SNAPSHOTS, exist_ok=True)
+        # Temporal único: los workers que arrancan juntos compilan el mismo snapshot a la vez
+        fd, temporal = tempfile.mkstemp(dir=DIR_SNAPSHOTS, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+        print(f"📦 Snapshot de contingencias generado: {ruta}")
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar snapshot de contingencias: {e}")
+    return snapshot
+
+def cargar_snapshot_contingencias(archivo_excel="Contingencias.xlsx"):
+    """Snapshot vigente para el Excel actual (sin pandas), o None si no hay"""
+    try:
+        hash_excel = _hash_archivo(archivo_excel)
+        with open(_ruta_snapshot_contingencias(hash_excel), 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('version') != VERSION_SNAPSHOT_CONTINGENCIAS or snapshot.get('excel_sha256') != hash_excel:
+        return None
+    return snapshot
+
+def cargar_contingencias(archivo_excel="Contingencias.xlsx"):
+    """
+    Carga matriz de contingencias (desde el snapshot; lo regenera si cambió el Excel)
+    Returns: TablaContingencias o None
+    """
+    snapshot = cargar_snapshot_contingencias(archivo_excel) or compilar_snapshot_contingencias(archivo_excel)
+    if snapshot is None:
+        return None
+    return TablaContingencias.desde_columnas(snapshot['columnas'], snapshot['filas'])
+
+def _es_vacio(valor):
+    """None o NaN (NaN es el único valor distinto de sí mismo)"""
+    return valor is None or valor != valor
+
+def _columna_comunicacion(columnas):
+    if 'Forma_Comunicacion' in columnas:
+        return 'Forma_Comunicacion'
+    if 'Formas_de_comunicación' in columnas:
+        return 'Formas_de_comunicación'  # fallback por si acaso
+    return None
+
+class TablaContingencias:
+    """
+    Matriz de contingencias inmutable y sin pandas. Guarda las filas del Excel
+    como tuplas (código, forma de comunicación) en su orden original, más los
+    diccionarios para consultar código por forma y formas por código.
+    Las formas vacías del Excel quedan como None.
+    """
+
+    __slots__ = ('filas', '_codigo_por_forma', '_formas_por_codigo')
+
+    def __init__(self, filas):
+        filas = tuple(
+            (None if _es_vacio(codigo) else str(codigo).zfill(2), None if _es_vacio(forma) else forma)
+            for codigo, forma in filas
+        )
+        codigo_por_forma = {}
+        formas_por_codigo = {}
+        for codigo, forma in filas:
+            if isinstance(forma, str):
+                codigo_por_forma.setdefault(forma.upper(), codigo)
+                formas_por_codigo.setdefault(codigo, []).append(forma)
+
+        object.__setattr__(self, 'filas', filas)
+        object.__setattr__(self, '_codigo_por_forma', codigo_por_forma)
+        object.__setattr__(self, '_formas_por_codigo', {c: tuple(f) for c, f in formas_por_codigo.items()})
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("TablaContingencias es inmutable")
+
+    __delattr__ = __setattr__
+
+    @classmethod
+    def desde_columnas(cls, columnas, filas):
+        """Desde filas con las columnas del Excel (ya normalizadas como en el snapshot)"""
+        col_comunicacion = _columna_comunicacion(columnas)
+        if col_comunicacion is None or 'Código' not in columnas:
+            return cls(())
+        i_codigo = columnas.index('Código')
+        i_forma = columnas.index(col_comunicacion)
+        return cls((fila[i_codigo], fila[i_forma]) for fila in filas)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        """Compatibilidad con quien todavía pase el DataFrame del Excel"""
+        columnas = [str(c) for c in df.columns]
+        return cls.desde_columnas(columnas, list(df.itertuples(index=False, name=None)))
+
+    def codigo_de(self, forma):
+        """Código de una forma de comunicación (primera fila del Excel) o None"""
+        return self._codigo_por_forma.get(forma.upper())
+
+    def formas_de(self, codigo):
+        """Formas de comunicación con ese código, en orden del Excel"""
+        return self._formas_por_codigo.get(str(codigo).zfill(2), ())
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __repr__(self):
+        return f"TablaContingencias({len(self.filas)} filas)"
+
 
 _REGLAS_CACHE = None
 
@@ -262,80 +688,362 @@ def cargar_reglas_personalizadas():
 
 def recargar_reglas():
     """Fuerza la recarga de las reglas desde el disco"""
-    global _REGLAS_CACHE
+    global _REGLAS_CACHE, _MOTOR_REGLAS
     _REGLAS_CACHE = None
+    _MOTOR_REGLAS = None  # El motor nuevo trae otra versión: el cache de reportes no se reusa
     print("🔄 Cache de reglas limpiado")
 
-def buscar_contingencia_con_sinonimos(contenido_upper, contingencias_df):
+# =================================================================
+#                    MOTOR DE REGLAS PERSONALIZADAS
+# =================================================================
+
+# Acciones que sobrescriben la validación; las demás reglas son informativas
+ACCIONES_REGLA = ('aprobar_sin_obs', 'aprobar_con_obs')
+ALCANCE_GLOBAL = 'global'
+
+def alcance_linea(linea):
+    """Clave de alcance de una línea, comparable con el '_origen' de las reglas"""
+    return (linea or '').lower().replace(' ', '_')
+
+# Reglas por bloque fusionado (patrones más grandes compilan y escanean peor)
+TAMANIO_BLOQUE_REGLAS = 40
+PRESUPUESTO_REGLA_MS = 50    # Tiempo de CPU máximo por búsqueda antes de aislar/suspender
+EXCESOS_PARA_SUSPENDER = 3   # Búsquedas de una regla suelta fuera de presupuesto antes de suspenderla
+
+# Construcciones que no sobreviven a la fusión: backreferences numéricas o por
+# nombre, grupos con nombre (se repetirían) y condicionales por número de grupo
+_NO_FUSIONABLE = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?<[A-Za-z_]|\(\?\(')
+
+def _es_fusionable(regex):
+    if _NO_FUSIONABLE.search(regex):
+        return False
+    try:
+        # Flags globales como (?i) solo valen al inicio del patrón
+        re.compile('(?=(?P<_r>' + regex + '))', re.IGNORECASE | re.UNICODE)
+    except re.error:
+        return False
+    return True
+
+class MotorReglas:
     """
-    MEJORA #9: Busca contingencia en texto considerando sinónimos y estructura real
-    Retorna: (codigo_contingencia, forma_comunicacion) o (None, None)
+    Reglas personalizadas compiladas una sola vez y particionadas por alcance
+    (global o carpeta de cada línea). Para un mensaje solo se evalúan las
+    particiones de su línea, respetando el orden de carga de las reglas.
+
+    Las reglas de cada línea se fusionan en bloques de alternancias con un
+    grupo con nombre por regla, así un solo recorrido del texto por bloque
+    indica qué regla de mayor prioridad coincide. Las reglas que no se pueden
+    fusionar se evalúan solas, en su lugar dentro del orden.
+
+    Cada búsqueda tiene un presupuesto de PRESUPUESTO_REGLA_MS de CPU del
+    hilo (time.thread_time: la espera por el GIL, el hilo del motor sombra o
+    una máquina con CPU robada no cuentan). Si un bloque lo excede sus reglas
+    pasan a evaluarse solas (no cambia ningún resultado); una regla sola
+    queda suspendida hasta la próxima recarga recién al excederlo
+    EXCESOS_PARA_SUSPENDER veces, para que una pausa aislada no haga que
+    cada worker clasifique distinto.
+    """
+
+    def __init__(self, reglas, campo_origen='_origen'):
+        self.particiones = {}
+        self.descartadas = []
+        self.suspendidas = []
+        self.campo_origen = campo_origen
+        # Cambia con cualquier alta, baja o modificación de reglas (y al suspender una)
+        self.version = cache_reportes.calcular_clave(
+            [{k: v for k, v in r.items() if k != '_archivo'} for r in reglas]
+        )[:16]
+        self._aisladas = set()
+        self._suspendidas = set()
+        self._excesos = {}     # orden → búsquedas fuera de presupuesto
+        self._planes = {}
+
+        for orden, regla in enumerate(reglas):
+            accion = regla.get('accion_sugerida') or regla.get('accion')
+            regex = regla.get('regex_sugerido', '')
+            if accion not in ACCIONES_REGLA or not regex:
+                continue  # No puede cambiar el resultado de ningún mensaje
+            try:
+                patron = re.compile(regex, re.IGNORECASE | re.UNICODE)
+            except re.error as e:
+                motivo = f"regex inválido: {e}"
+                self.descartadas.append({'id': regla.get('id'), 'origen': regla.get(campo_origen), 'motivo': motivo})
+                print(f"⚠️ Regla {regla.get('id')} ({regla.get(campo_origen)}) descartada: {motivo}")
+                continue
+            self.particiones.setdefault(regla.get(campo_origen), []).append(
+                (orden, patron, accion, regla, _es_fusionable(regex))
+            )
+
+    def reglas_para(self, linea_msg):
+        """Reglas aplicables a una línea (globales + propias), en orden de prioridad"""
+        return self._plan_para(linea_msg)[0]
+
+    def _plan_para(self, linea_msg):
+        """
+        (reglas, segmentos) de una línea. Cada segmento es un bloque fusionado
+        (patron, {grupo: prioridad}) o una regla suelta (None, prioridad).
+        """
+        plan = self._planes.get(linea_msg)
+        if plan is not None:
+            return plan
+
+        alcances = {ALCANCE_GLOBAL, linea_msg}
+        reglas = sorted(
+            (r for alcance in alcances for r in self.particiones.get(alcance, ())
+             if r[0] not in self._suspendidas),
+            key=lambda r: r[0]
+        )
+
+        segmentos = []
+        pendientes = []
+
+        def cerrar_bloque():
+            if not pendientes:
+                return
+            alternativas = '|'.join(f'(?P<r{i}>{reglas[i][3]["regex_sugerido"]})' for i in pendientes)
+            patron = re.compile('(?=' + alternativas + ')', re.IGNORECASE | re.UNICODE)
+            grupos = {patron.groupindex[f'r{i}']: i for i in pendientes}
+            segmentos.append((patron, grupos))
+            pendientes.clear()
+
+        for prioridad, (orden, _patron, _accion, _regla, fusionable) in enumerate(reglas):
+            if fusionable and orden not in self._aisladas:
+                pendientes.append(prioridad)
+                if len(pendientes) >= TAMANIO_BLOQUE_REGLAS:
+                    cerrar_bloque()
+            else:
+                cerrar_bloque()
+                segmentos.append((None, prioridad))
+        cerrar_bloque()
+
+        plan = (reglas, segmentos)
+        self._planes[linea_msg] = plan
+        return plan
+
+    def iterar_coincidencias(self, contenido, linea_msg):
+        """
+        Genera (prioridad, regla, accion) de las reglas que coinciden, en orden
+        de prioridad. La primera sale de un único escaneo por bloque; las
+        siguientes (si el llamador las pide) se verifican regla por regla.
+        """
+        if not isinstance(contenido, str):
+            return
+        reglas, segmentos = self._plan_para(linea_msg)
+
+        for patron, grupos in segmentos:
+            if patron is None:
+                prioridad = grupos
+                inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+                coincide = reglas[prioridad][1].search(contenido)
+                self._controlar_presupuesto(inicio, inicio_cpu, [reglas[prioridad]])
+                if coincide:
+                    yield prioridad, reglas[prioridad][3], reglas[prioridad][2]
+                continue
+
+            # En cada posición el lookahead reporta la alternativa de mayor
+            # prioridad; el mínimo sobre todas las posiciones es la ganadora.
+            primera = None
+            inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+            for match in patron.finditer(contenido):
+                prioridad = grupos[match.lastindex]
+                if primera is None or prioridad < primera:
+                    primera = prioridad
+            self._controlar_presupuesto(inicio, inicio_cpu, [reglas[i] for i in grupos.values()])
+            if primera is None:
+                continue
+
+            yield primera, reglas[primera][3], reglas[primera][2]
+            for prioridad in sorted(grupos.values()):
+                if prioridad > primera and reglas[prioridad][1].search(contenido):
+                    yield prioridad, reglas[prioridad][3], reglas[prioridad][2]
+
+    def _controlar_presupuesto(self, inicio, inicio_cpu, reglas):
+        """
+        Corta el circuito de las reglas lentas. El motor de `re` no se puede
+        interrumpir a mitad de búsqueda, así que la búsqueda que se pasó del
+        presupuesto termina igual; lo que se evita es repetirla.
+        """
+        perfil = perfilador.obtener_perfilador()
+        if perfil.activo:
+            perfil.registrar_regla(self._nombre_perfil(reglas), time.perf_counter() - inicio)
+        ms = (time.thread_time() - inicio_cpu) * 1000
+        if ms <= PRESUPUESTO_REGLA_MS:
+            return
+        if len(reglas) > 1:
+            self._aisladas.update(r[0] for r in reglas)
+            print(f"⚠️ Bloque de {len(reglas)} reglas tardó {ms:.0f} ms: se evalúan por separado")
+        else:
+            orden, _patron, _accion, regla, _fusionable = reglas[0]
+            excesos = self._excesos[orden] = self._excesos.get(orden, 0) + 1
+            if excesos < EXCESOS_PARA_SUSPENDER:
+                print(f"⚠️ Regla {regla.get('id')} ({regla.get(self.campo_origen)}) tardó {ms:.0f} ms "
+                      f"({excesos}/{EXCESOS_PARA_SUSPENDER} antes de suspenderla)")
+                return
+            self._suspendidas.add(orden)
+            self.suspendidas.append({
+                'id': regla.get('id'),
+                'origen': regla.get(self.campo_origen),
+                'motivo': (f"{excesos} búsquedas fuera de presupuesto, la última de {ms:.0f} ms de CPU "
+                           f"(presupuesto {PRESUPUESTO_REGLA_MS} ms)"),
+            })
+            self.version = cache_reportes.calcular_clave(self.version, regla.get('id'))[:16]
+            print(f"⚠️ Regla {regla.get('id')} ({regla.get(self.campo_origen)}) suspendida: tardó {ms:.0f} ms")
+        self._planes.clear()
+
+    def _nombre_perfil(self, reglas):
+        """Regla suelta: 'id (origen)'; bloque fusionado: 'bloque[id1+id2+...]'"""
+        if len(reglas) == 1:
+            regla = reglas[0][3]
+            return f"{regla.get('id')} ({regla.get(self.campo_origen)})"
+        return 'bloque[' + '+'.join(str(r[3].get('id')) for r in reglas) + ']'
+
+    def evaluar(self, contenido, linea_msg):
+        """Primera regla que coincide: (regla, accion) o None"""
+        for _prioridad, regla, accion in self.iterar_coincidencias(contenido, linea_msg):
+            return regla, accion
+        return None
+
+_MOTOR_REGLAS = None
+
+def obtener_motor_reglas():
+    """Motor armado desde cargar_reglas_personalizadas(); se rehace tras recargar_reglas()"""
+    global _MOTOR_REGLAS
+    if _MOTOR_REGLAS is None:
+        _MOTOR_REGLAS = MotorReglas(cargar_reglas_personalizadas())
+    return _MOTOR_REGLAS
+
+# Fallback manual si la forma oficial no está en el Excel (por seguridad)
+# Actualizado según imagen del usuario:
+# 03 = PROBLEMAS TÉCNICOS
+# 05 = PROBLEMAS OPERATIVOS
+# 17 = OTRAS CONTINGENCIAS
+CODIGOS_FALLBACK_CONTINGENCIAS = {
+    'PROBLEMAS TÉCNICOS': '03',
+    'PROBLEMAS OPERATIVOS': '05',
+    'OTRAS CONTINGENCIAS': '17',
+}
+
+class IndiceContingencias:
     """
-    # 1. Búsqueda exacta en columna 'Forma_Comunicacion' (la que va al pasajero)
-    col_comunicacion = None
-    if 'Forma_Comunicacion' in contingencias_df.columns:
-        col_comunicacion = 'Forma_Comunicacion'
-    elif 'Formas_de_comunicación' in contingencias_df.columns:
-        col_comunicacion = 'Formas_de_comunicación' # fallback por si acaso
+    Índice de contingencias armado una sola vez desde la matriz del Excel.
+
+    Une las formas oficiales (en el orden del Excel) y los sinónimos (en el
+    orden de SINONIMOS_CONTINGENCIAS) en una sola alternancia, un grupo por
+    forma y ordenados por prioridad. Un único recorrido del texto alcanza
+    para encontrar la forma de mayor prioridad presente, sin importar
+    cuántas filas tenga el Excel.
+    """
+
+    def __init__(self, tabla):
+        # Cada entrada: (texto buscado, código, forma reportada)
+        entradas = []
 
-    if col_comunicacion:
-        for idx, row in contingencias_df.iterrows():
-            forma = str(row[col_comunicacion]).upper()
+        # 1. Formas exactas (la que va al pasajero), prioridad según fila
+        for codigo, forma_raw in tabla.filas:
+            forma = str(forma_raw).upper() if forma_raw is not None else ''
             if forma and forma != 'NAN':
-                # Regex flexible
-                patron = re.escape(forma).replace(r'\ ', r'\s+')
-                if re.search(patron, contenido_upper):
-                    codigo = str(row['Código']).zfill(2)
-                    return (codigo, forma)
-    
-    # 2. Búsqueda por sinónimos (si falla la exacta)
-    # Actualizado según imagen del usuario:
-    # 03 = PROBLEMAS TÉCNICOS
-    # 05 = PROBLEMAS OPERATIVOS
-    # 17 = OTRAS CONTINGENCIAS
-    
-    for forma_oficial, sinonimos in SINONIMOS_CONTINGENCIAS.items():
-        for sinonimo in sinonimos:
-            patron = re.escape(sinonimo).replace(r'\ ', r'\s+')
-            if re.search(patron, contenido_upper):
-                
-                # Buscar el código que corresponde a esa forma oficial en el Excel
-                if col_comunicacion:
-                    match = contingencias_df[contingencias_df[col_comunicacion].str.upper() == forma_oficial]
-                    if not match.empty:
-                        codigo = str(match.iloc[0]['Código']).zfill(2)
-                        return (codigo, sinonimo)
-                
-                # Fallback manual si no está en Excel (por seguridad)
-                if forma_oficial == 'PROBLEMAS TÉCNICOS': return ('03', sinonimo)
-                if forma_oficial == 'PROBLEMAS OPERATIVOS': return ('05', sinonimo)
-                if forma_oficial == 'OTRAS CONTINGENCIAS': return ('17', sinonimo)
+                entradas.append((forma, codigo, forma))
+
+        # 2. Sinónimos: código de su forma oficial en el Excel o fallback manual.
+        # Los que no se pueden resolver nunca devolvían resultado, se descartan.
+        for forma_oficial, sinonimo, _patron in PATRONES_SINONIMOS:
+            codigo = tabla.codigo_de(forma_oficial) or CODIGOS_FALLBACK_CONTINGENCIAS.get(forma_oficial)
+            if codigo:
+                entradas.append((sinonimo, codigo, sinonimo))
+
+        # Ante textos repetidos gana la primera aparición (misma prioridad de antes)
+        vistos = set()
+        self._resultados = []
+        self._textos = []
+        alternativas = []
+        for texto, codigo, forma in entradas:
+            if texto in vistos:
+                continue
+            vistos.add(texto)
+            self._resultados.append((codigo, forma))
+            self._textos.append(texto)
+            alternativas.append(f"({patron_forma(texto).pattern})")
+
+        # Lookahead: reporta en cada posición la alternativa de mayor prioridad,
+        # incluso si se superpone con otra forma que empieza antes.
+        self._patron = re.compile('(?=' + '|'.join(alternativas) + ')') if alternativas else None
+        self.version = cache_reportes.calcular_clave(self._resultados, alternativas)[:16]
+
+    def buscar(self, contenido_upper):
+        """Retorna (codigo_contingencia, forma_comunicacion) o (None, None)"""
+        if self._patron is None:
+            return (None, None)
+
+        mejor = None
+        for match in self._patron.finditer(contenido_upper):
+            if mejor is None or match.lastindex < mejor:
+                mejor = match.lastindex
+                if mejor == 1:
+                    break
+
+        if mejor is None:
+            return (None, None)
+        return self._resultados[mejor - 1]
+
+    def buscar_normalizado(self, texto_normalizado):
+        """
+        Igual que buscar() para un texto con los espacios ya colapsados (como
+        TextoMensaje.upper): ahí cada forma coincide si y solo si aparece
+        literal, así que alcanza con buscarlas en orden de prioridad.
+        """
+        for i, texto in enumerate(self._textos):
+            if texto in texto_normalizado:
+                return self._resultados[i]
+        return (None, None)
 
-    return (None, None)
+
+_INDICE_CONTINGENCIAS = (None, None)
+
+def obtener_indice_contingencias(contingencias_df):
+    """Devuelve el índice de la matriz recibida, armándolo solo la primera vez"""
+    global _INDICE_CONTINGENCIAS
+    if isinstance(contingencias_df, IndiceContingencias):
+        return contingencias_df
+
+    tabla_indexada, indice = _INDICE_CONTINGENCIAS
+    if tabla_indexada is not contingencias_df:
+        tabla = contingencias_df
+        if not isinstance(tabla, TablaContingencias):
+            tabla = TablaContingencias.desde_dataframe(contingencias_df)
+        indice = IndiceContingencias(tabla)
+        _INDICE_CONTINGENCIAS = (contingencias_df, indice)
+    return indice
+
+def buscar_contingencia_con_sinonimos(contenido_upper, contingencias_df):
+    """
+    MEJORA #9: Busca contingencia en texto considerando sinónimos y estructura real
+    Prioridad: forma exacta del Excel primero, después sinónimos.
+    Retorna: (codigo_contingencia, forma_comunicacion) o (None, None)
+    """
+    return obtener_indice_contingencias(contingencias_df).buscar(contenido_upper)
 
 # =================================================================
 #                    DETECCIÓN TIPO MENSAJE
 # =================================================================
 
-def detectar_tipo_mensaje(contenido):
+def detectar_tipo_mensaje(contenido, texto=None):
     """
     Detecta si es TREN ESPECÍFICO, SERVICIO GENERAL o REANUDACIÓN
     
     TREN ESPECÍFICO: Habla de UN tren puntual con número
     SERVICIO GENERAL: Habla del estado de ramal/línea/servicio
     REANUDACIÓN: MEJORA #2 - Mensaje de restablecimiento de servicio
+    
+    texto: TextoMensaje ya preparado (si no, se arma desde contenido tal cual)
     """
-    contenido_upper = contenido.upper()
+    if texto is None:
+        texto = TextoMensaje(contenido, normalizar=False)
     
     # MEJORA #2: Detectar reanudación/restablecimiento
-    # MEJORA #2: Detectar reanudación/restablecimiento
-    if re.search(r'SE\s+RESTABLECE|RESTABLECE\s+(?:EL\s+)?SERVICIO', contenido_upper):
+    if texto.buscar('reanudacion'):
         # Buscar si menciona ramal/línea
         # MEJORA #13: Permitir guiones en nombres de ramales (ej: Retiro-Cabred)
-        match_servicio = re.search(
-            r'(?:RAMAL|L[ÍI]NEA)\s+([A-ZÁÉÍÓÚÑ\s\-\.]+?)(?:\s+SE\s+|\s+RESTABLECE)',
-            contenido_upper
-        )
+        match_servicio = texto.buscar('servicio_reanudacion')
         if match_servicio:
             return {
                 'tipo': 'REANUDACION',
@@ -345,10 +1053,7 @@ def detectar_tipo_mensaje(contenido):
             return {'tipo': 'REANUDACION'}
     
     # Buscar número de tren
-    match_tren = re.search(
-        r'(?:EL\s+)?TREN\s+(?:N[°º]?\s*)?(?:@T)?(\d+)',
-        contenido_upper
-    )
+    match_tren = texto.buscar('tren_tipo')
     
     if match_tren:
         return {
@@ -358,10 +1063,7 @@ def detectar_tipo_mensaje(contenido):
     
     # Buscar servicio/ramal/línea
     # MEJORA #13: Permitir guiones en nombres de ramales
-    match_servicio = re.search(
-        r'(?:EL\s+)?(?:SERVICIO|RAMAL|L[ÍI]NEA)\s+([A-ZÁÉÍÓÚÑ\s\-\.]+?)(?:\s+SE\s+|\s+CIRCULA|\s+HA\s+)',
-        contenido_upper
-    )
+    match_servicio = texto.buscar('servicio_tipo')
     
     if match_servicio:
         return {
@@ -377,7 +1079,7 @@ def detectar_tipo_mensaje(contenido):
 #                    VALIDACIÓN CÓDIGO ESTRUCTURA
 # =================================================================
 
-def extraer_codigo_estructura(contenido):
+def extraer_codigo_estructura(contenido, texto=None):
     """
     Extrae código de estructura X.Y.Z del mensaje
     Ejemplo: "3.1.A" → X=3, Y=1, Z=A
@@ -385,7 +1087,10 @@ def extraer_codigo_estructura(contenido):
     """
     # Regex más flexible: busca al inicio o con separadores claros
     # Permite: "3.1.A TEXTO", "3-1-A TEXTO", " TEXTO (3.1.A)"
-    match = re.search(r'(?:^|[\s\(\-])(\d{1,2})[\.\-](\d{1,2})[\.\-]([A-Z])(?=[\s\)\-]|$)', contenido.strip())
+    if texto is None:
+        match = PATRONES['codigo_estructura'].search(contenido.strip())
+    else:
+        match = texto.buscar('codigo_estructura', mayusculas=False)
     
     if match:
         return {
@@ -430,7 +1135,7 @@ def validar_codigo_estructura(codigo_extraido, codigo_contingencia_detectado, es
 #                    VALIDACIÓN DE COMPONENTES
 # =================================================================
 
-def validar_componentes(mensaje, contingencias_df):
+def validar_componentes(mensaje, contingencias_df, texto=None):
     """
     Valida los componentes del mensaje según tipo
     
@@ -439,16 +1144,14 @@ def validar_componentes(mensaje, contingencias_df):
     - #9: Detecta "DEMORA" singular
     - #12: Normalizar espacios múltiples
     """
-    global CORRECTOR_DISPONIBLE
+    if texto is None:
+        texto = TextoMensaje(mensaje.get('contenido', ''))
     
-    contenido = mensaje.get('contenido', '')
-    
-    # MEJORA #12: Normalizar espacios múltiples
-    contenido = re.sub(r'\s+', ' ', contenido).strip()
-    
-    contenido_upper = contenido.upper()
+    # MEJORA #12: Normalizar espacios múltiples (hecho en TextoMensaje)
+    contenido = texto.normalizado
+    contenido_upper = texto.upper
     
-    tipo_info = detectar_tipo_mensaje(contenido)
+    tipo_info = detectar_tipo_mensaje(contenido, texto)
     tipo = tipo_info['tipo']
     
     componentes = {
@@ -465,7 +1168,7 @@ def validar_componentes(mensaje, contingencias_df):
     }
     
     # Componente F: Código de estructura
-    codigo_estructura = extraer_codigo_estructura(contenido)
+    codigo_estructura = extraer_codigo_estructura(contenido, texto)
     if codigo_estructura:
         componentes['F'] = codigo_estructura['completo']
         # La estructura solo es válida si además reconocemos el tipo de mensaje
@@ -480,20 +1183,18 @@ def validar_componentes(mensaje, contingencias_df):
     
     # Componente A: Número de tren o servicio
     if tipo == 'TREN_ESPECIFICO':
-        match_tren = re.search(r'TREN\s+(?:N[°º]?\s*)?(?:@T)?(\d+)', contenido_upper)
+        # Mismo número que encontró detectar_tipo_mensaje (el "EL" opcional no cambia el grupo)
+        match_tren = texto.buscar('tren_tipo')
         if match_tren:
             componentes['A'] = match_tren.group(1)
             # Detectar si usa prefijo @T incorrecto
-            if re.search(r'TREN\s+(?:N[°º]?\s*)?@T\d+', contenido_upper):
+            if texto.buscar('tren_prefijo_at'):
                 componentes.setdefault('advertencias_formato', []).append(
                     "Número de tren con prefijo '@T'. Formato correcto: 'TREN N° XXXX' o 'TREN XXXX'"
                 )
     elif tipo == 'SERVICIO_GENERAL':
         # MEJORA #13: Permitir guiones en servicio
-        match_servicio = re.search(
-            r'(?:SERVICIO|RAMAL|L[ÍI]NEA)\s+([A-ZÁÉÍÓÚÑ\s\-\.]+?)(?:\s+SE\s+|\s+CIRCULA|\s+HA\s+)',
-            contenido_upper
-        )
+        match_servicio = texto.buscar('servicio_tipo')
         if match_servicio:
             componentes['A'] = match_servicio.group(1).strip()
     
@@ -501,24 +1202,20 @@ def validar_componentes(mensaje, contingencias_df):
     estado_detectado = None
     usa_estructura_formal = False
     
-    for cod_estado, info_estado in MAP_ESTADOS_CODIGO.items():
-        for patron in info_estado['patrones']:
-            if re.search(patron, contenido_upper):
-                estado_detectado = info_estado['nombre']
-                usa_estructura_formal = True
-                componentes['B'] = {
-                    'estado': estado_detectado,
-                    'codigo': cod_estado,
-                    'estructura_formal': True
-                }
-                break
-        if estado_detectado:
-            break
+    estado_formal = texto.estado_formal()
+    if estado_formal:
+        cod_estado, estado_detectado = estado_formal
+        usa_estructura_formal = True
+        componentes['B'] = {
+            'estado': estado_detectado,
+            'codigo': cod_estado,
+            'estructura_formal': True
+        }
     
     # Si no encontró estado formal, buscar menciones informales
     if not estado_detectado:
         # Buscar "DEMORA" o "DEMORANDO" sin estructura formal
-        if re.search(r'\bDEMORAS?\b|\bDEMORANDO\b', contenido_upper):
+        if texto.buscar('demora_informal'):
             estado_detectado = 'DEMORA'
             componentes['B'] = {
                 'estado': estado_detectado,
@@ -526,12 +1223,12 @@ def validar_componentes(mensaje, contingencias_df):
                 'estructura_formal': False
             }
             # Si usa "DEMORANDO", agregar observación de formato correcto
-            if re.search(r'\bDEMORANDO\b', contenido_upper):
+            if texto.buscar('demorando'):
                 componentes.setdefault('advertencias_formato', []).append(
                     "Se usó 'DEMORANDO' como estado. Formato estándar: 'CIRCULA CON DEMORAS DE X MINUTOS APROX'"
                 )
         # Buscar "CANCELADO/A" sin estructura formal
-        elif re.search(r'\bCANCELAD[OA]S?\b', contenido_upper):
+        elif texto.buscar('cancelado_informal'):
             estado_detectado = 'CANCELACIÓN'
             componentes['B'] = {
                 'estado': estado_detectado,
@@ -543,15 +1240,9 @@ def validar_componentes(mensaje, contingencias_df):
     if estado_detectado == 'DEMORA':
         # Formato estándar: "DEMORAS DE X MINUTOS" o "REGISTRA X MINUTOS"
         # Acepta guión bajo antes o después del número: DE _15, DE 10_, DE_9, 12 _
-        match_minutos = re.search(
-            r'(?:DEMORAS?|REGISTRA)\s+(?:DE[_\s]*)?[_\s]*(\d+)[_\s]*(?:MINUTOS?|MIN\.?)',
-            contenido_upper
-        )
+        match_minutos = texto.buscar('minutos_demora')
         # Formato alternativo: "CON X MINUTOS DE DEMORAS"
-        match_minutos_alt = re.search(
-            r'CON\s+(\d+)\s+MINUTOS\s+DE\s+DEMORAS?',
-            contenido_upper
-        )
+        match_minutos_alt = texto.buscar('minutos_demora_alt')
         
         if match_minutos:
             if componentes['B']:
@@ -579,9 +1270,9 @@ def validar_componentes(mensaje, contingencias_df):
     
     if contingencias_df is not None:
         # MEJORA #9: Buscar con sinónimos
-        codigo_contingencia, forma_comunicacion = buscar_contingencia_con_sinonimos(
-            contenido_upper, contingencias_df
-        )
+        codigo_contingencia, forma_comunicacion = obtener_indice_contingencias(
+            contingencias_df
+        ).buscar_normalizado(contenido_upper)
         if codigo_contingencia:
             componentes['C'] = {
                 'codigo': codigo_contingencia,
@@ -592,7 +1283,7 @@ def validar_componentes(mensaje, contingencias_df):
     
     if tipo == 'TREN_ESPECIFICO':
         # --- D - HORA (Oficial: DE LAS XX:XX HS) ---
-        match_hora = re.search(r'DE\s+LAS\s*(\d{1,2})[:\.\s](\d{2})\s*HS', contenido_upper)
+        match_hora = texto.buscar('hora')
         if match_hora:
             hour_str = match_hora.group(1)
             min_str = match_hora.group(2)
@@ -610,7 +1301,7 @@ def validar_componentes(mensaje, contingencias_df):
 
         else:
             # Intentar 4 dígitos sin separador: "DE LAS 2120 HS"
-            match_hora_nosep = re.search(r'DE\s+LAS\s*(\d{2})(\d{2})\s*HS', contenido_upper)
+            match_hora_nosep = texto.buscar('hora_sin_separador')
             if match_hora_nosep:
                 componentes['D'] = f"{match_hora_nosep.group(1)}:{match_hora_nosep.group(2)}"
                 componentes.setdefault('advertencias_formato', []).append(
@@ -618,7 +1309,7 @@ def validar_componentes(mensaje, contingencias_df):
                 )
             else:
                 # Intentar hora desordenada: "DE LAS HS HH MM" (operador puso HS antes de la hora)
-                match_hora_desordenada = re.search(r'DE\s+LAS\s+HS\s+(\d{1,2})\s+(\d{2})', contenido_upper)
+                match_hora_desordenada = texto.buscar('hora_desordenada')
                 if match_hora_desordenada:
                     componentes['D'] = f"{match_hora_desordenada.group(1)}:{match_hora_desordenada.group(2)}"
                     componentes.setdefault('advertencias_formato', []).append(
@@ -628,7 +1319,7 @@ def validar_componentes(mensaje, contingencias_df):
                 else:
                     # Intentar Flexible (DE LAS sin HS, A LAS, SALIDA...)
                     # MEJORA: Soportar "DE LAS HH.MM" sin HS
-                    match_hora_flex = re.search(r'(?:A\s+LAS|DE\s+LAS|DE|SALIDA|HORA)\s*(\d{1,2})[:\s\.](\d{2})', contenido_upper)
+                    match_hora_flex = texto.buscar('hora_flexible')
                     if match_hora_flex:
                          componentes['D'] = f"{match_hora_flex.group(1)}:{match_hora_flex.group(2)}"
                          componentes.setdefault('advertencias_formato', []).append(
@@ -637,13 +1328,13 @@ def validar_componentes(mensaje, contingencias_df):
 
         # --- E - RECORRIDO (Oficial: DESDE [A] HACIA [B]) ---
         # MEJORA: Aceptamos "DE [Origen]" además de "DESDE"
-        match_origen = re.search(r'(?:PARTIENDO\s+(?:DE|DESDE)|DESDE|DE)\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)(?=\s+(?:HACIA|A\s+[A-ZÁÉÍÓÚÑ]|CON\s+DEMORA|CIRCULA|HA\s+SIDO|FUE))', contenido_upper)
-        match_destino = re.search(r'HACIA\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|REGISTRA|SE\s+ENCUENTRA|POR\s+|O\s+TRAS\s+|RESTABLECE|SE\s+|PARTIO|$))', contenido_upper)
+        match_origen = texto.buscar('origen')
+        match_destino = texto.buscar('destino')
         
         # Lógica Flexible: Si no encuentra oficial, buscar variantes
         if not match_origen or not match_destino:
             # Variante 1: "ENTRE [A] Y [B]"
-            match_entre = re.search(r'ENTRE\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)\s+Y\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|$))', contenido_upper)
+            match_entre = texto.buscar('recorrido_entre')
             if match_entre:
                 componentes['E'] = {
                     'origen': match_entre.group(1).strip(),
@@ -657,7 +1348,7 @@ def validar_componentes(mensaje, contingencias_df):
             
             # Variante 2: "DE [A] A [B]" (Solo si no encontró ENTRE)
             if not componentes.get('E'):
-                match_de_a = re.search(r'(?:SALIENDO\s+|SALE\s+)?DE\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)\s+A\s+([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ\s\.\(\)]+?)(?=\s+(?:CIRCULA|HA\s+SIDO|FUE|CON\s+DEMORA|CON\s+SU\s+VUELTA|PARTIENDO|SERAN?|$))', contenido_upper)
+                match_de_a = texto.buscar('recorrido_de_a')
                 if match_de_a:
                     componentes['E'] = {
                         'origen': match_de_a.group(1).strip(),
@@ -677,7 +1368,7 @@ def validar_componentes(mensaje, contingencias_df):
     elif tipo == 'SERVICIO_GENERAL':
         # --- D - LUGAR (Contextual: "EN ...") ---
         # Busca indicador de lugar después del motivo o al final
-        match_lugar = re.search(r'\bEN\s+([A-ZÁÉÍÓÚÑ\s\.]+?)(?=\s+(?:DISCULPA|SEPA|\.|$))', contenido_upper)
+        match_lugar = texto.buscar('lugar')
         if match_lugar:
              # Filtrar falsos positivos comunes
              lugar = match_lugar.group(1).strip()
@@ -694,66 +1385,50 @@ def validar_componentes(mensaje, contingencias_df):
     
     # Cargar palabras técnicas desde config
     config = cargar_config(mensaje.get('linea', 'ROCA'))
-    palabras_tecnicas = set(config.get('palabras_tecnicas', []))
+    palabras_tecnicas = config['palabras_tecnicas']
 
+    usar_respaldo = True
     if CORRECTOR_DISPONIBLE:
         try:
-            # Inicializar corrector español (se carga en memoria)
-            tool = language_tool_python.LanguageTool('es')
-            
-            # Analizar el texto
-            matches = tool.check(contenido)
-            
-            for match in matches:
-                palabra_error = contenido[match.offset:match.offset + match.errorLength]
-                
+            # Pool compartido: el servidor Java se levanta una sola vez por proceso
+            for palabra_error, regla_id, reemplazos in verificar_ortografia(contenido):
                 # Ignorar si es palabra técnica conocida
                 if palabra_error.upper() in palabras_tecnicas:
                     continue
                 
                 # Solo errores ortográficos y tipográficos (no gramática)
-                if match.ruleId.startswith('MORFOLOGIK') or 'SPELLING' in match.ruleId:
-                    sugerencia = match.replacements[0] if match.replacements else '?'
+                if regla_id.startswith('MORFOLOGIK') or 'SPELLING' in regla_id:
+                    sugerencia = reemplazos[0] if reemplazos else '?'
                     errores_detectados.append(f"{palabra_error} → {sugerencia}")
-            
-            tool.close()
+            usar_respaldo = False
             
         except Exception as e:
-            # Si falla LanguageTool, usar sistema regex de respaldo
-            CORRECTOR_DISPONIBLE = False
+            # Si falla LanguageTool, usar sistema regex de respaldo solo para este mensaje
             # Guardamos el aviso como sistema, no como sugerencia de formato para el operador
             componentes['aviso_sistema'] = "Ortografía Básica (Falta Java)"
     
     # Sistema de respaldo con regex (si LanguageTool no disponible)
-    if not CORRECTOR_DISPONIBLE:
+    if usar_respaldo:
         # 1. Palabras terminadas incorrectamente (typos comunes)
-        patrones_error = [
-            (r'\bSUSPENDIOD\b', 'SUSPENDIDO'),
-            (r'\bCIRUCLA\b', 'CIRCULA'),
-            (r'\bCIRUCLAN\b', 'CIRCULAN'),
-            (r'\bPARTEINEDO\b', 'PARTIENDO'),
-            (r'\bPARTIDIENDO\b', 'PARTIENDO'),
-            (r'\bMOOTIVO\b', 'MOTIVO'),
-            (r'\bMOTIVIO\b', 'MOTIVO'),
-            (r'\bHACIAA\b', 'HACIA'),
-            (r'\bHAICIA\b', 'HACIA'),
-            (r'\bREGISTRAA\b', 'REGISTRA'),
-            (r'\bREGISTRAAD[OA]\b', 'REGISTRADO/A'),
-        ]
-        
-        for patron, correcto in patrones_error:
-            if re.search(patron, contenido_upper):
-                palabra_error = re.search(patron, contenido_upper).group()
-                errores_detectados.append(f"{palabra_error} → {correcto}")
-        
+        ya_reportadas = set()
+        for palabra_error, correcto in texto.errores_ortografia_comunes():
+            errores_detectados.append(f"{palabra_error} → {correcto}")
+            ya_reportadas.add(palabra_error)
+
+        # 1b. Corrector en proceso (vocabulario ferroviario + palabras técnicas de la línea)
+        corrector = corrector_ortografico.obtener_corrector_symspell(palabras_tecnicas)
+        for palabra_error, sugerencia in corrector.revisar(contenido_upper):
+            if palabra_error not in ya_reportadas and palabra_error not in palabras_tecnicas:
+                errores_detectados.append(f"{palabra_error} → {sugerencia}")
+
         # 2. Detectar palabras con letras duplicadas incorrectas (3+ letras iguales consecutivas)
         # Buscar patrones como AAA, RRR, etc.
-        if re.search(r'([A-Z])\1{2,}', contenido_upper):
+        if texto.buscar('letras_repetidas'):
             errores_detectados.append("Letras repetidas excesivamente")
     
     # 3. Detectar espacios múltiples (siempre activo)
     if '  ' in contenido:
-        espacios_multiples = len(re.findall(r'\s{2,}', contenido))
+        espacios_multiples = len(PATRONES['espacios_multiples'].findall(contenido))
         if espacios_multiples > 2:
             errores_detectados.append(f"Espacios múltiples ({espacios_multiples} lugares)")
     
@@ -764,7 +1439,7 @@ def validar_componentes(mensaje, contingencias_df):
     
     # Detectar espacios múltiples (ya incluido arriba)
     if '  ' in contenido:  # Dos o más espacios
-        espacios_multiples = len(re.findall(r'\s{2,}', contenido))
+        espacios_multiples = len(PATRONES['espacios_multiples'].findall(contenido))
         if espacios_multiples > 2:  # Tolerar 1-2 espacios dobles
             componentes['ortografia_valida'] = False
             componentes['errores_ortografia'].append(f"Espacios múltiples ({espacios_multiples} lugares)")
@@ -811,7 +1486,7 @@ def validar_tiempo_respuesta(mensaje, componentes):
     # Calcular tardanza
     try:
         fecha_mensaje = mensaje.get('fecha_hora', '')
-        hora_envio = datetime.strptime(fecha_mensaje, "%d/%m/%Y %H:%M:%S")
+        hora_envio = fechas_sofse.parsear_fecha_hora(fecha_mensaje)
         
         # Parsear hora programada
         partes_hora = hora_programada.split(':')
@@ -880,7 +1555,7 @@ def validar_tiempo_respuesta(mensaje, componentes):
 #                    CLASIFICACIÓN FINAL
 # =================================================================
 
-def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingencia, estado_detectado, timing):
+def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingencia, estado_detectado, timing, texto=None):
     """
     Clasifica el mensaje en: COMPLETO, IMPORTANTE, OBSERVACIONES, SUGERENCIAS
     
@@ -888,6 +1563,9 @@ def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingen
     - #1: Sección faltante solo si hay
     - #10: Advierte código 17
     """
+    if texto is None:
+        texto = TextoMensaje(mensaje.get('contenido', ''))
+    
     clasificacion = {
         'IMPORTANTE': [],
         'OBSERVACIONES': [],
@@ -914,12 +1592,8 @@ def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingen
                 )
             # MEJORA #7: Minutos opcionales en demora de partida
             if componentes['B'].get('estado') == 'DEMORA' and not componentes['B'].get('minutos'):
-                # Detectar si es demora de partida
-                contenido = mensaje.get('contenido', '').upper()
-                es_demora_partida = re.search(
-                    r'DEMORANDO\s+(?:SU\s+)?PARTIDA|DEMORA(?:S)?\s+EN\s+(?:LA\s+)?PARTIDA|PARTIDA\s+DEMORADA',
-                    contenido
-                )
+                # Detectar si es demora de partida (el patrón no distingue cantidad de espacios)
+                es_demora_partida = texto.buscar('demora_partida')
                 
                 if es_demora_partida:
                     # MEJORA #7: Demora de partida sin minutos = observación (no crítico)
@@ -990,8 +1664,7 @@ def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingen
         codigo_X = codigo_estructura['X'] if codigo_estructura else None
         
         # Verificar si menciona "formaciones"
-        contenido_msg = mensaje.get('contenido', '').upper()
-        menciona_formaciones = 'FORMACION' in contenido_msg
+        menciona_formaciones = 'FORMACION' in texto.upper
         
         if codigo_X == '17':
             # Código 17 = OTRAS CONTINGENCIAS → por definición no requiere motivo específico
@@ -1056,6 +1729,19 @@ def clasificar_mensaje(mensaje, componentes, codigo_estructura, codigo_contingen
 #                    GENERAR REPORTE
 # =================================================================
 
+# Umbrales de clasificación de los scores: (puntos mínimos, etiqueta), de mayor
+# a menor. Los usa también el scoring en lote (scores_lote.py).
+UMBRALES_COMPONENTES = ((90, 'COMPLETO'), (70, 'ACEPTABLE'))
+CLASIFICACION_COMPONENTES_DEFECTO = 'INCOMPLETO'
+UMBRALES_ESTRUCTURA = ((95, 'IMPECABLE'), (75, 'CORRECTO'), (55, 'MEJORABLE'))
+CLASIFICACION_ESTRUCTURA_DEFECTO = 'DEFICIENTE'
+
+def clasificar_puntos(puntos, umbrales, defecto):
+    for minimo, etiqueta in umbrales:
+        if puntos >= minimo:
+            return etiqueta
+    return defecto
+
 def calcular_scores(componentes, timing, mensaje):
     """
     Calcula los 3 scores independientes del mensaje
@@ -1124,12 +1810,9 @@ def calcular_scores(componentes, timing, mensaje):
         scores['componentes']['detalles'].append("Falta código formal")
     
     # Clasificar componentes
-    if componentes_puntos >= 90:
-        scores['componentes']['clasificacion'] = 'COMPLETO'
-    elif componentes_puntos >= 70:
-        scores['componentes']['clasificacion'] = 'ACEPTABLE'
-    else:
-        scores['componentes']['clasificacion'] = 'INCOMPLETO'
+    scores['componentes']['clasificacion'] = clasificar_puntos(
+        componentes_puntos, UMBRALES_COMPONENTES, CLASIFICACION_COMPONENTES_DEFECTO
+    )
     
     # ========== SCORE 2: TIMING ==========
     if timing and timing.get('tardanza_minutos') is not None:
@@ -1204,14 +1887,9 @@ def calcular_scores(componentes, timing, mensaje):
         scores['estructura']['detalles'].append("Mensaje muy breve o confuso")
     
     # Clasificar estructura (umbrales ajustados para ser más estrictos)
-    if estructura_puntos >= 95:
-        scores['estructura']['clasificacion'] = 'IMPECABLE'
-    elif estructura_puntos >= 75:
-        scores['estructura']['clasificacion'] = 'CORRECTO'
-    elif estructura_puntos >= 55:
-        scores['estructura']['clasificacion'] = 'MEJORABLE'
-    else:
-        scores['estructura']['clasificacion'] = 'DEFICIENTE'
+    scores['estructura']['clasificacion'] = clasificar_puntos(
+        estructura_puntos, UMBRALES_ESTRUCTURA, CLASIFICACION_ESTRUCTURA_DEFECTO
+    )
     
     return scores
 
@@ -1247,59 +1925,67 @@ def validar_mensaje_ROCA(mensaje, contingencias_df):
     
     Args:
         mensaje: dict con datos del mensaje
-        contingencias_df: DataFrame con matriz de contingencias
+        contingencias_df: TablaContingencias (o DataFrame) con matriz de contingencias
     
     Returns:
         dict con reporte completo
     """
+    medicion = perfilador.obtener_perfilador().iniciar()
+
+    clave, reporte = buscar_reporte_cacheado(mensaje, contingencias_df)
+    if medicion:
+        medicion.marcar('cache')
+    if reporte is not None:
+        if medicion:
+            medicion.terminar()
+        return reporte
+
+    # El texto se prepara una vez y lo comparten todas las etapas
+    texto = TextoMensaje(mensaje.get('contenido', ''))
+    
     # 1. Validar componentes
     componentes, codigo_estructura, codigo_contingencia, estado_detectado = validar_componentes(
-        mensaje, contingencias_df
+        mensaje, contingencias_df, texto
     )
+    if medicion:
+        medicion.marcar('validar_componentes')
     
     # 2. Validar timing (MEJORAS #2 y #6)
     timing = validar_tiempo_respuesta(mensaje, componentes)
+    if medicion:
+        medicion.marcar('validar_tiempo_respuesta')
     
     # 3. Clasificar mensaje
     clasificacion, nivel_general = clasificar_mensaje(
-        mensaje, componentes, codigo_estructura, codigo_contingencia, estado_detectado, timing
+        mensaje, componentes, codigo_estructura, codigo_contingencia, estado_detectado, timing, texto
     )
+    if medicion:
+        medicion.marcar('clasificar_mensaje')
     
     # =================================================================
     # APLICAR REGLAS PERSONALIZADAS (SOBRESCRITURA DE VALIDACIÓN)
     # =================================================================
-    reglas = cargar_reglas_personalizadas()
     contenido = mensaje.get('contenido', '')
-    linea_msg = mensaje.get('linea', '').lower().replace(' ', '_')
+    linea_msg = alcance_linea(mensaje.get('linea', ''))
     
     regla_aplicada = None
     
-    for regla in reglas:
-        # 1. Verificar alcance (Global o misma línea)
-        if regla['_origen'] != 'global' and regla['_origen'] != linea_msg:
-            continue
+    # Solo reglas de alcance global o de la misma línea, ya compiladas
+    coincidencia = obtener_motor_reglas().evaluar(contenido, linea_msg)
+    if coincidencia:
+        regla, accion = coincidencia
+        regla_aplicada = regla.get('patron_detectado')
+        
+        if accion == 'aprobar_sin_obs':
+            nivel_general = 'COMPLETO'
+            # Limpiar errores
+            clasificacion = {'IMPORTANTE': [], 'OBSERVACIONES': [], 'SUGERENCIAS': []}
             
-        # 2. Verificar regex
-        regex = regla.get('regex_sugerido', '')
-        if regex:
-            try:
-                if re.search(regex, contenido, re.IGNORECASE | re.UNICODE):
-                    accion = regla.get('accion_sugerida') or regla.get('accion')
-                    
-                    if accion == 'aprobar_sin_obs':
-                        nivel_general = 'COMPLETO'
-                        # Limpiar errores
-                        clasificacion = {'IMPORTANTE': [], 'OBSERVACIONES': [], 'SUGERENCIAS': []}
-                        regla_aplicada = regla['patron_detectado']
-                        break # Prioridad a la primera coincidencia que apruebe
-                        
-                    elif accion == 'aprobar_con_obs':
-                        nivel_general = 'OBSERVACIONES'
-                        # Mantener observaciones pero asegurar nivel
-                        regla_aplicada = regla['patron_detectado']
-                        break
-            except Exception:
-                pass
+        elif accion == 'aprobar_con_obs':
+            # Mantener observaciones pero asegurar nivel
+            nivel_general = 'OBSERVACIONES'
+    if medicion:
+        medicion.marcar('reglas')
 
     # 4. Generar reporte
     reporte = generar_reporte(mensaje, componentes, clasificacion, nivel_general, timing)
@@ -1310,23 +1996,79 @@ def validar_mensaje_ROCA(mensaje, contingencias_df):
         if nivel_general == 'COMPLETO':
             reporte['requiere_notificacion'] = False
     
+    guardar_reporte_cacheado(clave, reporte)
+    if medicion:
+        medicion.marcar('generar_reporte')
+        medicion.terminar()
     return reporte
 
+def buscar_reporte_cacheado(mensaje, contingencias_df):
+    """
+    Returns: (clave, reporte) — reporte es None si no está en cache;
+    clave es None si el cache está apagado o el mensaje no es cacheable
+    """
+    cache = cache_reportes.obtener_cache()
+    if not (CACHE_REPORTES_ACTIVO and cache.activo) or not isinstance(mensaje.get('contenido'), str):
+        return None, None
+    clave = clave_reporte(mensaje, contingencias_df)
+    reporte = cache.obtener(clave)
+    if reporte is not None:
+        # Lo único del reporte que no entra en la clave
+        reporte['numero_mensaje'] = mensaje.get('numero_mensaje')
+        reporte['operador'] = mensaje.get('operador')
+    return clave, reporte
+
+def guardar_reporte_cacheado(clave, reporte):
+    # Un fallo de LanguageTool es transitorio: ese reporte no se memoriza
+    if clave is not None and not reporte['componentes'].get('aviso_sistema'):
+        cache_reportes.obtener_cache().guardar(clave, reporte)
+
+def clave_reporte(mensaje, contingencias_df):
+    """
+    Clave del cache de reportes: todo lo que puede cambiar el resultado.
+    El contenido va tal cual (espacios y mayúsculas generan observaciones).
+    """
+    linea = mensaje.get('linea', 'ROCA')
+    version_contingencias = (
+        obtener_indice_contingencias(contingencias_df).version
+        if contingencias_df is not None else None
+    )
+    huella_vocabulario = corrector_ortografico.obtener_corrector_symspell(
+        cargar_config(linea)['palabras_tecnicas']
+    ).huella
+    return cache_reportes.calcular_clave(
+        mensaje.get('contenido'),
+        mensaje.get('linea'),
+        mensaje.get('fecha_hora'),
+        VERSION_VALIDADOR,
+        obtener_motor_reglas().version,
+        version_contingencias,
+        version_config(linea),
+        huella_vocabulario,
+        CORRECTOR_DISPONIBLE,
+    )
+
 # =================================================================
 #                    PROCESAMIENTO BATCH
 # =================================================================
 
+def buscar_ultimo_json_mensajes():
+    """El export de mensajes más reciente del directorio actual, o None"""
+    archivos_json = glob.glob("mensajes_sofse_*.json") + glob.glob("mensajes_nuevos_temp_*.json") + glob.glob("mensajes_roca_*.json")
+    if not archivos_json:
+        return None
+    return max(archivos_json, key=os.path.getmtime)
+
 def validar_mensajes_desde_json(archivo_json=None, contingencias_df=None):
     """
     Valida mensajes desde archivo JSON
     """
     # Buscar último JSON si no se especifica
     if not archivo_json:
-        archivos_json = glob.glob("mensajes_sofse_*.json") + glob.glob("mensajes_nuevos_temp_*.json") + glob.glob("mensajes_roca_*.json")
-        if not archivos_json:
+        archivo_json = buscar_ultimo_json_mensajes()
+        if not archivo_json:
             print("❌ No se encontró archivo JSON de mensajes")
             return []
-        archivo_json = max(archivos_json, key=os.path.getmtime)
     
     print(f"📖 Leyendo: {archivo_json}")
     
@@ -1340,14 +2082,17 @@ def validar_mensajes_desde_json(archivo_json=None, contingencias_df=None):
     if contingencias_df is None:
         contingencias_df = cargar_contingencias()
     
-    # Validar cada mensaje
+    # Validar cada mensaje (LanguageTool de a TAMANIO_CHUNK_LOTE textos por consulta)
     reportes = []
-    for mensaje in mensajes:
-        try:
-            reporte = validar_mensaje_ROCA(mensaje, contingencias_df)
-            reportes.append(reporte)
-        except Exception as e:
-            print(f"⚠️ Error validando #{mensaje.get('numero_mensaje', 'N/A')}: {e}")
+    for inicio in range(0, len(mensajes), TAMANIO_CHUNK_LOTE):
+        chunk = mensajes[inicio:inicio + TAMANIO_CHUNK_LOTE]
+        with ortografia_en_lote(chunk):
+            for mensaje in chunk:
+                try:
+                    reporte = validar_mensaje_ROCA(mensaje, contingencias_df)
+                    reportes.append(reporte)
+                except Exception as e:
+                    print(f"⚠️ Error validando #{mensaje.get('numero_mensaje', 'N/A')}: {e}")
     
     return reportes
 
@@ -1371,11 +2116,461 @@ def procesar_mensaje(mensaje):
     return validar_mensaje_ROCA(mensaje, _CONTINGENCIAS_CACHE)
 
 
+WORKERS_LOTE = int(os.environ.get('VALIDADOR_WORKERS', '0')) or (os.cpu_count() or 1)
+TAMANIO_CHUNK_LOTE = 50       # Mensajes por tarea enviada a un worker
+MIN_MENSAJES_PARALELO = 100   # Por debajo de esto no conviene levantar procesos
+# Espera máxima por el resultado de un chunk (incluye arrancar y calentar el
+# worker). Si se pasa, el pool se descarta y lo que falta se valida acá: el
+# pedido tiene que terminar antes del timeout de gunicorn (120s)
+TIMEOUT_CHUNK_LOTE = float(os.environ.get('VALIDADOR_TIMEOUT_CHUNK', '60'))
+
+def _calentar_validador(lineas=()):
+    """
+    Carga una sola vez por proceso todo lo que validar_mensaje_ROCA necesita:
+    contingencias (y su índice), motor de reglas, configs y LanguageTool.
+    """
+    global _CONTINGENCIAS_CACHE
+    if _CONTINGENCIAS_CACHE is None:
+        _CONTINGENCIAS_CACHE = cargar_contingencias()
+    if _CONTINGENCIAS_CACHE is not None:
+        obtener_indice_contingencias(_CONTINGENCIAS_CACHE)
+    obtener_motor_reglas()
+    for linea in lineas:
+        cargar_config(linea)
+    if CORRECTOR_DISPONIBLE:
+        corrector_ortografico.obtener_pool().disponible()
+
+_ORTOGRAFIA_LOTE = threading.local()
+
+@contextmanager
+def ortografia_en_lote(mensajes):
+    """
+    Verifica con LanguageTool los textos de todo el grupo en una sola
+    consulta (pool.verificar_lote). Dentro del bloque, validar_componentes
+    toma de ahí los errores de cada mensaje en lugar de consultar uno por uno.
+    Si la consulta falla, cada mensaje consulta (o cae al respaldo) como antes.
+    """
+    resultados = {}
+    if CORRECTOR_DISPONIBLE and corrector_ortografico.obtener_pool().disponible():
+        textos = list(dict.fromkeys(
+            TextoMensaje(m['contenido']).normalizado
+            for m in mensajes if isinstance(m, dict) and isinstance(m.get('contenido'), str)
+        ))
+        if textos:
+            try:
+                resultados = dict(zip(textos, corrector_ortografico.obtener_pool().verificar_lote(textos)))
+            except Exception as e:
+                print(f"⚠️ LanguageTool en lote: {e}")
+    anteriores = getattr(_ORTOGRAFIA_LOTE, 'resultados', None)
+    _ORTOGRAFIA_LOTE.resultados = resultados
+    try:
+        yield
+    finally:
+        _ORTOGRAFIA_LOTE.resultados = anteriores
+
+def verificar_ortografia(contenido):
+    """Errores de LanguageTool de un texto: del lote en curso si está, si no una consulta"""
+    resultados = getattr(_ORTOGRAFIA_LOTE, 'resultados', None)
+    if resultados and contenido in resultados:
+        return resultados[contenido]
+    return corrector_ortografico.obtener_pool().verificar(contenido)
+
+def _validar_chunk(mensajes):
+    """Valida un grupo de mensajes aislando los errores de cada uno"""
+    resultados = []
+    with ortografia_en_lote(mensajes):
+        for mensaje in mensajes:
+            try:
+                resultados.append((procesar_mensaje(mensaje), None))
+            except Exception as e:
+                resultados.append((None, str(e)))
+    return resultados
+
+def _validar_chunk_perfilado(mensajes):
+    """_validar_chunk en un worker con perfil: devuelve también lo medido"""
+    perfil = perfilador.obtener_perfilador()
+    perfil.activo = True    # El worker no hereda el estado del proceso que lo pide
+    perfil.limpiar()
+    resultados = _validar_chunk(mensajes)
+    return resultados, perfil.datos()
+
+def procesar_lote(mensajes, workers=None, tamanio_chunk=TAMANIO_CHUNK_LOTE):
+    """
+    Valida muchos mensajes repartiéndolos en un pool de procesos.
+
+    Cada worker se calienta una vez al arrancar (ver _crear_pool_validacion).
+    Los lotes chicos o con workers=1 se validan en el proceso actual.
+
+    Returns:
+        lista de reportes en el mismo orden que `mensajes`; None para los
+        mensajes que fallaron (el error se informa por consola)
+    """
+    mensajes = list(mensajes)
+    workers = workers or WORKERS_LOTE
+    lineas = {m.get('linea', 'ROCA') for m in mensajes}
+    _calentar_validador(lineas)
+
+    # Los que ya están en el cache no se validan (ni se consultan a LanguageTool),
+    # y lo que calculan los workers vuelve al cache de este proceso
+    resultados = [None] * len(mensajes)
+    claves = {}
+    pendientes = []
+    for i, mensaje in enumerate(mensajes):
+        try:
+            clave, reporte = buscar_reporte_cacheado(mensaje, _CONTINGENCIAS_CACHE)
+        except Exception:
+            clave, reporte = None, None
+        if reporte is not None:
+            resultados[i] = (reporte, None)
+        else:
+            claves[i] = clave
+            pendientes.append(i)
+
+    chunks = [pendientes[i:i + tamanio_chunk] for i in range(0, len(pendientes), tamanio_chunk)]
+    if workers <= 1 or len(pendientes) < MIN_MENSAJES_PARALELO or len(chunks) <= 1:
+        # En este proceso: validar_mensaje_ROCA ya guarda en el cache
+        calculados = []
+        for chunk in chunks:
+            calculados.extend(_validar_chunk([mensajes[i] for i in chunk]))
+        en_pool = False
+    else:
+        calculados = _procesar_chunks_en_pool(
+            [[mensajes[i] for i in chunk] for chunk in chunks],
+            min(workers, len(chunks)), lineas
+        )
+        en_pool = True
+    for i, (reporte, error) in zip(pendientes, calculados):
+        resultados[i] = (reporte, error)
+        if en_pool and reporte is not None:
+            guardar_reporte_cacheado(claves[i], reporte)
+
+    reportes = []
+    for mensaje, (reporte, error) in zip(mensajes, resultados):
+        if error is not None:
+            identificador = mensaje.get('id') or mensaje.get('id_mensaje') or mensaje.get('numero_mensaje', 'N/A')
+            print(f"⚠️ Error validando mensaje {identificador}: {error}")
+        reportes.append(reporte)
+    return reportes
+
+def _contexto_pool():
+    """
+    Contexto de multiprocessing de los pools de validación. Nunca fork:
+    procesar_lote corre en hilos de Flask/gunicorn, y fork copia al hijo los
+    locks que otros hilos (escritor diferido, motor sombra, watchdog de
+    LanguageTool, otros pedidos) tengan tomados en ese momento; el worker se
+    queda esperándolos para siempre. forkserver arranca los workers desde un
+    proceso de un solo hilo que ya importó el validador; donde no existe,
+    spawn.
+    """
+    import multiprocessing
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    contexto = multiprocessing.get_context('forkserver')
+    # Solo tiene efecto antes de que arranque el servidor (una vez por proceso)
+    contexto.set_forkserver_preload(
+        ['__main__'] if __name__ == '__main__' else ['validador_mensajes']
+    )
+    return contexto
+
+def _crear_pool_validacion(workers, lineas=()):
+    """
+    Pool de procesos para validar chunks. Cada worker carga sus propios
+    módulos y se calienta una vez (motores_validador.iniciar_worker_motor:
+    también sirve cuando este módulo es un motor cargado desde archivo).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import motores_validador
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_contexto_pool(),
+        initializer=motores_validador.iniciar_worker_motor,
+        initargs=(__name__, __spec__.origin if __spec__ else None, tuple(lineas)),
+    )
+
+def _cerrar_pool(pool, terminar=False):
+    """
+    Cierra el pool. Con terminar=True no espera: mata los workers (uno
+    colgado no termina nunca su chunk).
+    """
+    if not terminar:
+        pool.shutdown(cancel_futures=True)
+        return
+    procesos = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proceso in procesos:
+        proceso.terminate()
+
+def _procesar_chunks_en_pool(chunks, workers, lineas):
+    """
+    Reparte los chunks. Si el pool se cae o un chunk no termina en
+    TIMEOUT_CHUNK_LOTE, se descarta el pool y los pendientes se validan acá.
+    """
+    from concurrent.futures import CancelledError, TimeoutError as TimeoutFuturo
+    from concurrent.futures.process import BrokenProcessPool
+
+    perfil = perfilador.obtener_perfilador()
+    perfilado = perfil.activo
+    resultados = []
+    hechos = 0
+    fallo = None
+    pool = _crear_pool_validacion(workers, lineas)
+    try:
+        tarea = _validar_chunk_perfilado if perfilado else _validar_chunk
+        futuros = [pool.submit(tarea, chunk) for chunk in chunks]
+        for futuro in futuros:
+            if perfilado:
+                resultados_chunk, datos_perfil = futuro.result(timeout=TIMEOUT_CHUNK_LOTE)
+                perfil.combinar(datos_perfil)
+            else:
+                resultados_chunk = futuro.result(timeout=TIMEOUT_CHUNK_LOTE)
+            resultados.extend(resultados_chunk)
+            hechos += 1
+    except (BrokenProcessPool, CancelledError, TimeoutFuturo) as e:
+        fallo = e
+    finally:
+        _cerrar_pool(pool, terminar=fallo is not None)
+
+    if fallo is not None:
+        motivo = 'sin respuesta' if isinstance(fallo, TimeoutFuturo) else f'caído ({fallo})'
+        print(f"⚠️ Pool de validación {motivo}: se sigue en el proceso principal")
+        for chunk in chunks[hechos:]:
+            resultados.extend(_validar_chunk(chunk))
+    return resultados
+
+
+# =================================================================
+#                    VALIDACIÓN EN STREAMING (JSONL)
+# =================================================================
+
+TAMANIO_BLOQUE_LECTURA = 1 << 16    # Bytes leídos por vez del array JSON
+MAX_CHUNKS_EN_VUELO = 2             # Chunks pendientes por worker (acota la memoria)
+_NO_ESPACIO = re.compile(r'\S')
+_CONTINUA_NUMERO = frozenset('0123456789.eE+-')
+
+def _iterar_array_json(archivo, tamanio_bloque=TAMANIO_BLOQUE_LECTURA):
+    """
+    Elementos de un array JSON grande, de a uno, sin cargar el archivo entero.
+    Lee bloques y decodifica cada elemento con raw_decode. Exige ',' entre
+    elementos y no acepta coma final (ValueError, como json.load).
+    """
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    fin_archivo = False
+    # Qué se espera a continuación: '[', primer elemento o ']', elemento, ',' o ']'
+    esperado = 'apertura'
+
+    while True:
+        siguiente = _NO_ESPACIO.search(buffer, pos)
+        if siguiente is None:
+            if fin_archivo:
+                raise ValueError("Array JSON sin cerrar")
+            bloque = archivo.read(tamanio_bloque)
+            fin_archivo = not bloque
+            buffer = bloque
+            pos = 0
+            continue
+        pos = siguiente.start()
+        caracter = buffer[pos]
+
+        if esperado == 'apertura':
+            if caracter != '[':
+                raise ValueError("Se esperaba un array JSON")
+            esperado = 'primero'
+            pos += 1
+            continue
+        if esperado == 'separador':
+            if caracter == ']':
+                return
+            if caracter != ',':
+                raise ValueError(f"Se esperaba ',' o ']' y vino {buffer[pos:pos + 20]!r}")
+            esperado = 'elemento'
+            pos += 1
+            continue
+        if caracter == ']':
+            if esperado == 'primero':
+                return
+            raise ValueError("Coma final en el array JSON")
+
+        try:
+            elemento, fin = decodificador.raw_decode(buffer, pos)
+            # Un número cortado por el bloque ("2." de "2.5") decodifica igual:
+            # solo está completo si lo sigue algo que no puede continuarlo
+            completo = (fin_archivo or not isinstance(elemento, (int, float))
+                        or (fin < len(buffer) and buffer[fin] not in _CONTINUA_NUMERO))
+        except json.JSONDecodeError:
+            if fin_archivo:
+                raise
+            completo = False
+        if not completo:
+            # Elemento cortado por el bloque: leer más y reintentar
+            bloque = archivo.read(tamanio_bloque)
+            fin_archivo = not bloque
+            buffer = buffer[pos:] + bloque
+            pos = 0
+            continue
+        yield elemento
+        esperado = 'separador'
+        pos = fin
+
+def iterar_mensajes_archivo(ruta):
+    """
+    Mensajes de un archivo, de a uno: JSONL (un mensaje por línea) o un
+    array JSON (como los exports mensajes_*.json), leído incrementalmente.
+    """
+    with open(ruta, 'r', encoding='utf-8') as f:
+        inicio = ''
+        while True:
+            caracter = f.read(1)
+            if not caracter or not caracter.isspace():
+                inicio = caracter
+                break
+        f.seek(0)
+        if inicio == '[':
+            yield from _iterar_array_json(f)
+            return
+        for numero, linea in enumerate(f, 1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{ruta}:{numero}: línea JSONL inválida ({e})")
+
+def validar_flujo(mensajes, workers=None, tamanio_chunk=TAMANIO_CHUNK_LOTE):
+    """
+    Valida un iterable de mensajes de cualquier tamaño con el pool de
+    procesos de procesar_lote, manteniendo un solo pool abierto y como
+    mucho MAX_CHUNKS_EN_VUELO chunks por worker sin entregar.
+
+    Yields: (mensaje, reporte, error) en el orden de entrada
+    """
+    from collections import deque
+
+    workers = workers or WORKERS_LOTE
+    _calentar_validador()
+
+    def chunks():
+        chunk = []
+        for mensaje in mensajes:
+            chunk.append(mensaje)
+            if len(chunk) >= tamanio_chunk:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    if workers <= 1:
+        for chunk in chunks():
+            for mensaje, (reporte, error) in zip(chunk, _validar_chunk(chunk)):
+                yield mensaje, reporte, error
+        return
+
+    en_vuelo = deque()
+    pool = _crear_pool_validacion(workers)
+    try:
+        for chunk in chunks():
+            en_vuelo.append((chunk, pool.submit(_validar_chunk, chunk) if pool else None))
+            while len(en_vuelo) >= workers * MAX_CHUNKS_EN_VUELO:
+                chunk_listo, futuro = en_vuelo.popleft()
+                resultados, pool = _resultado_chunk(chunk_listo, futuro, pool)
+                for mensaje, (reporte, error) in zip(chunk_listo, resultados):
+                    yield mensaje, reporte, error
+        while en_vuelo:
+            chunk_listo, futuro = en_vuelo.popleft()
+            resultados, pool = _resultado_chunk(chunk_listo, futuro, pool)
+            for mensaje, (reporte, error) in zip(chunk_listo, resultados):
+                yield mensaje, reporte, error
+    finally:
+        if pool:
+            _cerrar_pool(pool)
+
+def _resultado_chunk(chunk, futuro, pool):
+    """
+    Resultado de un chunk. Si el pool se cayó o el chunk no terminó en
+    TIMEOUT_CHUNK_LOTE, se descarta el pool, el chunk se valida acá y se
+    sigue sin pool (los chunks ya enviados también se validan acá).
+    """
+    from concurrent.futures import CancelledError, TimeoutError as TimeoutFuturo
+    from concurrent.futures.process import BrokenProcessPool
+
+    if futuro is not None and pool is not None:
+        try:
+            return futuro.result(timeout=TIMEOUT_CHUNK_LOTE), pool
+        except (BrokenProcessPool, CancelledError, TimeoutFuturo) as e:
+            motivo = 'sin respuesta' if isinstance(e, TimeoutFuturo) else f'caído ({e})'
+            print(f"⚠️ Pool de validación {motivo}: se sigue en el proceso principal")
+            _cerrar_pool(pool, terminar=True)
+            pool = None
+    return _validar_chunk(chunk), pool
+
+def validar_archivo_streaming(archivo_entrada, archivo_salida, workers=None):
+    """
+    Valida un export de cualquier tamaño y escribe un reporte JSON por línea
+    a medida que se completan (memoria constante). Los mensajes que fallan
+    quedan como {"numero_mensaje", "error"}.
+
+    Returns: (validados, errores)
+    """
+    validados = errores = 0
+    inicio = time.perf_counter()
+    with open(archivo_salida, 'w', encoding='utf-8') as salida:
+        for mensaje, reporte, error in validar_flujo(iterar_mensajes_archivo(archivo_entrada), workers):
+            if reporte is None:
+                errores += 1
+                numero = None
+                if isinstance(mensaje, dict):
+                    numero = mensaje.get('numero_mensaje') or mensaje.get('id_mensaje') or mensaje.get('id')
+                reporte = {'numero_mensaje': numero, 'error': error}
+            else:
+                validados += 1
+            salida.write(json.dumps(reporte, ensure_ascii=False, default=str) + '\n')
+            if (validados + errores) % 10000 == 0:
+                ritmo = (validados + errores) / (time.perf_counter() - inicio)
+                print(f"   ... {validados + errores} mensajes ({ritmo:.0f}/s)")
+    return validados, errores
+
+
 # =================================================================
 #                    MAIN (MODO STANDALONE)
 # =================================================================
 
 if __name__ == "__main__":
+    # Paso de build: python validador_mensajes.py --compilar-contingencias
+    if '--compilar-contingencias' in sys.argv:
+        exit(0 if compilar_snapshot_contingencias() else 1)
+    
+    # Streaming: python validador_mensajes.py --streaming [entrada.json|.jsonl] [salida.jsonl]
+    # Auditoría de exports grandes con memoria constante (sin notificar)
+    if '--streaming' in sys.argv:
+        argumentos = sys.argv[sys.argv.index('--streaming') + 1:]
+        entrada = argumentos[0] if argumentos else buscar_ultimo_json_mensajes()
+        if not entrada:
+            print("❌ No se encontró archivo JSON de mensajes")
+            exit(1)
+        salida = argumentos[1] if len(argumentos) > 1 else os.path.splitext(entrada)[0] + '_reportes.jsonl'
+        print(f"📖 Leyendo en streaming: {entrada}")
+        validados, errores = validar_archivo_streaming(entrada, salida)
+        print(f"✅ {validados} reportes en {salida} ({errores} errores)")
+        exit(0)
+    
+    # Perfil: python validador_mensajes.py --perfil salida.folded [mensajes.json]
+    # Valida sin notificar y vuelca los tiempos por etapa para flamegraph.pl
+    if '--perfil' in sys.argv:
+        argumentos = sys.argv[sys.argv.index('--perfil') + 1:]
+        if not argumentos:
+            print("Uso: python validador_mensajes.py --perfil <salida.folded> [mensajes.json]")
+            exit(1)
+        perfil = perfilador.obtener_perfilador()
+        perfil.activo = True
+        reportes = validar_mensajes_desde_json(argumentos[1] if len(argumentos) > 1 else None)
+        lineas = perfil.exportar_flamegraph(argumentos[0])
+        print(json.dumps(perfil.resumen()['etapas'], indent=2, ensure_ascii=False))
+        print(f"🔥 Perfil de {len(reportes)} mensajes en {argumentos[0]} ({lineas} pilas)")
+        exit(0)
+    
     print("="*80)
     print("🔍 VALIDADOR MENSAJES SOFSE - SISTEMA ROCA v3.0")
     print("="*80)